@@ -1,6 +1,11 @@
 from django.contrib import admin
+from django.db.models import QuerySet
+from django.forms import ModelForm
+from django.http import HttpRequest
 
+from .cache import invalidate_catalog
 from .models import Book
+from .search import search_books
 
 
 @admin.register(Book)
@@ -8,3 +13,29 @@ class BookAdmin(admin.ModelAdmin):
     list_display = ("title", "author", "inventory", "daily_fee")
     list_filter = ("author", "cover")
     search_fields = ("title", "author")
+
+    def get_search_results(
+        self, request: HttpRequest, queryset: QuerySet, search_term: str
+    ) -> tuple[QuerySet, bool]:
+        # Use the indexed full-text/trigram search instead of
+        # the default `icontains` scans over search_fields.
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return search_books(queryset, search_term), False
+
+    def save_model(
+        self, request: HttpRequest, obj: Book, form: ModelForm, change: bool
+    ) -> None:
+        super().save_model(request, obj, form, change)
+        invalidate_catalog()
+
+    def delete_model(self, request: HttpRequest, obj: Book) -> None:
+        super().delete_model(request, obj)
+        invalidate_catalog()
+
+    def delete_queryset(
+        self, request: HttpRequest, queryset: QuerySet
+    ) -> None:
+        super().delete_queryset(request, queryset)
+        invalidate_catalog()
@@ -0,0 +1,22 @@
+from django.conf import settings
+
+from library_service.cache import VersionedCache
+
+catalog_cache = VersionedCache(
+    "books:catalog", timeout=settings.BOOK_CACHE_TIMEOUT
+)
+
+
+def invalidate_catalog() -> None:
+    """Drop every cached list page and book detail payload."""
+    catalog_cache.bump()
+
+
+def invalidate_book(book_id: int) -> None:
+    """
+    Drop the cached detail payload of a single book.
+
+    Used for inventory changes, which are too frequent to flush the whole
+    catalog. List pages pick up the new inventory once they expire.
+    """
+    catalog_cache.delete("detail", book_id)
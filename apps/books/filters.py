@@ -0,0 +1,41 @@
+from django.db.models import QuerySet
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+from .search import search_books
+
+
+class BookSearchFilter(BaseFilterBackend):
+    """
+    Rank books by relevance to the `search` query parameter.
+    """
+
+    search_param = "search"
+
+    @classmethod
+    def get_search_term(cls, request: Request) -> str:
+        return request.query_params.get(cls.search_param, "").strip()
+
+    def filter_queryset(
+        self, request: Request, queryset: QuerySet, view: APIView
+    ) -> QuerySet:
+        term = self.get_search_term(request)
+        if not term:
+            return queryset
+        return search_books(queryset, term)
+
+    def get_schema_operation_parameters(self, view: APIView) -> list[dict]:
+        return [
+            {
+                "name": self.search_param,
+                "required": False,
+                "in": "query",
+                "description": (
+                    "Full-text search on title and author, tolerant to "
+                    "typos. Results are ordered by relevance and paged "
+                    "by number, even with `pagination=cursor`."
+                ),
+                "schema": {"type": "string"},
+            }
+        ]
@@ -0,0 +1,122 @@
+import csv
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Iterable, Iterator
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .cache import invalidate_catalog
+from .models import Book
+from .serializers import BookImportSerializer
+
+NATURAL_KEY = ("title", "author", "cover")
+UPDATE_FIELDS = ("inventory", "daily_fee", "updated_at")
+
+
+@dataclass
+class ImportReport:
+    processed: int = 0
+    imported: int = 0
+    failed: int = 0
+    errors: list[dict[str, Any]] = field(default_factory=list)
+    max_errors: int = 100
+
+    def add_error(self, row: int, detail: Any) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "errors": detail})
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "processed": self.processed,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+
+def read_rows(lines: Iterable[str], file_format: str) -> Iterator[Any]:
+    """
+    Lazily parse CSV (with a header row) or NDJSON lines into dicts.
+
+    NDJSON lines that are not valid JSON are yielded as ValidationError
+    instances so that the importer can report them against their row.
+    Input that cannot be decoded or parsed any further ends the rows with
+    such an error.
+    """
+    try:
+        if file_format == "csv":
+            yield from csv.DictReader(lines)
+            return
+
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield ValidationError(f"Invalid JSON: {e.msg}")
+    except UnicodeDecodeError:
+        yield ValidationError("Invalid encoding: expected UTF-8.")
+    except csv.Error as e:
+        yield ValidationError(f"Invalid CSV: {e}")
+
+
+def _upsert(books: list[Book]) -> None:
+    with transaction.atomic():
+        Book.objects.bulk_create(
+            books,
+            update_conflicts=True,
+            unique_fields=NATURAL_KEY,
+            update_fields=UPDATE_FIELDS,
+        )
+
+
+def import_books(
+    lines: Iterable[str],
+    file_format: str,
+    chunk_size: int = 1000,
+    max_errors: int = 100,
+) -> ImportReport:
+    """
+    Validate and upsert books streamed from a CSV or NDJSON source.
+
+    Rows are processed in chunks of `chunk_size`, so memory use does not
+    depend on the size of the input. Every row is validated with the
+    BookSerializer rules; invalid rows are reported and skipped while the
+    rest of the chunk is written with a single `INSERT ... ON CONFLICT`
+    keyed on (title, author, cover).
+    """
+    report = ImportReport(max_errors=max_errors)
+    serializer = BookImportSerializer()
+    rows = enumerate(read_rows(lines, file_format), start=1)
+
+    while chunk := list(islice(rows, chunk_size)):
+        # Later rows win when the same book appears twice in a chunk;
+        # Postgres rejects an upsert touching one row twice. Every valid
+        # row still counts as imported.
+        books = {}
+        valid = 0
+        for row_number, row in chunk:
+            report.processed += 1
+            try:
+                if isinstance(row, ValidationError):
+                    raise row
+                if not isinstance(row, dict):
+                    raise ValidationError("Expected an object.")
+                book = Book(**serializer.run_validation(row))
+            except ValidationError as e:
+                report.add_error(row_number, e.detail)
+                continue
+            books[tuple(getattr(book, key) for key in NATURAL_KEY)] = book
+            valid += 1
+
+        if books:
+            _upsert(list(books.values()))
+            report.imported += valid
+
+    if report.imported:
+        invalidate_catalog()
+    return report
@@ -0,0 +1,46 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from apps.books.importers import import_books
+from apps.books.serializers import IMPORT_FORMAT_EXTENSIONS, IMPORT_FORMATS
+
+
+class Command(BaseCommand):
+    help = "Upsert books from a CSV or NDJSON file ('-' reads stdin)."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=IMPORT_FORMATS)
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.BOOK_IMPORT_CHUNK_SIZE,
+        )
+
+    def handle(self, *args, **options) -> None:
+        path = options["path"]
+        file_format = options["format"]
+        if file_format is None:
+            extension = "." + path.rsplit(".", 1)[-1].lower()
+            file_format = IMPORT_FORMAT_EXTENSIONS.get(extension, "csv")
+
+        if path == "-":
+            report = import_books(
+                sys.stdin, file_format, chunk_size=options["chunk_size"]
+            )
+        else:
+            with open(path, encoding="utf-8-sig", newline="") as lines:
+                report = import_books(
+                    lines, file_format, chunk_size=options["chunk_size"]
+                )
+
+        for error in report.errors:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {report.processed} rows: "
+                f"{report.imported} imported, {report.failed} failed."
+            )
+        )
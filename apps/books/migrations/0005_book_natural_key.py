@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:41
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+NATURAL_KEY = ("title", "author", "cover")
+
+
+def merge_duplicate_books(apps, schema_editor):
+    """
+    Merge books sharing (title, author, cover) into the oldest of them.
+
+    Their copies are added up and their borrowings moved over, so that
+    the unique constraint can be added.
+    """
+    Book = apps.get_model("books", "Book")
+    Borrowing = apps.get_model("borrowings", "Borrowing")
+    duplicates = (
+        Book.objects.values(*NATURAL_KEY)
+        .annotate(
+            count=Count("id"),
+            keep_id=Min("id"),
+            total_inventory=Sum("inventory"),
+        )
+        .filter(count__gt=1)
+        .order_by()
+    )
+    for group in duplicates.iterator():
+        books = Book.objects.filter(
+            **{field: group[field] for field in NATURAL_KEY}
+        )
+        extra = books.exclude(pk=group["keep_id"])
+        Borrowing.objects.filter(book__in=extra).update(
+            book_id=group["keep_id"]
+        )
+        books.filter(pk=group["keep_id"]).update(
+            inventory=group["total_inventory"]
+        )
+        extra.delete()
+
+    if schema_editor.connection.vendor == "postgresql":
+        # Run the deferred foreign key checks of the moved borrowings now;
+        # Postgres refuses to alter the table while they are pending.
+        schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_book_updated_at'),
+        ('borrowings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_books, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.UniqueConstraint(fields=('title', 'author', 'cover'), name='unique_book_title_author_cover'),
+        ),
+    ]
@@ -1,5 +1,8 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 
+from .search import BOOK_SEARCH_VECTOR
+
 
 class Book(models.Model):
     class CoverChoices(models.TextChoices):
@@ -11,11 +14,32 @@ class Book(models.Model):
     cover = models.CharField(max_length=4, choices=CoverChoices.choices)
     inventory = models.PositiveIntegerField()
     daily_fee = models.DecimalField(max_digits=5, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["title"]
         verbose_name = "Book"
         verbose_name_plural = "Books"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["title", "author", "cover"],
+                name="unique_book_title_author_cover",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["title", "id"], name="book_title_id_idx"),
+            GinIndex(BOOK_SEARCH_VECTOR, name="book_search_vector_idx"),
+            GinIndex(
+                fields=["title"],
+                name="book_title_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["author"],
+                name="book_author_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.title} by {self.author}"
@@ -3,7 +3,11 @@ from drf_spectacular.utils import (
     extend_schema,
     OpenApiResponse,
 )
-from .serializers import BookSerializer
+from .serializers import (
+    BookSerializer,
+    BookImportUploadSerializer,
+    BookImportReportSerializer,
+)
 
 book_schema = extend_schema_view(
     list=extend_schema(summary="List books", responses=BookSerializer),
@@ -31,4 +35,24 @@ book_schema = extend_schema_view(
             204: OpenApiResponse(description="Book deleted successfully.")
         },
     ),
+    bulk_import=extend_schema(
+        summary="Bulk import books",
+        description=(
+            "Stream a CSV (with a header row) or NDJSON file of books and "
+            "upsert them on (title, author, cover) in chunks (admin only). "
+            "Invalid rows are reported per row and do not abort the import."
+        ),
+        request={"multipart/form-data": BookImportUploadSerializer},
+        responses={200: BookImportReportSerializer},
+    ),
+    cache_stats=extend_schema(
+        summary="Catalog cache statistics",
+        description=(
+            "Hit and miss counters of the catalog cache (admin only). "
+            "List and detail responses also carry an `X-Cache` header."
+        ),
+        responses={
+            200: OpenApiResponse(description="Cache hit and miss counters.")
+        },
+    ),
 )
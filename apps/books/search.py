@@ -0,0 +1,38 @@
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramWordSimilarity,
+)
+from django.db.models import Q, QuerySet
+
+# Must stay identical to the expression indexed in Book.Meta.indexes,
+# otherwise Postgres falls back to a sequential scan.
+BOOK_SEARCH_VECTOR = SearchVector("title", "author", config="english")
+
+
+def search_books(queryset: QuerySet, term: str) -> QuerySet:
+    """
+    Filter books by a free-text term and order them by relevance.
+
+    Full-text matches use the GIN index on BOOK_SEARCH_VECTOR, while
+    trigram word similarity on title and author tolerates typos and
+    partial words. Both predicates are index-backed, so Postgres can
+    combine them with a bitmap OR scan.
+    """
+    query = SearchQuery(term, config="english", search_type="websearch")
+
+    return (
+        queryset.annotate(search=BOOK_SEARCH_VECTOR)
+        .filter(
+            Q(search=query)
+            | Q(title__trigram_word_similar=term)
+            | Q(author__trigram_word_similar=term)
+        )
+        .annotate(
+            rank=SearchRank(BOOK_SEARCH_VECTOR, query)
+            + TrigramWordSimilarity(term, "title")
+            + TrigramWordSimilarity(term, "author")
+        )
+        .order_by("-rank", "title", "id")
+    )
@@ -1,9 +1,57 @@
+from pathlib import Path
+from typing import Any
+
 from rest_framework import serializers
 
 from .models import Book
 
+IMPORT_FORMATS = ("csv", "ndjson")
+IMPORT_FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+
 
 class BookSerializer(serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = ("id", "title", "author", "cover", "inventory", "daily_fee")
+
+
+class BookImportSerializer(BookSerializer):
+    class Meta(BookSerializer.Meta):
+        # Imported rows are upserted on the natural key, so an existing
+        # (title, author, cover) is an update rather than an error.
+        validators = []
+
+
+class BookImportUploadSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    file_format = serializers.ChoiceField(
+        choices=IMPORT_FORMATS,
+        required=False,
+        help_text="Inferred from the file extension when omitted.",
+    )
+
+    def validate(self, attrs: dict[str, Any]) -> dict[str, Any]:
+        if "file_format" not in attrs:
+            extension = Path(attrs["file"].name).suffix.lower()
+            if extension not in IMPORT_FORMAT_EXTENSIONS:
+                raise serializers.ValidationError(
+                    {"file_format": "Cannot infer the format of this file."}
+                )
+            attrs["file_format"] = IMPORT_FORMAT_EXTENSIONS[extension]
+        return attrs
+
+
+class BookImportErrorSerializer(serializers.Serializer):
+    row = serializers.IntegerField()
+    errors = serializers.JSONField()
+
+
+class BookImportReportSerializer(serializers.Serializer):
+    processed = serializers.IntegerField()
+    imported = serializers.IntegerField()
+    failed = serializers.IntegerField()
+    errors = BookImportErrorSerializer(many=True)
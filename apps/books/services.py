@@ -0,0 +1,54 @@
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import Book
+
+
+def _per_book(counts: dict[int, int]) -> Case:
+    return Case(
+        *(
+            When(pk=book_id, then=Value(count))
+            for book_id, count in counts.items()
+        ),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def reserve_copies(counts: dict[int, int]) -> bool:
+    """
+    Take copies of several books out of inventory in one UPDATE.
+
+    `counts` maps book ids to the number of copies wanted. The statement
+    only touches books that still have enough stock, so concurrent
+    checkouts can neither lose updates nor oversell. Returns False when
+    any book is short; the caller must then roll back its transaction,
+    since the books that did have stock were already decremented.
+    """
+    in_stock = Q()
+    for book_id, count in counts.items():
+        in_stock |= Q(pk=book_id, inventory__gte=count)
+
+    updated = Book.objects.filter(in_stock).update(
+        inventory=F("inventory") - _per_book(counts),
+        updated_at=timezone.now(),
+    )
+    return updated == len(counts)
+
+
+def reserve_copy(book_id: int) -> bool:
+    """Take one copy of a book out of inventory, see `reserve_copies`."""
+    return reserve_copies({book_id: 1})
+
+
+def release_copies(counts: dict[int, int]) -> None:
+    """Put copies of several books back into inventory in one UPDATE."""
+    Book.objects.filter(pk__in=counts).update(
+        inventory=F("inventory") + _per_book(counts),
+        updated_at=timezone.now(),
+    )
+
+
+def release_copy(book_id: int) -> None:
+    """Put one copy of a book back into inventory."""
+    release_copies({book_id: 1})
@@ -1,14 +1,27 @@
+import base64
+import os
+import tempfile
 from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
+from redis.exceptions import ConnectionError as RedisConnectionError
 from rest_framework.test import APIClient
 
 from apps.books.models import Book
 from apps.books.serializers import BookSerializer
+from library_service.pagination import OptionalCursorPagination
 
 BOOK_URL = reverse("books:book-list")
+IMPORT_URL = reverse("books:book-bulk-import")
 
 
 def detail_url(book_id: int):
@@ -36,6 +49,9 @@ class UnauthenticatedBookApiTests(TestCase):
             daily_fee=1.49,
         )
 
+    def setUp(self):
+        cache.clear()
+
     def test_list_books_succeeds(self):
         """Test retrieving a list of books is successful"""
         res = self.client.get(BOOK_URL)
@@ -45,6 +61,18 @@ class UnauthenticatedBookApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data["results"], serializer.data)
 
+    def test_list_books_fast_path_matches_serializer(self):
+        """Test the values() list path renders the serializer's bytes"""
+        for params in ({}, {"pagination": "cursor"}):
+            with override_settings(FAST_LIST_SERIALIZATION=False):
+                expected = self.client.get(BOOK_URL, params)
+            cache.clear()
+            res = self.client.get(BOOK_URL, params)
+            cache.clear()
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.content, expected.content)
+
     def test_retrieve_book_detail_succeeds(self):
         """Test retrieving book detail is successful"""
         url = detail_url(self.book1.id)
@@ -54,6 +82,96 @@ class UnauthenticatedBookApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_list_books_served_from_cache(self):
+        """Test repeated list requests are answered from the cache"""
+        first = self.client.get(BOOK_URL)
+        second = self.client.get(BOOK_URL)
+
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(first.data, second.data)
+
+    def test_list_books_without_cache_backend(self):
+        """Test the catalog is served from the database if Redis is down"""
+        down = mock.Mock(
+            **{
+                f"{method}.side_effect": RedisConnectionError
+                for method in ("get", "get_many", "set", "add", "incr")
+            }
+        )
+        with (
+            mock.patch("library_service.cache.cache", down),
+            self.assertLogs("library_service.cache", "WARNING"),
+        ):
+            res = self.client.get(BOOK_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual(len(res.data["results"]), 2)
+
+    def test_retrieve_book_not_modified(self):
+        """Test a matching If-None-Match is answered with 304"""
+        url = detail_url(self.book1.id)
+        res = self.client.get(url)
+        res_cached = self.client.get(url, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res_cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res_cached["ETag"], res["ETag"])
+
+    def test_list_books_not_modified(self):
+        """Test an unchanged list is answered with 304"""
+        res = self.client.get(BOOK_URL)
+        res_cached = self.client.get(BOOK_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(res_cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_books_cursor_pagination(self):
+        """Test clients can opt in to cursor pagination"""
+        res = self.client.get(BOOK_URL, {"pagination": "cursor"})
+        titles = [book["title"] for book in res.data["results"]]
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", res.data)
+        self.assertIsNone(res.data["next"])
+        self.assertEqual(titles, ["Another Book", "Test Book 1"])
+
+    @mock.patch.object(OptionalCursorPagination, "page_size", 1)
+    def test_cursor_pages_follow_list_order_across_ties(self):
+        """Test cursor pages keep the (title, id) order of the list"""
+        duplicate = Book.objects.create(
+            title="Test Book 1",
+            author="Other Author",
+            cover="SOFT",
+            inventory=1,
+            daily_fee=1.00,
+        )
+        expected = [self.book2.id, self.book1.id, duplicate.id]
+
+        ids = []
+        url, params = BOOK_URL, {"pagination": "cursor"}
+        while url:
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids += [book["id"] for book in res.data["results"]]
+            url, params = res.data["next"], None
+        self.assertEqual(ids, expected)
+
+        ids = []
+        url = res.data["previous"]
+        while url:
+            res = self.client.get(url)
+            ids = [book["id"] for book in res.data["results"]] + ids
+            url = res.data["previous"]
+        self.assertEqual(ids, expected[:-1])
+
+    def test_invalid_cursor_is_not_found(self):
+        """Test a tampered cursor is answered with 404"""
+        cursor = base64.b64encode(b"p=%5B%22x%22%5D").decode()
+        res = self.client.get(BOOK_URL, {"cursor": cursor})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_create_book_unauthenticated_fails(self):
         """Test creating a book without authentication fails"""
         payload = {
@@ -67,10 +185,71 @@ class UnauthenticatedBookApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@skipUnless(connection.vendor == "postgresql", "Search requires Postgres")
+class BookSearchApiTests(TestCase):
+    """Test the full-text and trigram book search"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = APIClient()
+        cls.pragmatic = Book.objects.create(
+            title="The Pragmatic Programmer",
+            author="David Thomas",
+            cover="SOFT",
+            inventory=2,
+            daily_fee=1.00,
+        )
+        cls.clean_code = Book.objects.create(
+            title="Clean Code",
+            author="Robert Martin",
+            cover="HARD",
+            inventory=4,
+            daily_fee=1.50,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_search_by_title_word(self):
+        """Test searching by a word of the title finds the book"""
+        res = self.client.get(BOOK_URL, {"search": "programmer"})
+        ids = [book["id"] for book in res.data["results"]]
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(ids, [self.pragmatic.id])
+
+    def test_search_by_author(self):
+        """Test searching by author name finds the book"""
+        res = self.client.get(BOOK_URL, {"search": "martin"})
+        ids = [book["id"] for book in res.data["results"]]
+
+        self.assertEqual(ids, [self.clean_code.id])
+
+    def test_search_tolerates_typos(self):
+        """Test a misspelled term still matches through trigrams"""
+        res = self.client.get(BOOK_URL, {"search": "pragmatc"})
+        ids = [book["id"] for book in res.data["results"]]
+
+        self.assertIn(self.pragmatic.id, ids)
+        self.assertNotIn(self.clean_code.id, ids)
+
+    def test_search_keeps_relevance_order_with_cursor_mode(self):
+        """Test cursor mode is ignored so results stay ranked"""
+        res = self.client.get(
+            BOOK_URL, {"search": "pragmatic", "pagination": "cursor"}
+        )
+        ids = [book["id"] for book in res.data["results"]]
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("count", res.data)
+        self.assertEqual(ids[0], self.pragmatic.id)
+
+
 class AuthenticatedBookApiTests(TestCase):
     """Test book API features for a regular authenticated user"""
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             email="user@test.com", password="password123"
@@ -107,6 +286,7 @@ class AdminBookApiTests(TestCase):
     """Test book API features for an admin user"""
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.admin_user = get_user_model().objects.create_superuser(
             email="admin@test.com", password="password123"
@@ -164,9 +344,103 @@ class AdminBookApiTests(TestCase):
         )
         self.assertEqual(self.book.author, "Admin Author")
 
+    def test_update_book_invalidates_cached_detail(self):
+        """Test that updating a book drops its cached detail payload"""
+        url = detail_url(self.book.id)
+        self.client.get(url)
+        self.client.patch(url, {"title": "Fresh Title"})
+        res = self.client.get(url)
+
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual(res.data["title"], "Fresh Title")
+
+    def test_update_book_changes_etag(self):
+        """Test that a stale ETag yields the updated book"""
+        url = detail_url(self.book.id)
+        etag = self.client.get(url)["ETag"]
+        self.client.patch(url, {"inventory": 7})
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res["ETag"], etag)
+        self.assertEqual(res.data["inventory"], 7)
+
     def test_delete_book_succeeds(self):
         """Test that an admin can delete a book"""
         url = detail_url(self.book.id)
         res = self.client.delete(url)
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Book.objects.filter(id=self.book.id).exists())
+
+    def test_bulk_import_csv_upserts_and_reports_errors(self):
+        """Test a CSV import upserts valid rows and reports invalid ones"""
+        content = (
+            "title,author,cover,inventory,daily_fee\n"
+            "Admin Book,Admin Author,HARD,25,5.00\n"
+            "Imported Book,Supplier,SOFT,3,1.25\n"
+            "Broken Book,Supplier,PAPER,-1,1.00\n"
+        )
+        upload = SimpleUploadedFile(
+            "books.csv", content.encode(), content_type="text/csv"
+        )
+        res = self.client.post(IMPORT_URL, {"file": upload})
+        self.book.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["processed"], 3)
+        self.assertEqual(res.data["imported"], 2)
+        self.assertEqual(res.data["failed"], 1)
+        self.assertEqual(res.data["errors"][0]["row"], 3)
+        self.assertEqual(self.book.inventory, 25)
+        self.assertTrue(Book.objects.filter(title="Imported Book").exists())
+
+    def test_bulk_import_counts_repeated_rows(self):
+        """Test a book repeated in one chunk is upserted from its last row"""
+        content = (
+            "title,author,cover,inventory,daily_fee\n"
+            "Twice Book,Supplier,SOFT,3,1.25\n"
+            "Twice Book,Supplier,SOFT,5,1.25\n"
+        )
+        upload = SimpleUploadedFile(
+            "books.csv", content.encode(), content_type="text/csv"
+        )
+        res = self.client.post(IMPORT_URL, {"file": upload})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["processed"], 2)
+        self.assertEqual(res.data["imported"], 2)
+        self.assertEqual(res.data["failed"], 0)
+        self.assertEqual(Book.objects.get(title="Twice Book").inventory, 5)
+
+    def test_bulk_import_reports_undecodable_file(self):
+        """Test an upload that is not UTF-8 is reported, not a server error"""
+        content = (
+            "title,author,cover,inventory,daily_fee\n"
+            "Good Book,Supplier,SOFT,3,1.25\n"
+        ).encode() + b"Caf\xe9,Supplier,SOFT,1,1.00\n"
+        upload = SimpleUploadedFile(
+            "books.csv", content, content_type="text/csv"
+        )
+        res = self.client.post(IMPORT_URL, {"file": upload})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["failed"], 1)
+        self.assertIn("UTF-8", str(res.data["errors"][0]["errors"]))
+
+    def test_import_books_command_ndjson(self):
+        """Test the management command imports NDJSON and skips bad lines"""
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".ndjson", delete=False
+        ) as feed:
+            feed.write(
+                '{"title": "Feed Book", "author": "Supplier", '
+                '"cover": "HARD", "inventory": 4, "daily_fee": "2.00"}\n'
+                "not json\n"
+            )
+        self.addCleanup(os.remove, feed.name)
+
+        out = StringIO()
+        call_command("import_books", feed.name, stdout=out, stderr=StringIO())
+
+        self.assertIn("1 imported, 1 failed", out.getvalue())
+        self.assertTrue(Book.objects.filter(title="Feed Book").exists())
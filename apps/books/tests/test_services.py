@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipUnless
+
+from django.db import connection, connections
+from django.test import TransactionTestCase
+
+from apps.books.models import Book
+from apps.books.services import release_copy, reserve_copy
+
+
+class InventoryServiceTests(TransactionTestCase):
+    def setUp(self):
+        self.book = Book.objects.create(
+            title="Popular Book",
+            author="Author",
+            cover="HARD",
+            inventory=1,
+            daily_fee=1.00,
+        )
+
+    def test_reserve_copy_out_of_stock(self):
+        """Test reserving the last copy succeeds exactly once"""
+        self.assertTrue(reserve_copy(self.book.id))
+        self.assertFalse(reserve_copy(self.book.id))
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 0)
+
+    def test_release_copy(self):
+        """Test releasing a copy increases inventory"""
+        release_copy(self.book.id)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 2)
+
+    @skipUnless(
+        connection.vendor == "postgresql",
+        "Concurrent writers require Postgres",
+    )
+    def test_concurrent_reservations_never_oversell(self):
+        """Test many threads checking out one book never oversell it"""
+        stock, workers, attempts = 25, 16, 200
+        Book.objects.filter(pk=self.book.id).update(inventory=stock)
+
+        def checkout(_: int) -> bool:
+            try:
+                return reserve_copy(self.book.id)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(checkout, range(attempts)))
+
+        self.book.refresh_from_db()
+        self.assertEqual(sum(results), stock)
+        self.assertEqual(self.book.inventory, 0)
@@ -1,13 +1,149 @@
-from rest_framework import viewsets
+import io
+from datetime import datetime
+from typing import Callable
 
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import HttpResponseBase
+from django.utils import timezone
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from library_service.cache import query_params_digest
+from library_service.conditional import conditional_response
+from library_service.fastlist import FastListMixin
+from .cache import catalog_cache, invalidate_catalog
+from .filters import BookSearchFilter
+from .importers import import_books
 from .models import Book
 from .permissions import IsAdminUserOrReadOnly
 from .schemas import book_schema
-from .serializers import BookSerializer
+from .serializers import BookSerializer, BookImportUploadSerializer
 
 
 @book_schema
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = (IsAdminUserOrReadOnly,)
+    filter_backends = (BookSearchFilter,)
+    cursor_ordering = ("title", "id")
+
+    def _cached_response(
+        self,
+        key: tuple,
+        get_response: Callable[[], Response],
+        last_modified: datetime | None = None,
+        timeout: int | None = None,
+    ) -> HttpResponseBase:
+        """
+        Serve a catalog payload from the cache with conditional GET support.
+
+        Each entry remembers when it was built, or the `updated_at` of the
+        book it renders, and that timestamp is its ETag/Last-Modified
+        validator. An entry older than `last_modified` counts as a miss.
+        """
+        entry = catalog_cache.get(*key)
+        hit = entry is not None and (
+            last_modified is None or entry["last_modified"] == last_modified
+        )
+
+        if not hit:
+            response = get_response()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = {
+                "data": response.data,
+                "last_modified": last_modified or timezone.now(),
+            }
+            catalog_cache.set(entry, *key, timeout=timeout)
+
+        response = conditional_response(
+            self.request,
+            entry["last_modified"],
+            lambda: Response(entry["data"]),
+            *key,
+        )
+        response["X-Cache"] = "HIT" if hit else "MISS"
+        return response
+
+    def filter_queryset(self, queryset: QuerySet) -> QuerySet:
+        queryset = super().filter_queryset(queryset)
+        # Search results keep their relevance order and numbered pages.
+        if BookSearchFilter.get_search_term(self.request):
+            self.cursor_ordering = None
+        return queryset
+
+    def list(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        return self._cached_response(
+            ("list", query_params_digest(request.query_params)),
+            lambda: super(BookViewSet, self).list(request, *args, **kwargs),
+            timeout=settings.BOOK_LIST_CACHE_TIMEOUT,
+        )
+
+    def retrieve(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        pk = str(self.kwargs[self.lookup_field])
+        updated_at = None
+        if pk.isdigit():
+            updated_at = (
+                Book.objects.filter(pk=pk)
+                .values_list("updated_at", flat=True)
+                .first()
+            )
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        return self._cached_response(
+            ("detail", int(pk)),
+            lambda: super(BookViewSet, self).retrieve(
+                request, *args, **kwargs
+            ),
+            last_modified=updated_at,
+        )
+
+    def perform_create(self, serializer: BookSerializer) -> None:
+        super().perform_create(serializer)
+        invalidate_catalog()
+
+    def perform_update(self, serializer: BookSerializer) -> None:
+        super().perform_update(serializer)
+        invalidate_catalog()
+
+    def perform_destroy(self, instance: Book) -> None:
+        super().perform_destroy(instance)
+        invalidate_catalog()
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="cache-stats",
+        permission_classes=[IsAdminUser],
+    )
+    def cache_stats(self, request: Request) -> Response:
+        """Report catalog cache hit/miss counters."""
+        return Response(catalog_cache.stats())
+
+    @action(
+        detail=False,
+        methods=["POST"],
+        url_path="import",
+        permission_classes=[IsAdminUser],
+        parser_classes=[MultiPartParser],
+    )
+    def bulk_import(self, request: Request) -> Response:
+        """Upsert books from an uploaded CSV or NDJSON file."""
+        serializer = BookImportUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        upload = serializer.validated_data["file"]
+        lines = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        report = import_books(
+            lines,
+            serializer.validated_data["file_format"],
+            chunk_size=settings.BOOK_IMPORT_CHUNK_SIZE,
+        )
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
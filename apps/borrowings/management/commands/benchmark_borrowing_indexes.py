@@ -0,0 +1,195 @@
+import random
+import re
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.base_user import AbstractBaseUser
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from apps.books.models import Book
+from apps.borrowings.models import Borrowing
+
+BENCHMARK_INDEXES = (
+    "borrowing_user_borrow_date_idx",
+    "borrowing_active_due_idx",
+)
+LOAN_DAYS = 14
+# Borrowings older than this are mostly returned; a few stay overdue.
+ACTIVE_DAYS = 30
+OVERDUE_SHARE = 0.02
+INDEX_SCAN = re.compile(
+    r"Index (?:Only )?Scan (?:Backward )?(?:using|on) (\w+)"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed borrowings inside a rolled-back transaction and print the "
+        "EXPLAIN ANALYZE plans of the active/overdue borrowing queries "
+        "without and with their indexes."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--borrowings", type=int, default=100_000)
+        parser.add_argument("--users", type=int, default=1_000)
+        parser.add_argument("--books", type=int, default=500)
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options) -> None:
+        if connection.vendor != "postgresql":
+            raise CommandError("This benchmark requires PostgreSQL.")
+
+        rng = random.Random(options["seed"])
+        indexes = [
+            index
+            for index in Borrowing._meta.indexes
+            if index.name in BENCHMARK_INDEXES
+        ]
+
+        # Nothing is kept: the seeded rows and the dropped indexes are
+        # rolled back together at the end.
+        with transaction.atomic():
+            user = self.seed(rng, **options)
+            # Run the deferred foreign key checks of the seeded rows now;
+            # Postgres refuses index DDL while they are pending.
+            with connection.cursor() as cursor:
+                cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.remove_index(Borrowing, index)
+            self.report("Without indexes", user)
+
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.add_index(Borrowing, index)
+            self.report("With indexes", user)
+
+            transaction.set_rollback(True)
+
+    def seed(self, rng: random.Random, **options) -> AbstractBaseUser:
+        """Insert users, books and borrowings; return a sample user."""
+        User = get_user_model()
+        users = User.objects.bulk_create(
+            User(email=f"benchmark-{i}@example.com", password="!")
+            for i in range(options["users"])
+        )
+        books = Book.objects.bulk_create(
+            Book(
+                title=f"Benchmark book {i}",
+                author="Benchmark",
+                cover=Book.CoverChoices.HARD,
+                inventory=options["borrowings"],
+                daily_fee=1,
+            )
+            for i in range(options["books"])
+        )
+
+        today = timezone.now().date()
+        days = options["days"]
+        per_day = max(options["borrowings"] // days, 1)
+        for age in range(days):
+            self.seed_day(
+                rng, users, books, today - timedelta(days=age), per_day
+            )
+
+        self.stdout.write(
+            f"Seeded {len(users)} users, {len(books)} books and "
+            f"{per_day * days} borrowings."
+        )
+        return rng.choice(users)
+
+    def seed_day(
+        self,
+        rng: random.Random,
+        users: list,
+        books: list[Book],
+        borrow_date: date,
+        count: int,
+    ) -> None:
+        # borrow_date is auto_now_add, so rows are inserted as of today
+        # and moved back to their borrow date afterwards.
+        borrowings = Borrowing.objects.bulk_create(
+            Borrowing(
+                user=rng.choice(users),
+                book=rng.choice(books),
+                expected_return_date=(
+                    timezone.now().date() + timedelta(days=LOAN_DAYS)
+                ),
+            )
+            for _ in range(count)
+        )
+        ids = [borrowing.id for borrowing in borrowings]
+        Borrowing.objects.filter(pk__in=ids).update(
+            borrow_date=borrow_date,
+            expected_return_date=borrow_date + timedelta(days=LOAN_DAYS),
+        )
+
+        age = (timezone.now().date() - borrow_date).days
+        if age < ACTIVE_DAYS:
+            return
+        returned = ids[: int(len(ids) * (1 - OVERDUE_SHARE))]
+        Borrowing.objects.filter(pk__in=returned).update(
+            actual_return_date=borrow_date + timedelta(days=LOAN_DAYS - 2)
+        )
+
+    def queries(self, user: AbstractBaseUser) -> dict[str, QuerySet]:
+        """The borrowing list and overdue queries as the app runs them."""
+        ordering = ("-borrow_date", "-id")
+        return {
+            "User's borrowings": Borrowing.objects.filter(user=user).order_by(
+                *ordering
+            )[:20],
+            "User's active borrowings": Borrowing.objects.filter(
+                user=user, actual_return_date__isnull=True
+            ).order_by(*ordering)[:20],
+            "Overdue borrowings": Borrowing.objects.filter(
+                expected_return_date__lte=timezone.now().date(),
+                actual_return_date__isnull=True,
+            ),
+        }
+
+    def report(self, title: str, user: AbstractBaseUser) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "ANALYZE "
+                + connection.ops.quote_name(Borrowing._meta.db_table)
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n{title}"))
+        for label, queryset in self.queries(user).items():
+            self.stdout.write(self.style.MIGRATE_LABEL(label))
+            plan = queryset.explain(analyze=True)
+            self.stdout.write(plan)
+            self.stdout.write(
+                "Indexes used: "
+                + (", ".join(self.used_indexes(plan)) or "none")
+                + "\n"
+            )
+
+    def used_indexes(self, plan: str) -> list[str]:
+        """
+        Names of the indexes scanned by an EXPLAIN text `plan`.
+
+        The index of a partition is reported as the index of the
+        partitioned table it was created from.
+        """
+        names = sorted(set(INDEX_SCAN.findall(plan)))
+        if not names:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT DISTINCT coalesce("
+                "pg_partition_root(name::regclass), name::regclass"
+                ")::text FROM unnest(%s::text[]) AS name",
+                [names],
+            )
+            return sorted(name for (name,) in cursor.fetchall())
@@ -0,0 +1,136 @@
+import time
+from datetime import timedelta
+from typing import Any, Callable
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import Serializer
+
+from apps.books.models import Book
+from apps.books.serializers import BookSerializer
+from apps.borrowings.models import Borrowing
+from apps.borrowings.serializers import (
+    BorrowingListAdminSerializer,
+    BorrowingListSerializer,
+)
+from apps.payments.models import Payment
+from apps.payments.serializers import PaymentListSerializer
+from library_service.fastlist import compile_renderer
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed rows inside a rolled-back transaction and compare the rows "
+        "per second rendered by the list serializers and by their values() "
+        "fast path, checking that both produce the same JSON."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--rows", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options) -> None:
+        # Nothing is kept: the seeded rows are rolled back at the end.
+        with transaction.atomic():
+            self.seed(options["rows"])
+            self.stdout.write(
+                f"{'Serializer':<30} {'serializer/s':>14} "
+                f"{'values/s':>14} {'speedup':>8}"
+            )
+            for serializer_class, queryset in self.cases():
+                self.compare(serializer_class, queryset, options["repeat"])
+            transaction.set_rollback(True)
+
+    def seed(self, rows: int) -> None:
+        user = get_user_model().objects.create_user(
+            email="benchmark@example.com", password="!"
+        )
+        books = Book.objects.bulk_create(
+            Book(
+                title=f"Benchmark book {i}",
+                author="Benchmark",
+                cover=Book.CoverChoices.HARD,
+                inventory=1,
+                daily_fee="1.50",
+            )
+            for i in range(rows)
+        )
+        borrowings = Borrowing.objects.bulk_create(
+            Borrowing(
+                user=user,
+                book=book,
+                expected_return_date=timezone.now().date()
+                + timedelta(days=14),
+            )
+            for book in books
+        )
+        Payment.objects.bulk_create(
+            Payment(
+                type=Payment.TypeChoices.PAYMENT,
+                borrowing=borrowing,
+                user=user,
+                money_to_pay="21.00",
+            )
+            for borrowing in borrowings
+        )
+        self.stdout.write(f"Seeded {rows} books, borrowings and payments.")
+
+    def cases(self) -> list[tuple[type[Serializer], QuerySet]]:
+        """The list querysets as the viewsets build them."""
+        borrowings = Borrowing.objects.select_related("book").order_by(
+            "-borrow_date", "-id"
+        )
+        return [
+            (BookSerializer, Book.objects.order_by("title", "id")),
+            (BorrowingListSerializer, borrowings),
+            (BorrowingListAdminSerializer, borrowings),
+            (
+                PaymentListSerializer,
+                Payment.objects.order_by("-id"),
+            ),
+        ]
+
+    def compare(
+        self,
+        serializer_class: type[Serializer],
+        queryset: QuerySet,
+        repeat: int,
+    ) -> None:
+        renderer = compile_renderer(serializer_class)
+
+        def serialize() -> list[dict[str, Any]]:
+            return serializer_class(queryset.all(), many=True).data
+
+        def render() -> list[dict[str, Any]]:
+            return renderer.render(queryset.values(*renderer.lookups))
+
+        expected = JSONRenderer().render(serialize())
+        if JSONRenderer().render(render()) != expected:
+            raise CommandError(
+                f"{serializer_class.__name__}: values() output differs."
+            )
+
+        rows = queryset.count()
+        serializer_rate = rows / self.best_time(serialize, repeat)
+        values_rate = rows / self.best_time(render, repeat)
+        self.stdout.write(
+            f"{serializer_class.__name__:<30} {serializer_rate:>14,.0f} "
+            f"{values_rate:>14,.0f} {values_rate / serializer_rate:>7.1f}x"
+        )
+
+    @staticmethod
+    def best_time(func: Callable[[], Any], repeat: int) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
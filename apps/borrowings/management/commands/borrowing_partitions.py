@@ -0,0 +1,62 @@
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+
+from apps.borrowings.partitions import (
+    detach_partitions,
+    ensure_partitions,
+    is_partitioned,
+)
+
+
+def month(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly borrowing partitions ahead of time and "
+        "optionally detach the old ones (PostgreSQL only)."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=settings.BORROWING_PARTITIONS_AHEAD,
+            help="Number of future months to create partitions for.",
+        )
+        parser.add_argument(
+            "--detach-before",
+            type=month,
+            metavar="YYYY-MM",
+            help=(
+                "Detach partitions of months before this one; the "
+                "detached tables are kept for archiving. Partitions with "
+                "unreturned or unpaid borrowings stay attached."
+            ),
+        )
+
+    def handle(self, *args, **options) -> None:
+        if not is_partitioned():
+            raise CommandError("The borrowing table is not partitioned.")
+
+        for partition in ensure_partitions(options["ahead"]):
+            self.stdout.write(f"Created {partition.name}")
+
+        if options["detach_before"] is None:
+            return
+
+        detached, kept = detach_partitions(options["detach_before"])
+        for partition in detached:
+            self.stdout.write(f"Detached {partition.name}")
+        for partition in kept:
+            self.stderr.write(
+                f"Kept {partition.name}: it has unreturned or unpaid "
+                f"borrowings."
+            )
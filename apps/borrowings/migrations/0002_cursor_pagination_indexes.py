@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_cursor_pagination_indexes'),
+        ('borrowings', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(fields=['-borrow_date', '-id'], name='borrowing_borrow_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:48
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CONCURRENTLY keeps the borrowings writable during the build, but
+    # cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('books', '0005_book_natural_key'),
+        ('borrowings', '0003_borrowing_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='borrowing',
+            index=models.Index(fields=['user', '-borrow_date', '-id'], name='borrowing_user_borrow_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='borrowing',
+            index=models.Index(condition=models.Q(('actual_return_date__isnull', True)), fields=['expected_return_date'], name='borrowing_active_due_idx'),
+        ),
+    ]
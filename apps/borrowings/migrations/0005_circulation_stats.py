@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_book_natural_key'),
+        ('borrowings', '0004_active_borrowing_indexes'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookCirculationStats',
+            fields=[
+                ('borrow_count', models.PositiveIntegerField(default=0)),
+                ('return_count', models.PositiveIntegerField(default=0)),
+                ('overdue_count', models.PositiveIntegerField(default=0)),
+                ('loan_days', models.PositiveBigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='circulation_stats', serialize=False, to='books.book')),
+            ],
+            options={
+                'verbose_name_plural': 'Book circulation stats',
+                'indexes': [models.Index(fields=['-borrow_count', 'book'], name='book_stats_borrow_count_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserCirculationStats',
+            fields=[
+                ('borrow_count', models.PositiveIntegerField(default=0)),
+                ('return_count', models.PositiveIntegerField(default=0)),
+                ('overdue_count', models.PositiveIntegerField(default=0)),
+                ('loan_days', models.PositiveBigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='circulation_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'User circulation stats',
+                'indexes': [models.Index(fields=['-borrow_count', 'user'], name='user_stats_borrow_count_idx')],
+            },
+        ),
+    ]
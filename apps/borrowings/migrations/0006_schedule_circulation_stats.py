@@ -0,0 +1,52 @@
+from datetime import datetime, time, timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+TASK = "apps.borrowings.tasks.rebuild_circulation_stats"
+NIGHTLY = "Rebuild circulation stats"
+INITIAL = "Initial circulation stats build"
+
+
+def schedule_rebuild(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    tomorrow = timezone.localdate() + timedelta(days=1)
+
+    Schedule.objects.update_or_create(
+        name=NIGHTLY,
+        defaults={
+            "func": TASK,
+            "schedule_type": "D",
+            "repeats": -1,
+            "next_run": timezone.make_aware(
+                datetime.combine(tomorrow, time(3, 0))
+            ),
+        },
+    )
+    # Fill the new rollups from the existing history right away.
+    Schedule.objects.update_or_create(
+        name=INITIAL,
+        defaults={
+            "func": TASK,
+            "schedule_type": "O",
+            "repeats": 1,
+            "next_run": timezone.now(),
+        },
+    )
+
+
+def unschedule_rebuild(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name__in=[NIGHTLY, INITIAL]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowings", "0005_circulation_stats"),
+        ("django_q", "0018_task_success_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_rebuild, unschedule_rebuild),
+    ]
@@ -0,0 +1,145 @@
+from datetime import date
+
+from django.db import migrations
+from django.utils import timezone
+
+TABLE = "borrowings_borrowing"
+OLD_TABLE = "borrowings_borrowing_old"
+SCHEDULE = "Create borrowing partitions"
+# Months created ahead of today; the monthly schedule keeps it up after.
+MONTHS_AHEAD = 3
+
+
+# Copies of the apps.borrowings.partitions helpers as of this migration.
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def rebuild_table(schema_editor, partitioned: bool) -> None:
+    """
+    Recreate the borrowing table, partitioned by month of borrow_date or
+    not, keeping its rows, ids, check constraints, indexes and foreign keys.
+
+    A partitioned table can only have a primary key that includes the
+    partition key, so it becomes (id, borrow_date); the ORM keeps using id,
+    which the sequence keeps unique.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = %s "
+            "AND indexname <> %s",
+            [TABLE, f"{TABLE}_pkey"],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}")
+        cursor.execute(
+            f"CREATE TABLE {TABLE} "
+            f"(LIKE {OLD_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            + (" PARTITION BY RANGE (borrow_date)" if partitioned else "")
+        )
+        # The id generator is owned by the old table and goes with it.
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id DROP DEFAULT")
+
+        if partitioned:
+            cursor.execute(f"SELECT min(borrow_date) FROM {OLD_TABLE}")
+            today = timezone.now().date()
+            month = month_start(cursor.fetchone()[0] or today)
+            last = add_months(month_start(today), MONTHS_AHEAD)
+            while month <= last:
+                end = add_months(month, 1)
+                cursor.execute(
+                    f"CREATE TABLE {TABLE}_p{month:%Y_%m} "
+                    f"PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)",
+                    [month, end],
+                )
+                month = end
+            cursor.execute(
+                f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT"
+            )
+
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}")
+        cursor.execute(f"DROP TABLE {OLD_TABLE}")
+
+        if partitioned:
+            cursor.execute(
+                f"CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id"
+            )
+            cursor.execute(
+                f"ALTER TABLE {TABLE} ALTER COLUMN id "
+                f"SET DEFAULT nextval('{TABLE}_id_seq')"
+            )
+            primary_key = "id, borrow_date"
+        else:
+            cursor.execute(
+                f"ALTER TABLE {TABLE} ALTER COLUMN id "
+                f"ADD GENERATED BY DEFAULT AS IDENTITY"
+            )
+            primary_key = "id"
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            f"coalesce(max(id), 0) + 1, false) FROM {TABLE}",
+            [TABLE],
+        )
+
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey "
+            f"PRIMARY KEY ({primary_key})"
+        )
+        for index in indexes:
+            cursor.execute(index.replace(" ON ONLY ", " ON "))
+        for name, definition in foreign_keys:
+            cursor.execute(
+                f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}"
+            )
+
+
+def partition_table(apps, schema_editor):
+    rebuild_table(schema_editor, partitioned=True)
+
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.update_or_create(
+        name=SCHEDULE,
+        defaults={
+            "func": "apps.borrowings.tasks.create_borrowing_partitions",
+            "schedule_type": "M",
+            "repeats": -1,
+            "next_run": timezone.now(),
+        },
+    )
+
+
+def unpartition_table(apps, schema_editor):
+    rebuild_table(schema_editor, partitioned=False)
+
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name=SCHEDULE).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowings", "0006_schedule_circulation_stats"),
+        ("payments", "0006_payment_borrowing_without_db_constraint"),
+        ("django_q", "0018_task_success_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, unpartition_table),
+    ]
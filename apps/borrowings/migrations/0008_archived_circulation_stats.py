@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_book_natural_key'),
+        ('borrowings', '0007_partition_borrowing'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBookCirculationStats',
+            fields=[
+                ('borrow_count', models.PositiveIntegerField(default=0)),
+                ('return_count', models.PositiveIntegerField(default=0)),
+                ('overdue_count', models.PositiveIntegerField(default=0)),
+                ('loan_days', models.PositiveBigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archived_circulation_stats', serialize=False, to='books.book')),
+            ],
+            options={
+                'verbose_name_plural': 'Archived book circulation stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedUserCirculationStats',
+            fields=[
+                ('borrow_count', models.PositiveIntegerField(default=0)),
+                ('return_count', models.PositiveIntegerField(default=0)),
+                ('overdue_count', models.PositiveIntegerField(default=0)),
+                ('loan_days', models.PositiveBigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archived_circulation_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Archived user circulation stats',
+            },
+        ),
+    ]
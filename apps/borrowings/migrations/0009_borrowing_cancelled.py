@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:48
+
+from django.db import migrations, models
+
+
+def flag_cancelled(apps, schema_editor):
+    """
+    Flag the borrowings the expiry sweep already closed. Only the sweep
+    expires rental fee payments, and it closes their borrowings with them;
+    the nightly rebuild then takes them out of the circulation stats.
+    """
+    Borrowing = apps.get_model("borrowings", "Borrowing")
+    Payment = apps.get_model("payments", "Payment")
+    Borrowing.objects.filter(
+        pk__in=Payment.objects.filter(
+            type="PAYMENT", status="EXPIRED"
+        ).values("borrowing_id"),
+        actual_return_date__isnull=False,
+    ).update(cancelled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowings', '0008_archived_circulation_stats'),
+        ('payments', '0012_payment_expiry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrowing',
+            name='cancelled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(flag_cancelled, migrations.RunPython.noop),
+    ]
@@ -6,9 +6,18 @@ from apps.books.models import Book
 
 
 class Borrowing(models.Model):
+    # On PostgreSQL the table is partitioned by month of borrow_date (see
+    # apps/borrowings/partitions.py) and its primary key is (id,
+    # borrow_date). The ORM still uses id; aggregates over a borrowing's
+    # related rows need subqueries, since GROUP BY id alone is rejected.
+    # Only queries bounded on borrow_date skip partitions; the others,
+    # like the active borrowing ones, probe the indexes of each.
     borrow_date = models.DateField(auto_now_add=True)
     expected_return_date = models.DateField()
     actual_return_date = models.DateField(null=True, blank=True)
+    # Closed because its checkout was abandoned: actual_return_date is the
+    # day it was closed, but the book was never lent or returned.
+    cancelled = models.BooleanField(default=False)
     book = models.ForeignKey(
         Book, on_delete=models.CASCADE, related_name="borrowings"
     )
@@ -17,11 +26,30 @@ class Borrowing(models.Model):
         on_delete=models.CASCADE,
         related_name="borrowings",
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-borrow_date"]
         verbose_name = "Borrowing"
         verbose_name_plural = "Borrowings"
+        indexes = [
+            models.Index(
+                fields=["-borrow_date", "-id"],
+                name="borrowing_borrow_date_id_idx",
+            ),
+            # A user's borrowings, newest first (the list endpoint).
+            models.Index(
+                fields=["user", "-borrow_date", "-id"],
+                name="borrowing_user_borrow_date_idx",
+            ),
+            # Active borrowings by due date (overdue checks). Returned
+            # borrowings, the bulk of the table, are left out.
+            models.Index(
+                fields=["expected_return_date"],
+                condition=Q(actual_return_date__isnull=True),
+                name="borrowing_active_due_idx",
+            ),
+        ]
         constraints = [
             CheckConstraint(
                 check=Q(expected_return_date__gt=F("borrow_date")),
@@ -36,3 +64,98 @@ class Borrowing(models.Model):
 
     def __str__(self):
         return f"Borrowed {self.book.title} by {self.user.email}"
+
+
+class CirculationStats(models.Model):
+    """
+    Rollup of circulation numbers, kept up to date incrementally as
+    borrowings are created and returned and rebuilt nightly.
+    """
+
+    borrow_count = models.PositiveIntegerField(default=0)
+    return_count = models.PositiveIntegerField(default=0)
+    # Returned after the expected return date.
+    overdue_count = models.PositiveIntegerField(default=0)
+    # Total length of returned loans, for the average loan length.
+    loan_days = models.PositiveBigIntegerField(default=0)
+    # Rental fees and fines charged.
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def average_loan_days(self) -> float | None:
+        if not self.return_count:
+            return None
+        return round(self.loan_days / self.return_count, 2)
+
+    @property
+    def overdue_rate(self) -> float | None:
+        if not self.return_count:
+            return None
+        return round(self.overdue_count / self.return_count, 4)
+
+
+class BookCirculationStats(CirculationStats):
+    book = models.OneToOneField(
+        Book,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="circulation_stats",
+    )
+
+    class Meta:
+        verbose_name_plural = "Book circulation stats"
+        indexes = [
+            models.Index(
+                fields=["-borrow_count", "book"],
+                name="book_stats_borrow_count_idx",
+            ),
+        ]
+
+
+class UserCirculationStats(CirculationStats):
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="circulation_stats",
+    )
+
+    class Meta:
+        verbose_name_plural = "User circulation stats"
+        indexes = [
+            models.Index(
+                fields=["-borrow_count", "user"],
+                name="user_stats_borrow_count_idx",
+            ),
+        ]
+
+
+class ArchivedBookCirculationStats(CirculationStats):
+    """Circulation of a book's borrowings in detached partitions."""
+
+    book = models.OneToOneField(
+        Book,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="archived_circulation_stats",
+    )
+
+    class Meta:
+        verbose_name_plural = "Archived book circulation stats"
+
+
+class ArchivedUserCirculationStats(CirculationStats):
+    """Circulation of a user's borrowings in detached partitions."""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="archived_circulation_stats",
+    )
+
+    class Meta:
+        verbose_name_plural = "Archived user circulation stats"
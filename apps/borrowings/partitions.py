@@ -0,0 +1,169 @@
+import re
+from dataclasses import dataclass
+from datetime import date
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.payments.models import AccruedFine, Payment
+from .models import Borrowing
+from .stats import archive_stats
+
+# The borrowing table is range partitioned by month of `borrow_date` on
+# PostgreSQL (migration 0007). Rows of a month without a partition land in
+# the default partition, so inserts never fail. The planner only skips
+# partitions for queries bounded on `borrow_date`; queries on other
+# columns, like the active borrowing ones, use the indexes of every
+# partition.
+TABLE = Borrowing._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+PARTITION_NAME = re.compile(rf"^{TABLE}_p(\d{{4}})_(\d{{2}})$")
+
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    start: date
+    end: date
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_for(month: date) -> Partition:
+    start = month_start(month)
+    return Partition(f"{TABLE}_p{start:%Y_%m}", start, add_months(start, 1))
+
+
+def is_partitioned() -> bool:
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table "
+            "WHERE partrelid = to_regclass(%s)",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions() -> list[Partition]:
+    """Return the attached monthly partitions, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT inhrelid::regclass::text FROM pg_inherits "
+            "WHERE inhparent = to_regclass(%s)",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        if match := PARTITION_NAME.match(name):
+            year, month = map(int, match.groups())
+            partitions.append(partition_for(date(year, month, 1)))
+    return sorted(partitions, key=lambda partition: partition.start)
+
+
+def create_partitions(first: date, last: date) -> list[Partition]:
+    """
+    Create the monthly partitions from `first` to `last` (inclusive).
+
+    Existing partitions are skipped. Rows that were routed to the default
+    partition for a new month are moved into it.
+    """
+    existing = {partition.name for partition in list_partitions()}
+    created = []
+    month = month_start(first)
+    while month <= last:
+        partition = partition_for(month)
+        if partition.name not in existing:
+            _create_partition(partition)
+            created.append(partition)
+        month = add_months(month, 1)
+    return created
+
+
+def ensure_partitions(months_ahead: int) -> list[Partition]:
+    """Create the partitions from this month to `months_ahead` ahead."""
+    this_month = month_start(timezone.now().date())
+    return create_partitions(this_month, add_months(this_month, months_ahead))
+
+
+def _create_partition(partition: Partition) -> None:
+    quote = connection.ops.quote_name
+    bounds = [partition.start, partition.end]
+    in_range = "borrow_date >= %s AND borrow_date < %s"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Postgres refuses to attach a partition whose range still has
+        # rows in the default partition, so park them meanwhile.
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE borrowing_move "
+            f"(LIKE {quote(TABLE)}) ON COMMIT DROP"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} "
+            f"WHERE {in_range} RETURNING *) "
+            f"INSERT INTO borrowing_move SELECT * FROM moved",
+            bounds,
+        )
+        cursor.execute(
+            f"CREATE TABLE {quote(partition.name)} "
+            f"PARTITION OF {quote(TABLE)} FOR VALUES FROM (%s) TO (%s)",
+            bounds,
+        )
+        cursor.execute(
+            f"INSERT INTO {quote(TABLE)} SELECT * FROM borrowing_move"
+        )
+        cursor.execute("DROP TABLE borrowing_move")
+
+
+def detach_partitions(
+    before: date,
+) -> tuple[list[Partition], list[Partition]]:
+    """
+    Detach the partitions that end on or before `before`.
+
+    Partitions are kept while they hold borrowings that are unreturned,
+    or that have a pending payment or an accrued fine. Paid and expired
+    payments stay in place, pointing at the borrowings of the detached
+    table, which is kept in the database for archiving. The circulation
+    of a detached month moves to the archive rollups, so that rebuilding
+    the statistics keeps counting it. Returns the detached and the kept
+    partitions.
+    """
+    quote = connection.ops.quote_name
+    payments = quote(Payment._meta.db_table)
+    fines = quote(AccruedFine._meta.db_table)
+    detached, kept = [], []
+
+    for partition in list_partitions():
+        if partition.end > before:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT EXISTS (SELECT 1 FROM {quote(partition.name)} b "
+                f"WHERE b.actual_return_date IS NULL "
+                f"OR EXISTS (SELECT 1 FROM {payments} p "
+                f"WHERE p.borrowing_id = b.id AND p.status = %s) "
+                f"OR EXISTS (SELECT 1 FROM {fines} f "
+                f"WHERE f.borrowing_id = b.id))",
+                [Payment.StatusChoices.PENDING],
+            )
+            if cursor.fetchone()[0]:
+                kept.append(partition)
+                continue
+            archive_stats(partition.start, partition.end)
+            cursor.execute(
+                f"ALTER TABLE {quote(TABLE)} "
+                f"DETACH PARTITION {quote(partition.name)}"
+            )
+        detached.append(partition)
+    return detached, kept
@@ -1,12 +1,19 @@
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
+    OpenApiParameter,
     OpenApiResponse,
 )
+from library_service.idempotency import IDEMPOTENCY_KEY_PARAMETER
 from .serializers import (
     BorrowingListSerializer,
     BorrowingDetailSerializer,
     BorrowingCreateSerializer,
+    BorrowingCartSerializer,
+    BorrowingCartResultSerializer,
+    BorrowingBulkReturnSerializer,
+    BorrowingBulkReturnResultSerializer,
+    BookCirculationStatsSerializer,
 )
 
 borrowing_schema = extend_schema_view(
@@ -31,8 +38,28 @@ borrowing_schema = extend_schema_view(
     ),
     create=extend_schema(
         summary="Create a borrowing",
+        description=(
+            "Create a borrowing and its Stripe checkout session.\n\n"
+            "Send `Prefer: respond-async` to have the session created in the "
+            "background: the API then answers `202 Accepted` with a "
+            "`Location` header pointing to the payment, which the client "
+            "polls until its `session_url` is set."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="Prefer",
+                location=OpenApiParameter.HEADER,
+                required=False,
+                description="`respond-async` enables asynchronous checkout.",
+            ),
+            IDEMPOTENCY_KEY_PARAMETER,
+        ],
         request=BorrowingCreateSerializer,
-        responses={201: BorrowingDetailSerializer},
+        responses={
+            201: BorrowingDetailSerializer,
+            202: BorrowingDetailSerializer,
+            503: OpenApiResponse(description="Stripe is unavailable."),
+        },
     ),
     return_borrowing=extend_schema(
         summary="Return a borrowed book",
@@ -40,14 +67,104 @@ borrowing_schema = extend_schema_view(
             "Mark the borrowing as returned and increase the book inventory. "
             "If returned late, a fine payment session will be generated."
         ),
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
         responses={
             200: BorrowingDetailSerializer,
             400: OpenApiResponse(
-                description="This borrowing has already been returned."
+                description="This borrowing was returned or cancelled."
             ),
             403: OpenApiResponse(
                 description="You cannot return this borrowing."
             ),
+            503: OpenApiResponse(description="Stripe is unavailable."),
+        },
+    ),
+    cart=extend_schema(
+        summary="Borrow several books at once",
+        description=(
+            "Create a borrowing for every item in the cart, paid through "
+            "a single Stripe checkout session. Either all books are "
+            "reserved or none is. A book with a ready hold of the user is "
+            "checked out from the copy put aside for it."
+        ),
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
+        request=BorrowingCartSerializer,
+        responses={
+            201: BorrowingCartResultSerializer,
+            400: OpenApiResponse(
+                description="Invalid cart or a book is out of stock."
+            ),
+            503: OpenApiResponse(description="Stripe is unavailable."),
+        },
+    ),
+    bulk_return=extend_schema(
+        summary="Return several borrowings at once (staff only)",
+        description=(
+            "Mark a batch of borrowings as returned and restock their books. "
+            "Each borrowing is reported as `returned`, `already_returned` or "
+            "`not_found`; late returns get a fine payment whose Stripe "
+            "session is prepared in the background."
+        ),
+        request=BorrowingBulkReturnSerializer,
+        responses=BorrowingBulkReturnResultSerializer,
+    ),
+    stats=extend_schema(
+        summary="Circulation statistics (staff only)",
+        description=(
+            "Borrow counts, average loan length, overdue rate and revenue "
+            "(rental fees and fines charged) per book or per user, read "
+            "from precomputed rollups that are rebuilt nightly.\n\n"
+            "With `group=user` the rows carry `user_id`/`user_email` "
+            "instead of `book_id`/`book_title`."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="group",
+                required=False,
+                enum=["book", "user"],
+                description="Group statistics by book (default) or user.",
+            ),
+            OpenApiParameter(
+                name="book_id",
+                required=False,
+                description="Comma-separated book IDs (`group=book`).",
+            ),
+            OpenApiParameter(
+                name="user_id",
+                required=False,
+                description="Comma-separated user IDs (`group=user`).",
+            ),
+        ],
+        responses=BookCirculationStatsSerializer(many=True),
+    ),
+    export=extend_schema(
+        summary="Export borrowings (staff only)",
+        description=(
+            "Streams every matching borrowing as CSV or NDJSON in one "
+            "response, with constant memory use on the server."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="output",
+                required=False,
+                enum=["csv", "ndjson"],
+                description="Export format, CSV by default.",
+            ),
+            OpenApiParameter(
+                name="user_id",
+                required=False,
+                type=int,
+                description="Only borrowings of this user.",
+            ),
+            OpenApiParameter(
+                name="is_active",
+                required=False,
+                type=bool,
+                description="Only active or only completed borrowings.",
+            ),
+        ],
+        responses={
+            200: OpenApiResponse(description="A CSV or NDJSON attachment.")
         },
     ),
 )
@@ -1,12 +1,15 @@
+from collections import Counter
 from datetime import datetime
 
+from django.conf import settings
 from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
 from apps.books.serializers import BookSerializer
-from .models import Borrowing
+from .models import Borrowing, BookCirculationStats, UserCirculationStats
 from ..books.models import Book
+from ..holds.models import Hold
 from ..payments.serializers import PaymentListSerializer
 
 
@@ -21,6 +24,7 @@ class BorrowingListSerializer(serializers.ModelSerializer):
             "borrow_date",
             "expected_return_date",
             "actual_return_date",
+            "cancelled",
         )
 
 
@@ -48,6 +52,7 @@ class BorrowingDetailSerializer(serializers.ModelSerializer):
             "borrow_date",
             "expected_return_date",
             "actual_return_date",
+            "cancelled",
             "book",
             "payments",
         )
@@ -59,7 +64,16 @@ class BorrowingCreateSerializer(serializers.ModelSerializer):
         fields = ("book", "expected_return_date")
 
     def validate_book(self, value: Book) -> Book:
-        if value.inventory == 0:
+        # A copy put aside for the user's ready hold is not in inventory.
+        if (
+            value.inventory == 0
+            and not Hold.objects.filter(
+                user=self.context["request"].user,
+                book=value,
+                status=Hold.StatusChoices.READY,
+                ready_until__gte=timezone.now(),
+            ).exists()
+        ):
             raise ValidationError("This book is out of stock.")
         return value
 
@@ -69,3 +83,104 @@ class BorrowingCreateSerializer(serializers.ModelSerializer):
                 "Expected return date must be in the future."
             )
         return value
+
+
+class BorrowingCartSerializer(serializers.Serializer):
+    items = BorrowingCreateSerializer(many=True)
+
+    def validate_items(self, value: list[dict]) -> list[dict]:
+        if not value:
+            raise ValidationError("The cart is empty.")
+        if len(value) > settings.BORROWING_CART_MAX_ITEMS:
+            raise ValidationError(
+                "A cart holds at most "
+                f"{settings.BORROWING_CART_MAX_ITEMS} books."
+            )
+
+        books = {item["book"].id: item["book"] for item in value}
+        counts = Counter(item["book"].id for item in value)
+        # A copy put aside for the user's ready hold is not in inventory.
+        ready = set(
+            Hold.objects.filter(
+                user=self.context["request"].user,
+                book_id__in=counts,
+                status=Hold.StatusChoices.READY,
+                ready_until__gte=timezone.now(),
+            ).values_list("book_id", flat=True)
+        )
+        for book_id, count in counts.items():
+            if books[book_id].inventory + (book_id in ready) < count:
+                raise ValidationError(
+                    f"Not enough copies of '{books[book_id].title}' in stock."
+                )
+        return value
+
+
+class BorrowingCartResultSerializer(serializers.Serializer):
+    session_url = serializers.URLField()
+    borrowings = BorrowingDetailSerializer(many=True)
+
+
+class BorrowingBulkReturnSerializer(serializers.Serializer):
+    borrowing_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BORROWING_BULK_RETURN_MAX_ITEMS,
+    )
+
+
+class BorrowingReturnOutcomeSerializer(serializers.Serializer):
+    RETURNED = "returned"
+    ALREADY_RETURNED = "already_returned"
+    NOT_FOUND = "not_found"
+
+    id = serializers.IntegerField()
+    outcome = serializers.ChoiceField(
+        choices=(RETURNED, ALREADY_RETURNED, NOT_FOUND)
+    )
+    fine = serializers.DecimalField(
+        max_digits=10, decimal_places=2, allow_null=True
+    )
+
+
+class BorrowingBulkReturnResultSerializer(serializers.Serializer):
+    results = BorrowingReturnOutcomeSerializer(many=True)
+
+
+class CirculationStatsSerializer(serializers.ModelSerializer):
+    average_loan_days = serializers.FloatField(read_only=True, allow_null=True)
+    overdue_rate = serializers.FloatField(read_only=True, allow_null=True)
+
+    class Meta:
+        fields = (
+            "borrow_count",
+            "return_count",
+            "overdue_count",
+            "average_loan_days",
+            "overdue_rate",
+            "revenue",
+        )
+
+
+class BookCirculationStatsSerializer(CirculationStatsSerializer):
+    book_id = serializers.IntegerField(read_only=True)
+    book_title = serializers.CharField(source="book.title", read_only=True)
+
+    class Meta(CirculationStatsSerializer.Meta):
+        model = BookCirculationStats
+        fields = (
+            "book_id",
+            "book_title",
+        ) + CirculationStatsSerializer.Meta.fields
+
+
+class UserCirculationStatsSerializer(CirculationStatsSerializer):
+    user_id = serializers.IntegerField(read_only=True)
+    user_email = serializers.CharField(source="user.email", read_only=True)
+
+    class Meta(CirculationStatsSerializer.Meta):
+        model = UserCirculationStats
+        fields = (
+            "user_id",
+            "user_email",
+        ) + CirculationStatsSerializer.Meta.fields
@@ -0,0 +1,239 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    Q,
+    Sum,
+    Value,
+    When,
+)
+
+from apps.payments.models import Payment
+from library_service.db import consistent_snapshot
+from .models import (
+    ArchivedBookCirculationStats,
+    ArchivedUserCirculationStats,
+    BookCirculationStats,
+    Borrowing,
+    CirculationStats,
+    UserCirculationStats,
+)
+
+STAT_FIELDS = (
+    "borrow_count",
+    "return_count",
+    "overdue_count",
+    "loan_days",
+    "revenue",
+)
+LENT = Q(cancelled=False)
+RETURNED = Q(actual_return_date__isnull=False, cancelled=False)
+LOAN_DURATION = ExpressionWrapper(
+    F("actual_return_date") - F("borrow_date"), output_field=DurationField()
+)
+ROLLUPS = (
+    (BookCirculationStats, "book_id"),
+    (UserCirculationStats, "user_id"),
+)
+# Circulation of detached borrowing partitions, added to each rebuild.
+ARCHIVES = {
+    BookCirculationStats: ArchivedBookCirculationStats,
+    UserCirculationStats: ArchivedUserCirculationStats,
+}
+
+Deltas = dict[int, dict[str, int | Decimal]]
+
+
+def _apply(model: type[CirculationStats], deltas: Deltas) -> None:
+    """Add `deltas` to the rollup rows in a single UPDATE."""
+    if not deltas:
+        return
+
+    model.objects.bulk_create(
+        [model(pk=pk) for pk in deltas], ignore_conflicts=True
+    )
+    changes = {}
+    for name in STAT_FIELDS:
+        whens = [
+            When(pk=pk, then=Value(delta[name]))
+            for pk, delta in deltas.items()
+            if delta.get(name)
+        ]
+        if whens:
+            changes[name] = F(name) + Case(
+                *whens,
+                default=Value(0),
+                output_field=model._meta.get_field(name),
+            )
+    if changes:
+        model.objects.filter(pk__in=deltas).update(**changes)
+
+
+def _record(changes: Iterable[tuple[Borrowing, dict]]) -> None:
+    deltas = {model: defaultdict(dict) for model, _ in ROLLUPS}
+    for borrowing, change in changes:
+        for model, key in ROLLUPS:
+            delta = deltas[model][getattr(borrowing, key)]
+            for name, value in change.items():
+                delta[name] = delta.get(name, 0) + value
+
+    for model, _ in ROLLUPS:
+        _apply(model, deltas[model])
+
+
+def record_borrowings(
+    borrowings: Iterable[Borrowing], amounts: Iterable[Decimal]
+) -> None:
+    """Count new borrowings and the rental fees charged for them."""
+    _record(
+        (borrowing, {"borrow_count": 1, "revenue": amount})
+        for borrowing, amount in zip(borrowings, amounts)
+    )
+
+
+def _return_change(borrowing: Borrowing, revenue: Decimal) -> dict:
+    return {
+        "return_count": 1,
+        "overdue_count": int(
+            borrowing.actual_return_date > borrowing.expected_return_date
+        ),
+        "loan_days": (
+            borrowing.actual_return_date - borrowing.borrow_date
+        ).days,
+        "revenue": revenue,
+    }
+
+
+def record_returns(
+    borrowings: Iterable[Borrowing], fines: dict[int, Decimal]
+) -> None:
+    """Count returned borrowings; `fines` maps borrowing ids to fines."""
+    _record(
+        (borrowing, _return_change(borrowing, fines.get(borrowing.id, 0)))
+        for borrowing in borrowings
+    )
+
+
+def record_cancellations(
+    borrowings: Iterable[Borrowing], fees: dict[int, Decimal]
+) -> None:
+    """
+    Take back the borrowings closed because their checkout was abandoned
+    and the rental fees (`fees` maps borrowing ids to fees) they added.
+    They were never lent, so no return or loan days are counted.
+    """
+    _record(
+        (borrowing, {"borrow_count": -1, "revenue": -fees[borrowing.id]})
+        for borrowing in borrowings
+    )
+
+
+def _aggregate(
+    key: str, borrow_dates: tuple[date, date] | None = None
+) -> dict[int, dict]:
+    """
+    Compute every rollup row of one kind from the source tables, only
+    over the borrowings from `borrow_dates` (end excluded) if given.
+    """
+    borrowings = Borrowing.objects.all()
+    payments = Payment.objects.exclude(status=Payment.StatusChoices.EXPIRED)
+    if borrow_dates is not None:
+        start, end = borrow_dates
+        borrowings = borrowings.filter(
+            borrow_date__gte=start, borrow_date__lt=end
+        )
+        payments = payments.filter(
+            borrowing__borrow_date__gte=start, borrowing__borrow_date__lt=end
+        )
+
+    rows = {
+        row.pop(key): row
+        for row in borrowings.values(key)
+        .annotate(
+            borrow_count=Count("id", filter=LENT),
+            return_count=Count("id", filter=RETURNED),
+            overdue_count=Count(
+                "id",
+                filter=RETURNED
+                & Q(actual_return_date__gt=F("expected_return_date")),
+            ),
+            loan_days=Sum(
+                LOAN_DURATION, filter=RETURNED, default=timedelta(0)
+            ),
+        )
+        .order_by()
+    }
+    revenue = (
+        payments.values(f"borrowing__{key}")
+        .annotate(revenue=Sum("money_to_pay"))
+        .order_by()
+    )
+    for row in revenue:
+        rows[row[f"borrowing__{key}"]]["revenue"] = row["revenue"]
+
+    for row in rows.values():
+        row["loan_days"] = row["loan_days"].days
+    return rows
+
+
+def _add_archive(model: type[CirculationStats], key: str, rows: dict) -> None:
+    """Add the archived circulation of detached partitions to `rows`."""
+    for archived in ARCHIVES[model].objects.values():
+        row = rows.setdefault(archived.pop(key), {})
+        for name in STAT_FIELDS:
+            row[name] = row.get(name, 0) + archived[name]
+
+
+def archive_stats(start: date, end: date) -> None:
+    """
+    Keep the circulation of the borrowings from `start` to `end` (end
+    excluded) in the archive rollups, before their partition is detached.
+
+    Must run in the transaction that detaches the partition, so that a
+    rebuild sees the borrowings either in the table or in the archive.
+    """
+    for model, key in ROLLUPS:
+        _apply(ARCHIVES[model], _aggregate(key, (start, end)))
+
+
+def rebuild_stats(batch_size: int = 1000) -> None:
+    """
+    Correct all rollups to what `Borrowing` and `Payment`, plus the
+    archived circulation of detached borrowing partitions, add up to.
+
+    Fixes any drift of the incremental updates, e.g. from borrowings
+    edited in the admin. Increments are recorded in the transactions of
+    their borrowings, so the sums and the rollups read from one snapshot
+    only differ by drift. That difference is then applied like any
+    other increment: writers never wait for the aggregate, and those
+    committed meanwhile are kept.
+    """
+    for model, key in ROLLUPS:
+        with consistent_snapshot():
+            expected = _aggregate(key)
+            _add_archive(model, key, expected)
+            current = {
+                row.pop(key): row
+                for row in model.objects.values(key, *STAT_FIELDS)
+            }
+
+        corrections = []
+        for pk in sorted(expected.keys() | current.keys()):
+            delta = {
+                name: expected.get(pk, {}).get(name, 0)
+                - current.get(pk, {}).get(name, 0)
+                for name in STAT_FIELDS
+            }
+            if any(delta.values()):
+                corrections.append((pk, delta))
+        for start in range(0, len(corrections), batch_size):
+            with transaction.atomic():
+                _apply(model, dict(corrections[start : start + batch_size]))
@@ -0,0 +1,15 @@
+from django.conf import settings
+
+from .partitions import ensure_partitions, is_partitioned
+from .stats import rebuild_stats
+
+
+def rebuild_circulation_stats() -> None:
+    """Nightly rebuild of the borrowing statistics rollups."""
+    rebuild_stats()
+
+
+def create_borrowing_partitions() -> None:
+    """Keep the monthly borrowing partitions created ahead of time."""
+    if is_partitioned():
+        ensure_partitions(settings.BORROWING_PARTITIONS_AHEAD)
@@ -1,15 +1,28 @@
+import csv
 import datetime
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
+from redis.exceptions import RedisError
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from apps.books.models import Book
 from apps.borrowings.models import Borrowing
+from apps.payments.models import Payment
+from apps.payments.stripe_client import StripeUnavailable
+from library_service.idempotency import _release
 
 BORROWING_URL = reverse("borrowings:borrowing-list")
+CART_URL = reverse("borrowings:borrowing-cart")
+BULK_RETURN_URL = reverse("borrowings:borrowing-bulk-return")
+EXPORT_URL = reverse("borrowings:borrowing-export")
 
 
 def detail_url(borrowing_id: int):
@@ -38,6 +51,7 @@ class UnauthenticatedBorrowingApiTests(TestCase):
 
 class AuthenticatedBorrowingApiTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             email="user@test.com", password="password123"
@@ -68,6 +82,31 @@ class AuthenticatedBorrowingApiTests(TestCase):
         self.assertEqual(borrowing.user, self.user)
         self.assertEqual(self.book.inventory, initial_inventory - 1)
 
+    @patch("apps.borrowings.views.async_task")
+    def test_create_borrowing_async_checkout(self, mock_async_task):
+        """Test async checkout defers the Stripe session to a task"""
+        payload = {
+            "book": self.book.id,
+            "expected_return_date": timezone.now().date()
+            + datetime.timedelta(days=10),
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                BORROWING_URL, payload, HTTP_PREFER="respond-async"
+            )
+
+        payment = Payment.objects.get()
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(
+            res["Location"].endswith(
+                reverse("payments:payment-detail", args=[payment.id])
+            )
+        )
+        self.assertIsNone(payment.session_id)
+        self.assertEqual(payment.money_to_pay, 10)
+        mock_async_task.assert_called_once()
+        self.assertEqual(mock_async_task.call_args.args[1], payment.id)
+
     def test_create_borrowing_out_of_stock_fails(self):
         """Test creating borrowing for a book with 0 inventory fails"""
         self.book.inventory = 0
@@ -81,6 +120,250 @@ class AuthenticatedBorrowingApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("out of stock", res.data["book"][0].lower())
 
+    @patch(
+        "apps.payments.stripe_client.StripeGateway.create_checkout_session",
+        side_effect=StripeUnavailable("Stripe circuit is open."),
+    )
+    def test_create_borrowing_stripe_unavailable(self, mock_create):
+        """Test a Stripe outage is reported as 503 and borrows nothing"""
+        payload = {
+            "book": self.book.id,
+            "expected_return_date": timezone.now().date()
+            + datetime.timedelta(days=10),
+        }
+        res = self.client.post(BORROWING_URL, payload)
+        self.book.refresh_from_db()
+
+        self.assertEqual(
+            res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertEqual(
+            res.data["detail"].code, "payment_provider_unavailable"
+        )
+        self.assertEqual(self.book.inventory, 5)
+        self.assertFalse(Borrowing.objects.exists())
+
+    @patch("apps.borrowings.views.async_task")
+    def test_create_borrowing_replayed_with_idempotency_key(
+        self, mock_async_task
+    ):
+        """Test a retried create with the same key is not executed again"""
+        payload = {
+            "book": self.book.id,
+            "expected_return_date": timezone.now().date()
+            + datetime.timedelta(days=10),
+        }
+        headers = {
+            "HTTP_PREFER": "respond-async",
+            "HTTP_IDEMPOTENCY_KEY": "k1",
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(BORROWING_URL, payload, **headers)
+        with self.captureOnCommitCallbacks(execute=True):
+            res_retry = self.client.post(BORROWING_URL, payload, **headers)
+
+        self.assertEqual(res_retry.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res_retry.data, res.data)
+        self.assertEqual(res_retry["Location"], res["Location"])
+        self.assertEqual(res_retry["Idempotent-Replayed"], "true")
+        self.assertNotIn("Idempotent-Replayed", res)
+        self.assertEqual(Borrowing.objects.count(), 1)
+        self.assertEqual(Payment.objects.count(), 1)
+        mock_async_task.assert_called_once()
+
+    @patch("apps.borrowings.views.async_task")
+    def test_idempotency_key_reused_with_other_body(self, mock_async_task):
+        """Test reusing a key for a different request is rejected"""
+        expected_return_date = timezone.now().date() + datetime.timedelta(
+            days=10
+        )
+        headers = {
+            "HTTP_PREFER": "respond-async",
+            "HTTP_IDEMPOTENCY_KEY": "k1",
+        }
+        self.client.post(
+            BORROWING_URL,
+            {
+                "book": self.book.id,
+                "expected_return_date": expected_return_date,
+            },
+            **headers,
+        )
+        res = self.client.post(
+            BORROWING_URL,
+            {
+                "book": self.book.id,
+                "expected_return_date": expected_return_date
+                + datetime.timedelta(days=1),
+            },
+            **headers,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Borrowing.objects.count(), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_concurrent_duplicate_gets_conflict(self):
+        """Test a duplicate of an in-flight request waits, then gets 409"""
+        borrowing = Borrowing.objects.create(
+            user=self.user,
+            book=self.book,
+            expected_return_date=timezone.now().date()
+            + datetime.timedelta(days=5),
+        )
+        url = return_url(borrowing.id)
+        # Hold the lock as the first request would while it runs.
+        with patch("library_service.idempotency.cache.add") as mock_add:
+            mock_add.return_value = False
+            res = self.client.post(url, HTTP_IDEMPOTENCY_KEY="k1")
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        borrowing.refresh_from_db()
+        self.assertIsNone(borrowing.actual_return_date)
+
+    def test_return_replayed_with_idempotency_key(self):
+        """Test a retried return gets the first response, not an error"""
+        borrowing = Borrowing.objects.create(
+            user=self.user,
+            book=self.book,
+            expected_return_date=timezone.now().date()
+            + datetime.timedelta(days=5),
+        )
+        url = return_url(borrowing.id)
+        res = self.client.post(url, HTTP_IDEMPOTENCY_KEY="k1")
+        res_retry = self.client.post(url, HTTP_IDEMPOTENCY_KEY="k1")
+        res_new_key = self.client.post(url, HTTP_IDEMPOTENCY_KEY="k2")
+        self.book.refresh_from_db()
+
+        self.assertEqual(res_retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(res_retry.data, res.data)
+        self.assertEqual(res_new_key.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.book.inventory, 6)
+
+    def test_committed_return_survives_cache_outage_on_store(self):
+        """Test a return is answered even if its response cannot be stored"""
+        borrowing = Borrowing.objects.create(
+            user=self.user,
+            book=self.book,
+            expected_return_date=timezone.now().date()
+            + datetime.timedelta(days=5),
+        )
+        with patch(
+            "library_service.idempotency.cache.set", side_effect=RedisError
+        ):
+            res = self.client.post(
+                return_url(borrowing.id), HTTP_IDEMPOTENCY_KEY="k1"
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        borrowing.refresh_from_db()
+        self.assertIsNotNone(borrowing.actual_return_date)
+
+    def test_cache_outage_before_the_view_is_unavailable(self):
+        """Test a keyed request is not run while the cache is down"""
+        borrowing = Borrowing.objects.create(
+            user=self.user,
+            book=self.book,
+            expected_return_date=timezone.now().date()
+            + datetime.timedelta(days=5),
+        )
+        with patch(
+            "library_service.idempotency.cache.get", side_effect=RedisError
+        ):
+            res = self.client.post(
+                return_url(borrowing.id), HTTP_IDEMPOTENCY_KEY="k1"
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        borrowing.refresh_from_db()
+        self.assertIsNone(borrowing.actual_return_date)
+
+    def test_release_keeps_lock_taken_over_by_another_request(self):
+        """Test an expired lock re-acquired elsewhere is not deleted"""
+        cache.set("idempotency:test:lock", "theirs")
+
+        _release("idempotency:test:lock", "mine")
+
+        self.assertEqual(cache.get("idempotency:test:lock"), "theirs")
+
+    @patch("apps.payments.stripe_client.StripeGateway.create_checkout_session")
+    def test_cart_checkout_shares_one_session(self, mock_create):
+        """Test a cart creates all borrowings paid by one Stripe session"""
+        mock_create.return_value = SimpleNamespace(
+            id="cs_cart", url="https://checkout.stripe.com/cs_cart"
+        )
+        other_book = Book.objects.create(
+            title="Other Book",
+            author="Author",
+            cover="SOFT",
+            inventory=1,
+            daily_fee=2.00,
+        )
+        return_date = timezone.now().date() + datetime.timedelta(days=3)
+        payload = {
+            "items": [
+                {"book": self.book.id, "expected_return_date": return_date},
+                {"book": self.book.id, "expected_return_date": return_date},
+                {"book": other_book.id, "expected_return_date": return_date},
+            ]
+        }
+        res = self.client.post(CART_URL, payload, format="json")
+        self.book.refresh_from_db()
+        other_book.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["session_url"], mock_create.return_value.url)
+        self.assertEqual(len(res.data["borrowings"]), 3)
+        self.assertEqual(self.book.inventory, 3)
+        self.assertEqual(other_book.inventory, 0)
+        mock_create.assert_called_once()
+        self.assertEqual(len(mock_create.call_args.kwargs["line_items"]), 3)
+        self.assertEqual(
+            sorted(
+                Payment.objects.filter(session_id="cs_cart").values_list(
+                    "money_to_pay", flat=True
+                )
+            ),
+            [3, 3, 6],
+        )
+
+    @patch("apps.payments.stripe_client.StripeGateway.create_checkout_session")
+    def test_cart_out_of_stock_reserves_nothing(self, mock_create):
+        """Test a cart asking for more copies than in stock fails whole"""
+        return_date = timezone.now().date() + datetime.timedelta(days=3)
+        payload = {
+            "items": [
+                {"book": self.book.id, "expected_return_date": return_date}
+            ]
+            * 6
+        }
+        res = self.client.post(CART_URL, payload, format="json")
+        self.book.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.book.inventory, 5)
+        self.assertFalse(Borrowing.objects.exists())
+        mock_create.assert_not_called()
+
+    @patch(
+        "apps.payments.stripe_client.StripeGateway.create_checkout_session",
+        side_effect=StripeUnavailable("Stripe circuit is open."),
+    )
+    def test_cart_stripe_unavailable(self, mock_create):
+        """Test a Stripe outage fails a cart with 503"""
+        return_date = timezone.now().date() + datetime.timedelta(days=3)
+        payload = {
+            "items": [
+                {"book": self.book.id, "expected_return_date": return_date}
+            ]
+        }
+        res = self.client.post(CART_URL, payload, format="json")
+
+        self.assertEqual(
+            res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertFalse(Borrowing.objects.exists())
+
     def test_list_only_own_borrowings(self):
         """Test listing only the authenticated user's borrowings"""
         other_user = get_user_model().objects.create_user(
@@ -122,6 +405,27 @@ class AuthenticatedBorrowingApiTests(TestCase):
         self.assertEqual(borrowing.actual_return_date, timezone.now().date())
         self.assertEqual(self.book.inventory, initial_inventory + 1)
 
+    def test_retrieve_borrowing_not_modified(self):
+        """Test retrieving an unchanged borrowing with its ETag gives 304"""
+        borrowing = Borrowing.objects.create(
+            user=self.user,
+            book=self.book,
+            expected_return_date=timezone.now().date()
+            + datetime.timedelta(days=5),
+        )
+        url = detail_url(borrowing.id)
+        res = self.client.get(url)
+        res_cached = self.client.get(url, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res_cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.post(return_url(borrowing.id))
+        res_returned = self.client.get(url, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(res_returned.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(res_returned.data["actual_return_date"])
+
     def test_return_already_returned_borrowing_fails(self):
         """Test returning an already returned borrowing raises an error"""
         borrowing = Borrowing.objects.create(
@@ -226,3 +530,155 @@ class AdminBorrowingApiTests(TestCase):
             res_inactive.data["results"][0]["id"],
             self.borrowing_admin_returned.id,
         )
+
+    @patch("apps.borrowings.views.async_task")
+    def test_bulk_return(self, mock_async_task):
+        """Test bulk return closes, restocks and fines in one request"""
+        today = timezone.now().date()
+        book = self.borrowing_user_active.book
+        on_time = Borrowing.objects.create(
+            user=self.user,
+            book=book,
+            expected_return_date=today + datetime.timedelta(days=5),
+        )
+        late = Borrowing.objects.create(
+            user=self.user,
+            book=book,
+            expected_return_date=today + datetime.timedelta(days=1),
+        )
+        Borrowing.objects.filter(pk=late.pk).update(
+            borrow_date=today - datetime.timedelta(days=5),
+            expected_return_date=today - datetime.timedelta(days=2),
+        )
+        returned = Borrowing.objects.create(
+            user=self.user,
+            book=book,
+            expected_return_date=today + datetime.timedelta(days=5),
+            actual_return_date=today,
+        )
+        inventory = Book.objects.get(pk=book.pk).inventory
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                BULK_RETURN_URL,
+                {"borrowing_ids": [on_time.id, late.id, returned.id, 999]},
+                format="json",
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["outcome"] for item in res.data["results"]],
+            ["returned", "returned", "already_returned", "not_found"],
+        )
+        self.assertEqual(Book.objects.get(pk=book.pk).inventory, inventory + 2)
+        fine = Payment.objects.get(type=Payment.TypeChoices.FINE)
+        self.assertEqual(fine.borrowing_id, late.id)
+        self.assertIsNone(fine.session_id)
+        self.assertEqual(
+            res.data["results"][1]["fine"], str(fine.money_to_pay)
+        )
+        self.assertIsNone(res.data["results"][0]["fine"])
+        mock_async_task.assert_called_once()
+        self.assertEqual(mock_async_task.call_args.args[1], fine.id)
+
+    def test_bulk_return_requires_staff(self):
+        """Test regular users cannot use bulk return"""
+        self.client.force_authenticate(self.user)
+        res = self.client.post(
+            BULK_RETURN_URL, {"borrowing_ids": [1]}, format="json"
+        )
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_list_borrowings_cursor_pagination(self):
+        """Test admin can page through borrowings with a cursor"""
+        res = self.client.get(BORROWING_URL, {"pagination": "cursor"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", res.data)
+        self.assertEqual(
+            [borrowing["id"] for borrowing in res.data["results"]],
+            [
+                self.borrowing_admin_returned.id,
+                self.borrowing_user_active.id,
+            ],
+        )
+
+    def test_cancelled_borrowings_are_not_completed(self):
+        """Test borrowings of abandoned checkouts are not listed as returned"""
+        Borrowing.objects.filter(pk=self.borrowing_user_active.pk).update(
+            actual_return_date=timezone.now().date(), cancelled=True
+        )
+
+        res = self.client.get(BORROWING_URL, {"is_active": "false"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row["id"] for row in res.data["results"]],
+            [self.borrowing_admin_returned.id],
+        )
+
+    def test_export_csv(self):
+        """Test admin can stream borrowings as CSV"""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn("borrowings.csv", res["Content-Disposition"])
+        rows = list(
+            csv.DictReader(
+                b"".join(res.streaming_content).decode().splitlines()
+            )
+        )
+        self.assertEqual(
+            [row["id"] for row in rows],
+            [
+                str(self.borrowing_user_active.id),
+                str(self.borrowing_admin_returned.id),
+            ],
+        )
+        self.assertEqual(rows[0]["user_email"], "user@test.com")
+        self.assertEqual(rows[0]["book_title"], "Book A")
+        self.assertEqual(rows[0]["actual_return_date"], "")
+
+    def test_export_ndjson_applies_filters(self):
+        """Test the export honours the list filters"""
+        res = self.client.get(
+            EXPORT_URL,
+            {"output": "ndjson", "user_id": self.admin.id, "is_active": "0"},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        rows = [
+            json.loads(line)
+            for line in b"".join(res.streaming_content).splitlines()
+        ]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["id"], self.borrowing_admin_returned.id)
+        self.assertEqual(
+            rows[0]["actual_return_date"],
+            timezone.now().date().isoformat(),
+        )
+
+    def test_export_invalid_output(self):
+        """Test an unknown export format is rejected"""
+        res = self.client.get(EXPORT_URL, {"output": "xml"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_requires_staff(self):
+        """Test regular users cannot export borrowings"""
+        self.client.force_authenticate(self.user)
+        res = self.client.get(EXPORT_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_list_fast_path_matches_serializer(self):
+        """Test the values() list path renders the serializers' bytes"""
+        for user in (self.admin, self.user):
+            self.client.force_authenticate(user)
+            for params in ({}, {"pagination": "cursor"}):
+                with override_settings(FAST_LIST_SERIALIZATION=False):
+                    expected = self.client.get(BORROWING_URL, params)
+                res = self.client.get(BORROWING_URL, params)
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(res.content, expected.content)
@@ -0,0 +1,254 @@
+import datetime
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from apps.books.models import Book
+from apps.borrowings.models import (
+    ArchivedBookCirculationStats,
+    BookCirculationStats,
+    Borrowing,
+    UserCirculationStats,
+)
+from apps.borrowings.stats import STAT_FIELDS, rebuild_stats
+from apps.payments.models import Payment
+from apps.borrowings.partitions import (
+    DEFAULT_PARTITION,
+    create_partitions,
+    detach_partitions,
+    list_partitions,
+)
+
+
+class BenchmarkBorrowingIndexesCommandTests(TestCase):
+    @skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL")
+    def test_benchmark_reports_plans_and_rolls_back(self):
+        """Test the benchmark prints both plans and keeps no data"""
+        out = StringIO()
+        call_command(
+            "benchmark_borrowing_indexes",
+            borrowings=300,
+            users=20,
+            books=5,
+            days=30,
+            stdout=out,
+        )
+
+        output = out.getvalue()
+        self.assertIn("Seeded 20 users, 5 books and 300 borrowings.", output)
+        without, with_indexes = output.split("With indexes")
+        self.assertIn("Without indexes", without)
+        for section in (without, with_indexes):
+            for label in (
+                "User's borrowings",
+                "User's active borrowings",
+                "Overdue borrowings",
+            ):
+                self.assertIn(label, section)
+            self.assertEqual(section.count("Indexes used: "), 3)
+        # Dropped for the first run, so no plan can use them.
+        for index in (
+            "borrowing_active_due_idx",
+            "borrowing_user_borrow_date_idx",
+        ):
+            self.assertNotIn(index, without)
+        self.assertFalse(Borrowing.objects.exists())
+
+    @skipUnless(connection.vendor != "postgresql", "Requires another DB")
+    def test_benchmark_requires_postgres(self):
+        """Test the benchmark refuses to run on other databases"""
+        with self.assertRaises(CommandError):
+            call_command("benchmark_borrowing_indexes")
+
+
+class BenchmarkListSerializationCommandTests(TestCase):
+    def test_benchmark_compares_paths_and_rolls_back(self):
+        """Test the benchmark reports every serializer and keeps no data"""
+        out = StringIO()
+        call_command(
+            "benchmark_list_serialization", rows=20, repeat=1, stdout=out
+        )
+
+        output = out.getvalue()
+        for name in (
+            "BookSerializer",
+            "BorrowingListSerializer",
+            "BorrowingListAdminSerializer",
+            "PaymentListSerializer",
+        ):
+            self.assertIn(name, output)
+        self.assertFalse(Book.objects.exists())
+
+
+@skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL")
+class BorrowingPartitionsCommandTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email="user@test.com", password="password123"
+        )
+        book = Book.objects.create(
+            title="Test Book",
+            author="Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee=1.00,
+        )
+        self.borrowings = [
+            Borrowing.objects.create(
+                user=user,
+                book=book,
+                expected_return_date=(
+                    timezone.now().date() + datetime.timedelta(days=5)
+                ),
+            )
+            for _ in range(2)
+        ]
+        # Before any partition exists; the rows go to the default one.
+        for borrowing, day in zip(self.borrowings, (1, 20)):
+            Borrowing.objects.filter(pk=borrowing.pk).update(
+                borrow_date=datetime.date(2020, 1, day),
+                expected_return_date=datetime.date(2020, 2, day),
+                actual_return_date=(
+                    datetime.date(2020, 2, 1) if day == 1 else None
+                ),
+            )
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+    def partition_of(self, borrowing: Borrowing) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT tableoid::regclass::text FROM borrowings_borrowing "
+                "WHERE id = %s",
+                [borrowing.pk],
+            )
+            return cursor.fetchone()[0]
+
+    def test_create_partitions_moves_rows_out_of_default(self):
+        """Test a new partition takes over its rows from the default one"""
+        self.assertEqual(
+            self.partition_of(self.borrowings[0]), DEFAULT_PARTITION
+        )
+
+        create_partitions(datetime.date(2020, 1, 1), datetime.date(2020, 1, 1))
+
+        self.assertEqual(
+            self.partition_of(self.borrowings[0]),
+            "borrowings_borrowing_p2020_01",
+        )
+
+    def test_detach_keeps_partitions_with_active_borrowings(self):
+        """Test detaching skips months with unreturned borrowings"""
+        create_partitions(datetime.date(2020, 1, 1), datetime.date(2020, 2, 1))
+        Borrowing.objects.filter(pk=self.borrowings[1].pk).update(
+            borrow_date=datetime.date(2020, 2, 20),
+            expected_return_date=datetime.date(2020, 3, 20),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        out, err = StringIO(), StringIO()
+
+        call_command(
+            "borrowing_partitions",
+            "--detach-before",
+            "2020-03",
+            stdout=out,
+            stderr=err,
+        )
+
+        self.assertIn("Detached borrowings_borrowing_p2020_01", out.getvalue())
+        self.assertIn("Kept borrowings_borrowing_p2020_02", err.getvalue())
+        self.assertNotIn(
+            "borrowings_borrowing_p2020_01",
+            [partition.name for partition in list_partitions()],
+        )
+        self.assertEqual(
+            list(Borrowing.objects.values_list("pk", flat=True)),
+            [self.borrowings[1].pk],
+        )
+
+    def test_detach_keeps_partitions_with_pending_payments(self):
+        """Test detaching skips months whose fines are still unpaid"""
+        create_partitions(datetime.date(2020, 1, 1), datetime.date(2020, 2, 1))
+        returned = self.borrowings[0]
+        Borrowing.objects.filter(pk=self.borrowings[1].pk).update(
+            borrow_date=datetime.date(2020, 2, 20),
+            expected_return_date=datetime.date(2020, 3, 20),
+            actual_return_date=datetime.date(2020, 3, 1),
+        )
+        payment = Payment.objects.create(
+            borrowing=returned,
+            user=returned.user,
+            type=Payment.TypeChoices.FINE,
+            money_to_pay=5,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+        detached, kept = detach_partitions(datetime.date(2020, 3, 1))
+        self.assertEqual(
+            [partition.name for partition in kept],
+            ["borrowings_borrowing_p2020_01"],
+        )
+        self.assertEqual(
+            [partition.name for partition in detached],
+            ["borrowings_borrowing_p2020_02"],
+        )
+
+        payment.status = Payment.StatusChoices.PAID
+        payment.save()
+        detached, kept = detach_partitions(datetime.date(2020, 3, 1))
+        self.assertEqual(kept, [])
+        self.assertEqual(
+            [partition.name for partition in detached],
+            ["borrowings_borrowing_p2020_01"],
+        )
+
+    def test_rebuild_keeps_circulation_of_detached_partitions(self):
+        """Test detached months still count after rebuilding the stats"""
+        create_partitions(datetime.date(2020, 1, 1), datetime.date(2020, 2, 1))
+        returned = self.borrowings[0]
+        Borrowing.objects.filter(pk=self.borrowings[1].pk).update(
+            borrow_date=datetime.date(2020, 2, 20),
+            expected_return_date=datetime.date(2020, 3, 20),
+        )
+        Payment.objects.create(
+            borrowing=returned,
+            user=returned.user,
+            type=Payment.TypeChoices.PAYMENT,
+            status=Payment.StatusChoices.PAID,
+            money_to_pay=7,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+        def snapshot() -> dict:
+            return {
+                (model.__name__, row.pk): tuple(
+                    getattr(row, name) for name in STAT_FIELDS
+                )
+                for model in (BookCirculationStats, UserCirculationStats)
+                for row in model.objects.all()
+            }
+
+        rebuild_stats()
+        before = snapshot()
+
+        detached, _ = detach_partitions(datetime.date(2020, 2, 1))
+        rebuild_stats()
+
+        self.assertEqual(
+            [partition.name for partition in detached],
+            ["borrowings_borrowing_p2020_01"],
+        )
+        self.assertEqual(snapshot(), before)
+        archived = ArchivedBookCirculationStats.objects.get()
+        self.assertEqual(archived.borrow_count, 1)
+        self.assertEqual(archived.revenue, 7)
@@ -0,0 +1,239 @@
+import datetime
+import threading
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.books.models import Book
+from apps.borrowings.models import (
+    BookCirculationStats,
+    Borrowing,
+    UserCirculationStats,
+)
+from apps.borrowings import stats
+from apps.borrowings.stats import (
+    STAT_FIELDS,
+    rebuild_stats,
+    record_borrowings,
+)
+
+CART_URL = reverse("borrowings:borrowing-cart")
+BULK_RETURN_URL = reverse("borrowings:borrowing-bulk-return")
+STATS_URL = reverse("borrowings:borrowing-stats")
+
+
+def snapshot() -> dict:
+    """Return all rollup rows keyed by model and primary key"""
+    return {
+        (model.__name__, row.pk): tuple(
+            getattr(row, name) for name in STAT_FIELDS
+        )
+        for model in (BookCirculationStats, UserCirculationStats)
+        for row in model.objects.all()
+    }
+
+
+class CirculationStatsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password123"
+        )
+        self.admin = get_user_model().objects.create_superuser(
+            email="admin@test.com", password="password123"
+        )
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee=1.00,
+        )
+
+    @patch("apps.borrowings.views.async_task")
+    @patch("apps.payments.stripe_client.StripeGateway.create_checkout_session")
+    def test_incremental_updates_match_rebuild(self, mock_create, _):
+        """Test rollups kept up by the views equal a full rebuild"""
+        mock_create.return_value = SimpleNamespace(
+            id="cs_cart", url="https://checkout.stripe.com/cs_cart"
+        )
+        return_date = timezone.now().date() + datetime.timedelta(days=4)
+        self.client.force_authenticate(self.user)
+        res = self.client.post(
+            CART_URL,
+            {
+                "items": [
+                    {"book": self.book.id, "expected_return_date": return_date}
+                ]
+                * 3
+            },
+            format="json",
+        )
+        borrowing_ids = [item["id"] for item in res.data["borrowings"]]
+        Borrowing.objects.filter(pk=borrowing_ids[0]).update(
+            borrow_date=timezone.now().date() - datetime.timedelta(days=6),
+            expected_return_date=(
+                timezone.now().date() - datetime.timedelta(days=2)
+            ),
+        )
+        self.client.force_authenticate(self.admin)
+        self.client.post(
+            BULK_RETURN_URL,
+            {"borrowing_ids": borrowing_ids[:2]},
+            format="json",
+        )
+
+        incremental = snapshot()
+        stats = BookCirculationStats.objects.get(book=self.book)
+        self.assertEqual(stats.borrow_count, 3)
+        self.assertEqual(stats.return_count, 2)
+        self.assertEqual(stats.overdue_count, 1)
+        self.assertEqual(stats.overdue_rate, 0.5)
+
+        rebuild_stats()
+        self.assertEqual(snapshot(), incremental)
+
+    def test_stats_endpoint_reads_rollups(self):
+        """Test staff get per-user rows; others are refused"""
+        UserCirculationStats.objects.create(
+            user=self.user, borrow_count=4, return_count=2, loan_days=10
+        )
+        UserCirculationStats.objects.create(user=self.admin, borrow_count=1)
+
+        self.client.force_authenticate(self.user)
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(self.admin)
+        res = self.client.get(STATS_URL, {"group": "user"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row["user_email"] for row in res.data["results"]],
+            ["user@test.com", "admin@test.com"],
+        )
+        self.assertEqual(res.data["results"][0]["average_loan_days"], 5.0)
+        self.assertIsNone(res.data["results"][1]["overdue_rate"])
+
+        res = self.client.get(
+            STATS_URL, {"group": "user", "pagination": "cursor"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 2)
+
+        res = self.client.get(STATS_URL, {"group": "shelf"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "Concurrent writers require Postgres",
+)
+class RebuildStatsConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password123"
+        )
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee=1.00,
+        )
+
+    def borrow(self) -> None:
+        borrowing = Borrowing.objects.create(
+            user=self.user,
+            book=self.book,
+            expected_return_date=(
+                timezone.now().date() + datetime.timedelta(days=7)
+            ),
+        )
+        record_borrowings([borrowing], [Decimal(0)])
+
+    def test_rebuild_keeps_increments_of_open_transactions(self):
+        """Test a borrowing counted during a rebuild is not lost"""
+        self.borrow()
+        rebuild_stats()
+        counted = threading.Event()
+        release = threading.Event()
+
+        def borrow() -> None:
+            try:
+                with transaction.atomic():
+                    self.borrow()
+                    counted.set()
+                    release.wait(5)
+            finally:
+                connections.close_all()
+
+        def rebuild() -> None:
+            try:
+                rebuild_stats()
+            finally:
+                connections.close_all()
+
+        writer = threading.Thread(target=borrow)
+        writer.start()
+        counted.wait(5)
+        rebuilder = threading.Thread(target=rebuild)
+        rebuilder.start()
+        time.sleep(0.2)
+        release.set()
+        writer.join()
+        rebuilder.join()
+
+        self.assertEqual(
+            BookCirculationStats.objects.get(book=self.book).borrow_count, 2
+        )
+        self.assertEqual(
+            UserCirculationStats.objects.get(user=self.user).borrow_count, 2
+        )
+
+    def test_increments_do_not_wait_for_the_aggregate(self):
+        """Test a borrowing is counted while a rebuild aggregates"""
+        self.borrow()
+        BookCirculationStats.objects.update(borrow_count=7)
+        aggregating = threading.Event()
+        release = threading.Event()
+        aggregate = stats._aggregate
+
+        def slow_aggregate(*args, **kwargs):
+            rows = aggregate(*args, **kwargs)
+            aggregating.set()
+            release.wait(5)
+            return rows
+
+        def rebuild() -> None:
+            try:
+                rebuild_stats()
+            finally:
+                connections.close_all()
+
+        with patch.object(stats, "_aggregate", slow_aggregate):
+            rebuilder = threading.Thread(target=rebuild)
+            rebuilder.start()
+            aggregating.wait(5)
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL lock_timeout = '1s'")
+                self.borrow()
+            release.set()
+            rebuilder.join()
+
+        self.assertEqual(
+            BookCirculationStats.objects.get(book=self.book).borrow_count, 2
+        )
+        self.assertEqual(
+            UserCirculationStats.objects.get(user=self.user).borrow_count, 2
+        )
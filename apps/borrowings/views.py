@@ -1,31 +1,80 @@
+from collections import Counter
+from datetime import datetime
 from typing import Type
 
+import stripe
 from django.db import transaction
-from django.db.models import QuerySet
+from django.conf import settings
+from django.db.models import F, OuterRef, QuerySet, Subquery
+from django.http import HttpResponseBase
+from django.urls import reverse
 from django.utils import timezone
+from django_q.tasks import async_task
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError, PermissionDenied
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 
-from apps.borrowings.models import Borrowing
+from apps.books.cache import invalidate_book
+from apps.books.services import reserve_copies, reserve_copy
+from apps.borrowings.models import (
+    BookCirculationStats,
+    Borrowing,
+    UserCirculationStats,
+)
 from apps.borrowings.schemas import borrowing_schema
 from apps.borrowings.serializers import (
     BorrowingListSerializer,
     BorrowingDetailSerializer,
     BorrowingCreateSerializer,
     BorrowingListAdminSerializer,
+    BorrowingCartSerializer,
+    BorrowingCartResultSerializer,
+    BorrowingBulkReturnSerializer,
+    BorrowingBulkReturnResultSerializer,
+    BorrowingReturnOutcomeSerializer,
+    BookCirculationStatsSerializer,
+    UserCirculationStatsSerializer,
+)
+from apps.borrowings.stats import record_borrowings, record_returns
+from apps.holds.services import allocate_or_restock, claim_ready_hold
+from apps.payments.models import AccruedFine, Payment
+from apps.payments.services import (
+    PaymentProviderUnavailable,
+    build_checkout_urls,
+    calculate_fine,
+    calculate_rental_fee,
+    create_cart_session,
+    create_fine_session,
+    create_payment_session,
+    fine_product_name,
 )
-from apps.payments.models import Payment
-from apps.payments.services import create_payment_session, create_fine_session
+from apps.payments.totals import record_created
+from library_service.conditional import conditional_response
+from library_service.exports import OUTPUT_QUERY_PARAM, export_response
+from library_service.fastlist import FastListMixin
+from library_service.idempotency import idempotent
 from library_service.telegram.services import send_telegram_message
 
+EXPORT_FIELDS = (
+    "id",
+    "user_id",
+    "user_email",
+    "book_id",
+    "book_title",
+    "borrow_date",
+    "expected_return_date",
+    "actual_return_date",
+    "cancelled",
+)
+
 
 @borrowing_schema
 class BorrowingViewSet(
+    FastListMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -34,6 +83,7 @@ class BorrowingViewSet(
     serializer_class = BorrowingListSerializer
     permission_classes = (IsAuthenticated,)
     queryset = Borrowing.objects.all()
+    cursor_ordering = ("-borrow_date", "-id")
 
     @action(
         methods=["POST"],
@@ -41,6 +91,7 @@ class BorrowingViewSet(
         url_path="return",
         permission_classes=[IsAuthenticated],
     )
+    @idempotent
     @transaction.atomic
     def return_borrowing(
         self, request: Request, pk: int | None = None
@@ -48,6 +99,8 @@ class BorrowingViewSet(
         borrowing = self.get_object()
         book = borrowing.book
 
+        if borrowing.cancelled:
+            raise ValidationError("This borrowing was cancelled.")
         if borrowing.actual_return_date:
             raise ValidationError("This borrowing has already been returned.")
 
@@ -56,21 +109,25 @@ class BorrowingViewSet(
 
         borrowing.actual_return_date = timezone.now().date()
         borrowing.save()
+        AccruedFine.objects.filter(borrowing=borrowing).delete()
 
-        book.inventory += 1
-        book.save()
+        allocate_or_restock({book.id: 1})
 
+        fines = {}
+        payments = []
         if borrowing.actual_return_date > borrowing.expected_return_date:
             try:
                 stripe_session, fine_amount = create_fine_session(
                     borrowing, request
                 )
+            except stripe.APIConnectionError as e:
+                raise PaymentProviderUnavailable() from e
             except Exception as e:
                 raise ValidationError(
                     f"Error preparing fine payment session: {e}"
                 )
 
-            Payment.objects.create(
+            payment = Payment.objects.create(
                 status="PENDING",
                 type=Payment.TypeChoices.FINE,
                 borrowing=borrowing,
@@ -78,10 +135,185 @@ class BorrowingViewSet(
                 session_id=stripe_session.id,
                 money_to_pay=fine_amount,
             )
+            payments.append(payment)
+            fines[borrowing.id] = fine_amount
+
+        record_returns([borrowing], fines)
+        record_created(payments)
 
         serializer = self.get_serializer(borrowing)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="bulk-return",
+        permission_classes=[IsAdminUser],
+    )
+    def bulk_return(self, request: Request) -> Response:
+        """
+        Return a batch of borrowings scanned at the circulation desk.
+
+        All borrowings are closed with one UPDATE and their books restocked
+        with another; fines are inserted in bulk and their Stripe sessions
+        are created by background tasks once the transaction commits.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        borrowing_ids = list(
+            dict.fromkeys(serializer.validated_data["borrowing_ids"])
+        )
+        today = timezone.now().date()
+        fines = {}
+
+        with transaction.atomic():
+            borrowings = {
+                borrowing.id: borrowing
+                for borrowing in Borrowing.objects.select_for_update(
+                    of=("self",)
+                )
+                .select_related("book")
+                .filter(pk__in=borrowing_ids)
+            }
+            returnable = [
+                borrowing
+                for borrowing in borrowings.values()
+                if borrowing.actual_return_date is None
+            ]
+
+            if returnable:
+                Borrowing.objects.filter(
+                    pk__in=[borrowing.id for borrowing in returnable]
+                ).update(actual_return_date=today, updated_at=timezone.now())
+                AccruedFine.objects.filter(
+                    borrowing_id__in=[borrowing.id for borrowing in returnable]
+                ).delete()
+
+                allocate_or_restock(
+                    Counter(borrowing.book_id for borrowing in returnable)
+                )
+
+            overdue = []
+            for borrowing in returnable:
+                borrowing.actual_return_date = today
+                if today > borrowing.expected_return_date:
+                    overdue.append(borrowing)
+
+            payments = Payment.objects.bulk_create(
+                Payment(
+                    status=Payment.StatusChoices.PENDING,
+                    type=Payment.TypeChoices.FINE,
+                    borrowing=borrowing,
+                    user_id=borrowing.user_id,
+                    money_to_pay=calculate_fine(borrowing),
+                )
+                for borrowing in overdue
+            )
+            success_url, cancel_url = build_checkout_urls(request)
+            for payment in payments:
+                fines[payment.borrowing_id] = payment.money_to_pay
+                transaction.on_commit(
+                    lambda payment=payment: async_task(
+                        "apps.payments.tasks.prepare_checkout_session",
+                        payment.id,
+                        fine_product_name(payment.borrowing.book),
+                        success_url,
+                        cancel_url,
+                    )
+                )
+
+            record_returns(returnable, fines)
+            record_created(payments)
+
+        returned_ids = {borrowing.id for borrowing in returnable}
+        results = []
+        for borrowing_id in borrowing_ids:
+            if borrowing_id in returned_ids:
+                outcome = BorrowingReturnOutcomeSerializer.RETURNED
+            elif borrowing_id in borrowings:
+                outcome = BorrowingReturnOutcomeSerializer.ALREADY_RETURNED
+            else:
+                outcome = BorrowingReturnOutcomeSerializer.NOT_FOUND
+            results.append(
+                {
+                    "id": borrowing_id,
+                    "outcome": outcome,
+                    "fine": fines.get(borrowing_id),
+                }
+            )
+
+        result = BorrowingBulkReturnResultSerializer({"results": results})
+        return Response(result.data, status=status.HTTP_200_OK)
+
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="stats",
+        permission_classes=[IsAdminUser],
+    )
+    def stats(self, request: Request) -> Response:
+        """
+        Per-book or per-user circulation numbers, most borrowed first.
+
+        Reads only the rollup tables, so the cost depends on the number of
+        books or users rather than on the borrowing history.
+        """
+        group = request.query_params.get("group", "book")
+        if group == "book":
+            queryset = BookCirculationStats.objects.select_related("book")
+            serializer_class = BookCirculationStatsSerializer
+        elif group == "user":
+            queryset = UserCirculationStats.objects.select_related("user")
+            serializer_class = UserCirculationStatsSerializer
+        else:
+            raise ValidationError({"group": ["Expected 'book' or 'user'."]})
+
+        if ids := request.query_params.get(f"{group}_id"):
+            queryset = queryset.filter(
+                pk__in=[pk for pk in ids.split(",") if pk.isdigit()]
+            )
+
+        # Borrow counts tie too often for a cursor; pages are numbered.
+        self.cursor_ordering = None
+        page = self.paginate_queryset(
+            queryset.order_by("-borrow_count", f"{group}_id")
+        )
+        serializer = serializer_class(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="export",
+        permission_classes=[IsAdminUser],
+    )
+    def export(self, request: Request) -> HttpResponseBase:
+        """
+        Stream every borrowing matching the list filters as CSV or NDJSON.
+        """
+        queryset = (
+            self.get_queryset()
+            .order_by("id")
+            .values(
+                "id",
+                "user_id",
+                "book_id",
+                "borrow_date",
+                "expected_return_date",
+                "actual_return_date",
+                "cancelled",
+                user_email=F("user__email"),
+                book_title=F("book__title"),
+            )
+        )
+        return export_response(
+            queryset,
+            EXPORT_FIELDS,
+            request.query_params.get(OUTPUT_QUERY_PARAM),
+            "borrowings",
+            chunk_size=settings.EXPORT_CHUNK_SIZE,
+        )
+
     def get_queryset(self) -> QuerySet:
         queryset = self.queryset
         user = self.request.user
@@ -97,8 +329,8 @@ class BorrowingViewSet(
         ):
             queryset = queryset.filter(user_id=user_id)
 
-        # Filter borrowings by "is_active" param:
-        # active (not returned) or completed (returned).
+        # Filter borrowings by "is_active" param: active (not returned)
+        # or completed (returned; cancelled checkouts were never lent).
         is_active_param = self.request.query_params.get("is_active")
 
         if is_active_param is not None:
@@ -107,7 +339,9 @@ class BorrowingViewSet(
             if is_active:
                 queryset = queryset.filter(actual_return_date__isnull=True)
             else:
-                queryset = queryset.filter(actual_return_date__isnull=False)
+                queryset = queryset.filter(
+                    actual_return_date__isnull=False, cancelled=False
+                )
 
         if self.action == "list":
             return queryset.select_related("book")
@@ -118,6 +352,43 @@ class BorrowingViewSet(
 
         return queryset
 
+    def get_last_modified(self) -> datetime | None:
+        """
+        Return when the requested borrowing, its book or any of its
+        payments last changed, without loading the objects themselves.
+        """
+        # A subquery rather than Max(): on the partitioned table Postgres
+        # cannot group by the borrowing id alone.
+        payments_updated_at = (
+            Payment.objects.filter(borrowing=OuterRef("pk"))
+            .order_by("-updated_at")
+            .values("updated_at")[:1]
+        )
+        try:
+            row = (
+                self.get_queryset()
+                .prefetch_related(None)
+                .filter(pk=self.kwargs["pk"])
+                .values("updated_at", "book__updated_at")
+                .annotate(payments_updated_at=Subquery(payments_updated_at))
+                .first()
+            )
+        except ValueError:
+            return None
+
+        if row is None:
+            return None
+        return max(timestamp for timestamp in row.values() if timestamp)
+
+    def retrieve(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        return conditional_response(
+            request,
+            self.get_last_modified(),
+            lambda: super(BorrowingViewSet, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
+
     def get_serializer_class(self) -> Type[Serializer]:
         user = self.request.user
 
@@ -130,35 +401,81 @@ class BorrowingViewSet(
         if self.action == "create":
             return BorrowingCreateSerializer
 
+        if self.action == "cart":
+            return BorrowingCartSerializer
+
+        if self.action == "bulk_return":
+            return BorrowingBulkReturnSerializer
+
         return self.serializer_class
 
+    def prefers_async(self) -> bool:
+        """Return True if the client sent `Prefer: respond-async`."""
+        preferences = self.request.headers.get("Prefer", "").lower()
+        return any(
+            preference.split("=")[0].strip() == "respond-async"
+            for preference in preferences.split(",")
+        )
+
     def perform_create(self, serializer: BorrowingCreateSerializer) -> None:
         validated_data = serializer.validated_data
         book = validated_data["book"]
         expected_return_date = validated_data["expected_return_date"]
         borrow_date = timezone.now().date()
 
-        try:
-            stripe_session, money_to_pay = create_payment_session(
-                book, self.request, expected_return_date, borrow_date
+        # In async mode the Stripe session is created by a background task
+        # once the borrowing is committed, keeping Stripe off the request.
+        stripe_session = None
+        if self.prefers_async():
+            money_to_pay = calculate_rental_fee(
+                book, expected_return_date, borrow_date
             )
-        except Exception as e:
-            raise ValidationError(f"Error preparing Stripe session: {e}")
+        else:
+            try:
+                stripe_session, money_to_pay = create_payment_session(
+                    book, self.request, expected_return_date, borrow_date
+                )
+            except stripe.APIConnectionError as e:
+                raise PaymentProviderUnavailable() from e
+            except Exception as e:
+                raise ValidationError(f"Error preparing Stripe session: {e}")
 
         with transaction.atomic():
-            book.inventory -= 1
-            book.save()
+            # validate_book only pre-checks stock; the conditional UPDATE
+            # is what actually guards against concurrent checkouts. A copy
+            # put aside for the user's hold is already out of inventory.
+            if not claim_ready_hold(self.request.user.id, book.id):
+                if not reserve_copy(book.id):
+                    raise ValidationError(
+                        {"book": ["This book is out of stock."]}
+                    )
+                book.inventory -= 1
+                transaction.on_commit(lambda: invalidate_book(book.id))
 
             borrowing = serializer.save(user=self.request.user)
 
-            Payment.objects.create(
+            payment = Payment.objects.create(
                 status="PENDING",
                 type="PAYMENT",
                 borrowing=borrowing,
-                session_url=stripe_session.url,
-                session_id=stripe_session.id,
+                session_url=stripe_session.url if stripe_session else "",
+                session_id=stripe_session.id if stripe_session else None,
                 money_to_pay=money_to_pay,
             )
+            record_borrowings([borrowing], [money_to_pay])
+            record_created([payment])
+
+            if stripe_session is None:
+                success_url, cancel_url = build_checkout_urls(self.request)
+                transaction.on_commit(
+                    lambda: async_task(
+                        "apps.payments.tasks.prepare_checkout_session",
+                        payment.id,
+                        book.title,
+                        success_url,
+                        cancel_url,
+                    )
+                )
 
             transaction.on_commit(
                 lambda: send_telegram_message(
@@ -169,6 +486,7 @@ class BorrowingViewSet(
                 )
             )
 
+    @idempotent
     def create(self, request: Request, *args, **kwargs) -> Response:
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -177,9 +495,115 @@ class BorrowingViewSet(
         # Use detail serializer to return full borrowing info in the response.
         detail_serializer = BorrowingDetailSerializer(serializer.instance)
 
+        if self.prefers_async():
+            # The client polls the payment until its session_url is set.
+            payment = serializer.instance.payments.get()
+            status_url = request.build_absolute_uri(
+                reverse("payments:payment-detail", args=[payment.id])
+            )
+            return Response(
+                detail_serializer.data,
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Location": status_url, "Retry-After": "1"},
+            )
+
         headers = self.get_success_headers(detail_serializer.data)
         return Response(
             detail_serializer.data,
             status=status.HTTP_201_CREATED,
             headers=headers,
         )
+
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="cart",
+        permission_classes=[IsAuthenticated],
+    )
+    @idempotent
+    def cart(self, request: Request) -> Response:
+        """Borrow several books at once and pay with one Stripe session."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data["items"]
+        borrow_date = timezone.now().date()
+
+        try:
+            stripe_session, amounts = create_cart_session(
+                request,
+                [
+                    (item["book"], item["expected_return_date"])
+                    for item in items
+                ],
+                borrow_date,
+            )
+        except stripe.APIConnectionError as e:
+            raise PaymentProviderUnavailable() from e
+        except Exception as e:
+            raise ValidationError(f"Error preparing Stripe session: {e}")
+
+        counts = Counter(item["book"].id for item in items)
+        with transaction.atomic():
+            # As in perform_create, a copy put aside for one of the user's
+            # ready holds is already out of inventory.
+            for book_id in counts:
+                if claim_ready_hold(request.user.id, book_id):
+                    counts[book_id] -= 1
+            counts = +counts
+            if counts and not reserve_copies(counts):
+                raise ValidationError(
+                    {"items": ["Some of the books are out of stock."]}
+                )
+            for book_id in counts:
+                transaction.on_commit(
+                    lambda book_id=book_id: invalidate_book(book_id)
+                )
+
+            borrowings = Borrowing.objects.bulk_create(
+                Borrowing(
+                    user=request.user,
+                    book=item["book"],
+                    expected_return_date=item["expected_return_date"],
+                )
+                for item in items
+            )
+            payments = Payment.objects.bulk_create(
+                Payment(
+                    status=Payment.StatusChoices.PENDING,
+                    type=Payment.TypeChoices.PAYMENT,
+                    borrowing=borrowing,
+                    user=request.user,
+                    session_url=stripe_session.url,
+                    session_id=stripe_session.id,
+                    money_to_pay=money_to_pay,
+                )
+                for borrowing, money_to_pay in zip(borrowings, amounts)
+            )
+            record_borrowings(borrowings, amounts)
+            record_created(payments)
+
+            books = "\n".join(
+                f"- *{item['book'].title}* "
+                f"(return by {item['expected_return_date']})"
+                for item in items
+            )
+            transaction.on_commit(
+                lambda: send_telegram_message(
+                    f"New borrowings created\n\n"
+                    f"User: `{request.user.email}`\n"
+                    f"Books:\n{books}"
+                )
+            )
+
+        borrowings = (
+            Borrowing.objects.filter(
+                pk__in=[borrowing.pk for borrowing in borrowings]
+            )
+            .select_related("book", "user")
+            .prefetch_related("payments")
+            .order_by("pk")
+        )
+        result = BorrowingCartResultSerializer(
+            {"session_url": stripe_session.url, "borrowings": borrowings}
+        )
+        return Response(result.data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from .models import Hold
+
+
+@admin.register(Hold)
+class HoldAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "book",
+        "user",
+        "status",
+        "created_at",
+        "ready_until",
+    )
+    list_filter = ("status",)
+    search_fields = ("book__title", "user__email")
@@ -0,0 +1,34 @@
+from django.db import migrations
+from django.utils import timezone
+
+SCHEDULE = "Expire holds"
+
+
+def schedule_expiry(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.update_or_create(
+        name=SCHEDULE,
+        defaults={
+            "func": "apps.holds.tasks.expire_holds",
+            "schedule_type": "H",
+            "repeats": -1,
+            "next_run": timezone.now(),
+        },
+    )
+
+
+def unschedule_expiry(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name=SCHEDULE).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("holds", "0001_initial"),
+        ("django_q", "0018_task_success_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_expiry, unschedule_expiry),
+    ]
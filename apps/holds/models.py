@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+
+from apps.books.models import Book
+
+
+class Hold(models.Model):
+    class StatusChoices(models.TextChoices):
+        WAITING = "WAITING", "Waiting"
+        READY = "READY", "Ready for pickup"
+        FULFILLED = "FULFILLED", "Fulfilled"
+        CANCELLED = "CANCELLED", "Cancelled"
+        EXPIRED = "EXPIRED", "Expired"
+
+    ACTIVE_STATUSES = (StatusChoices.WAITING, StatusChoices.READY)
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="holds",
+    )
+    book = models.ForeignKey(
+        Book, on_delete=models.CASCADE, related_name="holds"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=StatusChoices.choices,
+        default=StatusChoices.WAITING,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when a returned copy is put aside for the user.
+    ready_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "book"],
+                condition=Q(status__in=["WAITING", "READY"]),
+                name="unique_active_hold",
+            ),
+        ]
+        indexes = [
+            # The queue of a book: its head is the first entry.
+            models.Index(
+                fields=["book", "id"],
+                condition=Q(status="WAITING"),
+                name="hold_queue_idx",
+            ),
+            models.Index(
+                fields=["ready_until"],
+                condition=Q(status="READY"),
+                name="hold_ready_until_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Hold {self.id} ({self.status}) on {self.book_id}"
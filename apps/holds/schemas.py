@@ -0,0 +1,44 @@
+from drf_spectacular.utils import (
+    extend_schema_view,
+    extend_schema,
+    OpenApiParameter,
+    OpenApiResponse,
+)
+from .serializers import HoldCreateSerializer, HoldSerializer
+
+hold_schema = extend_schema_view(
+    list=extend_schema(
+        summary="List holds",
+        description=(
+            "Holds of the current user (all holds for admins).\n\n"
+            "### Filters\n"
+            "- `status`: `WAITING`, `READY`, `FULFILLED`, `CANCELLED` or "
+            "`EXPIRED`\n"
+            "- `user_id`: Show holds of a specific user (admin only)"
+        ),
+        parameters=[
+            OpenApiParameter(name="status", required=False),
+            OpenApiParameter(name="user_id", required=False, type=int),
+        ],
+        responses=HoldSerializer,
+    ),
+    retrieve=extend_schema(
+        summary="Retrieve a hold", responses=HoldSerializer
+    ),
+    create=extend_schema(
+        summary="Place a hold on an out-of-stock book",
+        description=(
+            "Join the book's waiting queue. When a copy is returned it is "
+            "put aside for the first hold in line, which becomes `READY` "
+            "and is notified by email; the user then borrows the book as "
+            "usual before `ready_until`."
+        ),
+        request=HoldCreateSerializer,
+        responses={201: HoldSerializer},
+    ),
+    destroy=extend_schema(
+        summary="Cancel a hold",
+        description="A copy put aside for a ready hold is passed on.",
+        responses={204: OpenApiResponse(description="Hold cancelled.")},
+    ),
+)
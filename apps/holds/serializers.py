@@ -0,0 +1,41 @@
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from apps.books.models import Book
+from .models import Hold
+
+DUPLICATE_HOLD_MESSAGE = "You already have a hold on this book."
+
+
+class HoldSerializer(serializers.ModelSerializer):
+    book_title = serializers.CharField(source="book.title", read_only=True)
+
+    class Meta:
+        model = Hold
+        fields = (
+            "id",
+            "user",
+            "book",
+            "book_title",
+            "status",
+            "created_at",
+            "ready_until",
+        )
+        read_only_fields = ("user", "status", "created_at", "ready_until")
+
+
+class HoldCreateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Hold
+        fields = ("book",)
+
+    def validate_book(self, value: Book) -> Book:
+        if value.inventory > 0:
+            raise ValidationError("This book is in stock; borrow it instead.")
+        if Hold.objects.filter(
+            user=self.context["request"].user,
+            book=value,
+            status__in=Hold.ACTIVE_STATUSES,
+        ).exists():
+            raise ValidationError(DUPLICATE_HOLD_MESSAGE)
+        return value
@@ -0,0 +1,119 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django_q.tasks import async_task
+
+from apps.books.cache import invalidate_book
+from apps.books.services import release_copies
+from .models import Hold
+
+
+def allocate_or_restock(counts: dict[int, int]) -> list[int]:
+    """
+    Hand returned copies to the heads of the hold queues.
+
+    `counts` maps book ids to returned copies. For every book, up to that
+    many waiting holds are taken from the head of its queue and become
+    ready for pickup; the remaining copies go back into inventory. Holds
+    locked by a concurrent allocation or cancellation are skipped rather
+    than waited for, and each head lookup is an index range scan of at
+    most `count` rows, however long the queue. Must run inside a
+    transaction. Returns the ids of the allocated holds.
+    """
+    allocated = []
+    restock = {}
+    for book_id, count in counts.items():
+        hold_ids = list(
+            Hold.objects.select_for_update(skip_locked=True)
+            .filter(book_id=book_id, status=Hold.StatusChoices.WAITING)
+            .order_by("id")
+            .values_list("id", flat=True)[:count]
+        )
+        allocated += hold_ids
+        if count > len(hold_ids):
+            restock[book_id] = count - len(hold_ids)
+
+    if allocated:
+        now = timezone.now()
+        Hold.objects.filter(pk__in=allocated).update(
+            status=Hold.StatusChoices.READY,
+            ready_until=now + timedelta(days=settings.HOLD_PICKUP_DAYS),
+            updated_at=now,
+        )
+        for hold_id in allocated:
+            transaction.on_commit(
+                lambda hold_id=hold_id: async_task(
+                    "apps.holds.tasks.notify_hold_ready", hold_id
+                )
+            )
+    if restock:
+        release_copies(restock)
+        for book_id in restock:
+            transaction.on_commit(
+                lambda book_id=book_id: invalidate_book(book_id)
+            )
+    return allocated
+
+
+def claim_ready_hold(user_id: int, book_id: int) -> bool:
+    """
+    Mark the user's ready hold on a book as fulfilled, if any. A hold past
+    its `ready_until` is left to `expire_ready_holds`, which passes its
+    copy on.
+    """
+    return bool(
+        Hold.objects.filter(
+            user_id=user_id,
+            book_id=book_id,
+            status=Hold.StatusChoices.READY,
+            ready_until__gte=timezone.now(),
+        ).update(
+            status=Hold.StatusChoices.FULFILLED, updated_at=timezone.now()
+        )
+    )
+
+
+def cancel_hold(hold: Hold) -> None:
+    """Cancel an active hold, passing a copy put aside for it on."""
+    with transaction.atomic():
+        hold = (
+            Hold.objects.select_for_update()
+            .filter(pk=hold.pk, status__in=Hold.ACTIVE_STATUSES)
+            .first()
+        )
+        if hold is None:
+            return
+
+        was_ready = hold.status == Hold.StatusChoices.READY
+        hold.status = Hold.StatusChoices.CANCELLED
+        hold.save(update_fields=["status", "updated_at"])
+        if was_ready:
+            allocate_or_restock({hold.book_id: 1})
+
+
+def expire_ready_holds(batch_size: int = 500) -> int:
+    """
+    Expire ready holds that were not picked up in time and pass their
+    copies on. Returns the number of expired holds.
+    """
+    with transaction.atomic():
+        holds = list(
+            Hold.objects.select_for_update(skip_locked=True)
+            .filter(
+                status=Hold.StatusChoices.READY,
+                ready_until__lt=timezone.now(),
+            )
+            .order_by("ready_until")
+            .values_list("id", "book_id")[:batch_size]
+        )
+        if not holds:
+            return 0
+
+        Hold.objects.filter(pk__in=[hold_id for hold_id, _ in holds]).update(
+            status=Hold.StatusChoices.EXPIRED, updated_at=timezone.now()
+        )
+        allocate_or_restock(Counter(book_id for _, book_id in holds))
+    return len(holds)
@@ -0,0 +1,32 @@
+from django.core.mail import send_mail
+
+from .models import Hold
+from .services import expire_ready_holds
+
+
+def notify_hold_ready(hold_id: int) -> None:
+    """Email the user that the book they were waiting for is ready."""
+    hold = (
+        Hold.objects.select_related("user", "book")
+        .filter(pk=hold_id, status=Hold.StatusChoices.READY)
+        .first()
+    )
+    if hold is None:
+        return
+
+    send_mail(
+        subject=f"Your hold on {hold.book.title} is ready",
+        message=(
+            f"A copy of {hold.book.title} by {hold.book.author} is waiting "
+            f"for you. Borrow it before {hold.ready_until:%Y-%m-%d %H:%M} "
+            f"UTC, after that it goes to the next reader in line."
+        ),
+        from_email=None,
+        recipient_list=[hold.user.email],
+    )
+
+
+def expire_holds() -> None:
+    """Expire holds that were not picked up and pass their copies on."""
+    while expire_ready_holds():
+        pass
@@ -0,0 +1,259 @@
+import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.books.models import Book
+from apps.borrowings.models import Borrowing
+from apps.holds.models import Hold
+from apps.holds.serializers import HoldCreateSerializer
+from apps.holds.services import expire_ready_holds
+from apps.holds.tasks import notify_hold_ready
+
+HOLD_URL = reverse("holds:hold-list")
+BORROWING_URL = reverse("borrowings:borrowing-list")
+CART_URL = reverse("borrowings:borrowing-cart")
+
+
+def detail_url(hold_id: int):
+    """Return hold detail URL"""
+    return reverse("holds:hold-detail", args=[hold_id])
+
+
+def return_url(borrowing_id: int):
+    """Return borrowing return action URL"""
+    return reverse(
+        "borrowings:borrowing-return-borrowing", args=[borrowing_id]
+    )
+
+
+class HoldApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password123"
+        )
+        self.other = get_user_model().objects.create_user(
+            email="other@test.com", password="password123"
+        )
+        self.client.force_authenticate(self.user)
+        self.book = Book.objects.create(
+            title="Popular Book",
+            author="Author",
+            cover="HARD",
+            inventory=0,
+            daily_fee=1.00,
+        )
+        self.borrowing = Borrowing.objects.create(
+            user=self.other,
+            book=self.book,
+            expected_return_date=(
+                timezone.now().date() + datetime.timedelta(days=5)
+            ),
+        )
+
+    def test_place_hold(self):
+        """Test placing a hold on an out-of-stock book"""
+        res = self.client.post(HOLD_URL, {"book": self.book.id})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["status"], Hold.StatusChoices.WAITING)
+        res = self.client.post(HOLD_URL, {"book": self.book.id})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_concurrent_duplicate_hold_is_rejected(self):
+        """Test losing the race to the unique hold constraint gives 400"""
+        Hold.objects.create(user=self.user, book=self.book)
+
+        # Simulate a request that passed the duplicate pre-check before
+        # the concurrent one committed its hold.
+        with patch.object(
+            HoldCreateSerializer, "validate_book", lambda self, value: value
+        ):
+            res = self.client.post(HOLD_URL, {"book": self.book.id})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("book", res.data)
+        self.assertEqual(Hold.objects.count(), 1)
+
+    def test_cannot_hold_book_in_stock(self):
+        """Test a hold on an available book is refused"""
+        self.book.inventory = 1
+        self.book.save()
+
+        res = self.client.post(HOLD_URL, {"book": self.book.id})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch("apps.holds.services.async_task")
+    def test_return_allocates_head_of_queue(self, mock_async_task):
+        """Test a returned copy goes to the first hold instead of stock"""
+        first = Hold.objects.create(user=self.user, book=self.book)
+        second = Hold.objects.create(
+            user=get_user_model().objects.create_user(
+                email="third@test.com", password="password123"
+            ),
+            book=self.book,
+        )
+        self.client.force_authenticate(self.other)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(return_url(self.borrowing.id))
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.book.refresh_from_db()
+        self.assertEqual(first.status, Hold.StatusChoices.READY)
+        self.assertIsNotNone(first.ready_until)
+        self.assertEqual(second.status, Hold.StatusChoices.WAITING)
+        self.assertEqual(self.book.inventory, 0)
+        mock_async_task.assert_called_once_with(
+            "apps.holds.tasks.notify_hold_ready", first.id
+        )
+
+    @patch("apps.payments.stripe_client.StripeGateway.create_checkout_session")
+    def test_borrow_with_ready_hold(self, mock_create):
+        """Test the holder borrows the copy put aside for them"""
+        mock_create.return_value = SimpleNamespace(
+            id="cs_hold", url="https://checkout.stripe.com/cs_hold"
+        )
+        hold = Hold.objects.create(
+            user=self.user,
+            book=self.book,
+            status=Hold.StatusChoices.READY,
+            ready_until=timezone.now() + datetime.timedelta(days=1),
+        )
+
+        res = self.client.post(
+            BORROWING_URL,
+            {
+                "book": self.book.id,
+                "expected_return_date": (
+                    timezone.now().date() + datetime.timedelta(days=3)
+                ),
+            },
+        )
+
+        hold.refresh_from_db()
+        self.book.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(hold.status, Hold.StatusChoices.FULFILLED)
+        self.assertEqual(self.book.inventory, 0)
+
+    @patch("apps.payments.stripe_client.StripeGateway.create_checkout_session")
+    def test_cart_with_ready_hold(self, mock_create):
+        """Test the holder can check the held copy out through the cart"""
+        mock_create.return_value = SimpleNamespace(
+            id="cs_cart", url="https://checkout.stripe.com/cs_cart"
+        )
+        other_book = Book.objects.create(
+            title="Other Book",
+            author="Author",
+            cover="SOFT",
+            inventory=1,
+            daily_fee=1.00,
+        )
+        hold = Hold.objects.create(
+            user=self.user,
+            book=self.book,
+            status=Hold.StatusChoices.READY,
+            ready_until=timezone.now() + datetime.timedelta(days=1),
+        )
+        return_date = timezone.now().date() + datetime.timedelta(days=3)
+        items = [
+            {"book": book.id, "expected_return_date": return_date}
+            for book in (self.book, other_book)
+        ]
+
+        res = self.client.post(CART_URL, {"items": items}, format="json")
+
+        hold.refresh_from_db()
+        self.book.refresh_from_db()
+        other_book.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(hold.status, Hold.StatusChoices.FULFILLED)
+        self.assertEqual(self.book.inventory, 0)
+        self.assertEqual(other_book.inventory, 0)
+
+    @patch("apps.payments.stripe_client.StripeGateway.create_checkout_session")
+    def test_cannot_borrow_with_expired_ready_hold(self, mock_create):
+        """Test a ready hold past its pickup deadline is not claimed"""
+        mock_create.return_value = SimpleNamespace(
+            id="cs_hold", url="https://checkout.stripe.com/cs_hold"
+        )
+        hold = Hold.objects.create(
+            user=self.user,
+            book=self.book,
+            status=Hold.StatusChoices.READY,
+            ready_until=timezone.now() - datetime.timedelta(minutes=1),
+        )
+
+        res = self.client.post(
+            BORROWING_URL,
+            {
+                "book": self.book.id,
+                "expected_return_date": (
+                    timezone.now().date() + datetime.timedelta(days=3)
+                ),
+            },
+        )
+
+        hold.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(hold.status, Hold.StatusChoices.READY)
+
+    @patch("apps.holds.services.async_task")
+    def test_cancel_ready_hold_passes_copy_on(self, mock_async_task):
+        """Test cancelling a ready hold allocates the next one"""
+        hold = Hold.objects.create(
+            user=self.user,
+            book=self.book,
+            status=Hold.StatusChoices.READY,
+            ready_until=timezone.now() + datetime.timedelta(days=1),
+        )
+        next_hold = Hold.objects.create(user=self.other, book=self.book)
+
+        res = self.client.delete(detail_url(hold.id))
+
+        hold.refresh_from_db()
+        next_hold.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(hold.status, Hold.StatusChoices.CANCELLED)
+        self.assertEqual(next_hold.status, Hold.StatusChoices.READY)
+
+    def test_expired_hold_restocks_book(self):
+        """Test an uncollected hold expires and its copy is restocked"""
+        hold = Hold.objects.create(
+            user=self.user,
+            book=self.book,
+            status=Hold.StatusChoices.READY,
+            ready_until=timezone.now() - datetime.timedelta(minutes=1),
+        )
+
+        self.assertEqual(expire_ready_holds(), 1)
+
+        hold.refresh_from_db()
+        self.book.refresh_from_db()
+        self.assertEqual(hold.status, Hold.StatusChoices.EXPIRED)
+        self.assertEqual(self.book.inventory, 1)
+
+    def test_notify_hold_ready(self):
+        """Test the ready notification is emailed to the holder"""
+        hold = Hold.objects.create(
+            user=self.user,
+            book=self.book,
+            status=Hold.StatusChoices.READY,
+            ready_until=timezone.now() + datetime.timedelta(days=1),
+        )
+
+        notify_hold_ready(hold.id)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.user.email])
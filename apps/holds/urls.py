@@ -0,0 +1,10 @@
+from rest_framework import routers
+
+from .views import HoldViewSet
+
+router = routers.DefaultRouter()
+router.register("", HoldViewSet, basename="hold")
+
+urlpatterns = router.urls
+
+app_name = "holds"
@@ -0,0 +1,73 @@
+from typing import Type
+
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from rest_framework import mixins, status, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.serializers import Serializer
+
+from .models import Hold
+from .schemas import hold_schema
+from .serializers import (
+    DUPLICATE_HOLD_MESSAGE,
+    HoldCreateSerializer,
+    HoldSerializer,
+)
+from .services import cancel_hold
+
+
+@hold_schema
+class HoldViewSet(
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    queryset = Hold.objects.all()
+    serializer_class = HoldSerializer
+    permission_classes = (IsAuthenticated,)
+    cursor_ordering = ("-id",)
+
+    def get_queryset(self) -> QuerySet:
+        queryset = self.queryset.select_related("book")
+        user = self.request.user
+
+        if not user.is_staff:
+            queryset = queryset.filter(user=user)
+
+        if user.is_staff and (
+            user_id := self.request.query_params.get("user_id")
+        ):
+            queryset = queryset.filter(user_id=user_id)
+
+        if hold_status := self.request.query_params.get("status"):
+            queryset = queryset.filter(status=hold_status.upper())
+
+        return queryset
+
+    def get_serializer_class(self) -> Type[Serializer]:
+        if self.action == "create":
+            return HoldCreateSerializer
+        return self.serializer_class
+
+    def create(self, request: Request, *args, **kwargs) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # validate_book only pre-checks for a duplicate; a concurrent
+        # request can still win the race to unique_active_hold.
+        try:
+            with transaction.atomic():
+                hold = serializer.save(user=request.user)
+        except IntegrityError:
+            raise ValidationError({"book": [DUPLICATE_HOLD_MESSAGE]})
+
+        return Response(
+            HoldSerializer(hold).data, status=status.HTTP_201_CREATED
+        )
+
+    def perform_destroy(self, instance: Hold) -> None:
+        cancel_hold(instance)
@@ -1,6 +1,11 @@
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import QuerySet
+from django.forms import ModelForm
+from django.http import HttpRequest
 
-from .models import Payment
+from .models import AccruedFine, Payment, StripeEvent
+from .totals import record_created, record_deleted
 
 
 @admin.register(Payment)
@@ -9,8 +14,58 @@ class PaymentAdmin(admin.ModelAdmin):
         "id",
         "status",
         "type",
-        "borrowing",
+        # The id only: borrowings of detached partitions are gone.
+        "borrowing_id",
         "money_to_pay",
     )
     list_filter = ("status", "type")
-    search_fields = ("borrowing__user__email", "borrowing__book__title")
+    search_fields = ("user__email", "borrowing__book__title")
+    readonly_fields = ("user",)
+
+    def save_model(
+        self,
+        request: HttpRequest,
+        obj: Payment,
+        form: ModelForm,
+        change: bool,
+    ) -> None:
+        with transaction.atomic():
+            if change:
+                record_deleted(
+                    [Payment.objects.select_for_update().get(pk=obj.pk)]
+                )
+            obj.user_id = obj.borrowing.user_id
+            super().save_model(request, obj, form, change)
+            record_created([obj])
+
+    def delete_model(self, request: HttpRequest, obj: Payment) -> None:
+        with transaction.atomic():
+            record_deleted([obj])
+            super().delete_model(request, obj)
+
+    def delete_queryset(
+        self, request: HttpRequest, queryset: QuerySet
+    ) -> None:
+        with transaction.atomic():
+            record_deleted(queryset.select_for_update())
+            super().delete_queryset(request, queryset)
+
+
+@admin.register(AccruedFine)
+class AccruedFineAdmin(admin.ModelAdmin):
+    list_display = (
+        "borrowing",
+        "user",
+        "days_overdue",
+        "amount",
+        "accrued_on",
+    )
+    search_fields = ("user__email",)
+    raw_id_fields = ("borrowing", "user")
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "type", "received_at")
+    list_filter = ("type",)
+    search_fields = ("id",)
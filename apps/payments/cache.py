@@ -0,0 +1,12 @@
+from django.conf import settings
+
+from library_service.cache import VersionedCache
+
+summary_cache = VersionedCache(
+    "payments:summary", timeout=settings.PAYMENT_SUMMARY_CACHE_TIMEOUT
+)
+
+
+def invalidate_summary() -> None:
+    """Drop every cached payment summary."""
+    summary_cache.bump()
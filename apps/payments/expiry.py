@@ -0,0 +1,152 @@
+import logging
+from collections import Counter
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.borrowings.models import Borrowing
+from apps.borrowings.stats import record_cancellations
+from apps.holds.services import allocate_or_restock
+from .models import AccruedFine, Payment
+from .stripe_client import StripeGateway, get_stripe_gateway
+from .totals import record_status_change
+
+EXPIRED = "expired"
+PAID = "paid"
+OPEN = "open"
+
+logger = logging.getLogger(__name__)
+
+
+def _close_session(gateway: StripeGateway, session_id: str | None) -> str:
+    """
+    Expire a checkout session so it can no longer be paid.
+
+    Returns EXPIRED when the session is (now) expired, PAID when it was
+    paid after all and OPEN when it is still being paid or Stripe does
+    not know it, e.g. under another API key; the payment is then left
+    pending. Outages propagate.
+    """
+    if session_id is None:
+        # The background task never got to create the session.
+        return EXPIRED
+    try:
+        gateway.expire_checkout_session(session_id)
+        return EXPIRED
+    except stripe.InvalidRequestError:
+        # Only open sessions can be expired; most abandoned ones were
+        # already expired by Stripe, a few were paid at the last minute.
+        pass
+    try:
+        session = gateway.retrieve_checkout_session(session_id)
+    except stripe.InvalidRequestError as e:
+        logger.warning("Cannot close checkout session %s: %s", session_id, e)
+        return OPEN
+    if session.status == "expired":
+        return EXPIRED
+    if session.status == "complete" and session.payment_status == "paid":
+        return PAID
+    return OPEN
+
+
+def _cancel(payments: list[Payment], now) -> None:
+    """Cancel the borrowings of expired payments and restock their books."""
+    Payment.objects.filter(pk__in=[payment.pk for payment in payments]).update(
+        status=Payment.StatusChoices.EXPIRED, updated_at=now
+    )
+    borrowings = list(
+        Borrowing.objects.select_for_update().filter(
+            pk__in=[payment.borrowing_id for payment in payments],
+            actual_return_date__isnull=True,
+        )
+    )
+    if borrowings:
+        ids = [borrowing.id for borrowing in borrowings]
+        Borrowing.objects.filter(pk__in=ids).update(
+            actual_return_date=now.date(), cancelled=True, updated_at=now
+        )
+        AccruedFine.objects.filter(borrowing_id__in=ids).delete()
+        allocate_or_restock(
+            Counter(borrowing.book_id for borrowing in borrowings)
+        )
+        fees = {
+            payment.borrowing_id: payment.money_to_pay for payment in payments
+        }
+        record_cancellations(borrowings, fees)
+    # Last, as the payment totals rows are shared by all writers.
+    record_status_change(payments, Payment.StatusChoices.EXPIRED)
+
+
+def expire_abandoned_checkouts(batch_size: int | None = None) -> int:
+    """
+    Cancel borrowings whose rental fee is still unpaid after the session
+    lifetime and give their copies back.
+
+    Payments are read in id-ordered batches and their Stripe sessions
+    expired before any row is locked, so webhooks marking them paid never
+    wait on Stripe calls. The batch is then locked with `SKIP LOCKED`,
+    and the payments still pending are marked EXPIRED, their borrowings
+    closed and their books restocked with one UPDATE for all books (or
+    the copies handed to waiting holds). A session paid at the last
+    minute is marked PAID instead. Returns the number of expired
+    payments.
+    """
+    batch_size = batch_size or settings.PAYMENT_EXPIRY_BATCH_SIZE
+    gateway = get_stripe_gateway()
+    now = timezone.now()
+    cutoff = now - timedelta(hours=settings.PAYMENT_EXPIRY_HOURS)
+    expired_count = 0
+    last_id = 0
+
+    while True:
+        candidates = list(
+            Payment.objects.filter(
+                type=Payment.TypeChoices.PAYMENT,
+                status=Payment.StatusChoices.PENDING,
+                created_at__lt=cutoff,
+                id__gt=last_id,
+            )
+            .order_by("id")
+            .values_list("id", "session_id")[:batch_size]
+        )
+        if not candidates:
+            return expired_count
+        last_id = candidates[-1][0]
+
+        # A cart shares one session between several payments.
+        outcomes = {}
+        for _, session_id in candidates:
+            if session_id not in outcomes:
+                outcomes[session_id] = _close_session(gateway, session_id)
+
+        with transaction.atomic():
+            # Payments paid or expired meanwhile are left as they are.
+            payments = list(
+                Payment.objects.select_for_update(skip_locked=True)
+                .filter(
+                    pk__in=[pk for pk, _ in candidates],
+                    status=Payment.StatusChoices.PENDING,
+                )
+                .order_by("id")
+            )
+            expired = [
+                payment
+                for payment in payments
+                if outcomes.get(payment.session_id) == EXPIRED
+            ]
+            paid = [
+                payment
+                for payment in payments
+                if outcomes.get(payment.session_id) == PAID
+            ]
+            if paid:
+                record_status_change(paid, Payment.StatusChoices.PAID)
+                Payment.objects.filter(
+                    pk__in=[payment.pk for payment in paid]
+                ).update(status=Payment.StatusChoices.PAID, updated_at=now)
+            if expired:
+                _cancel(expired, now)
+            expired_count += len(expired)
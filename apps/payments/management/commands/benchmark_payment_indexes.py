@@ -0,0 +1,134 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.base_user import AbstractBaseUser
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from apps.books.models import Book
+from apps.borrowings.models import Borrowing
+from apps.payments.models import Payment
+
+BENCHMARK_INDEXES = ("payment_user_id_idx",)
+BATCH_SIZE = 10_000
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed payments inside a rolled-back transaction and print the "
+        "EXPLAIN ANALYZE plans of a user's payment list, joined through "
+        "the borrowing as before and on the denormalized user, without "
+        "and with the (user, -id) index."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--payments", type=int, default=200_000)
+        parser.add_argument("--users", type=int, default=1_000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options) -> None:
+        if connection.vendor != "postgresql":
+            raise CommandError("This benchmark requires PostgreSQL.")
+
+        rng = random.Random(options["seed"])
+        indexes = [
+            index
+            for index in Payment._meta.indexes
+            if index.name in BENCHMARK_INDEXES
+        ]
+
+        # Nothing is kept: the seeded rows and the dropped indexes are
+        # rolled back together at the end.
+        with transaction.atomic():
+            user = self.seed(rng, **options)
+            # Run the deferred foreign key checks of the seeded rows now;
+            # Postgres refuses index DDL while they are pending.
+            with connection.cursor() as cursor:
+                cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.remove_index(Payment, index)
+            self.report("Without indexes", user)
+
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.add_index(Payment, index)
+            self.report("With indexes", user)
+
+            transaction.set_rollback(True)
+
+    def seed(self, rng: random.Random, **options) -> AbstractBaseUser:
+        """Insert users and a paid borrowing per payment; return a user."""
+        User = get_user_model()
+        users = User.objects.bulk_create(
+            User(email=f"benchmark-{i}@example.com", password="!")
+            for i in range(options["users"])
+        )
+        book = Book.objects.create(
+            title="Benchmark book",
+            author="Benchmark",
+            cover=Book.CoverChoices.HARD,
+            inventory=options["payments"],
+            daily_fee=1,
+        )
+
+        expected_return_date = timezone.now().date() + timedelta(days=14)
+        remaining = options["payments"]
+        while remaining > 0:
+            borrowings = Borrowing.objects.bulk_create(
+                Borrowing(
+                    user=rng.choice(users),
+                    book=book,
+                    expected_return_date=expected_return_date,
+                )
+                for _ in range(min(remaining, BATCH_SIZE))
+            )
+            Payment.objects.bulk_create(
+                Payment(
+                    status=Payment.StatusChoices.PAID,
+                    type=Payment.TypeChoices.PAYMENT,
+                    borrowing=borrowing,
+                    user_id=borrowing.user_id,
+                    money_to_pay=14,
+                )
+                for borrowing in borrowings
+            )
+            remaining -= len(borrowings)
+
+        self.stdout.write(
+            f"Seeded {len(users)} users and {options['payments']} "
+            f"borrowings and payments."
+        )
+        return rng.choice(users)
+
+    def queries(self, user: AbstractBaseUser) -> dict[str, QuerySet]:
+        """A user's first payment list page, as the app ran and runs it."""
+        return {
+            "Joined through the borrowing": Payment.objects.filter(
+                borrowing__user=user
+            ).order_by("-id")[:20],
+            "Denormalized user": Payment.objects.filter(user=user).order_by(
+                "-id"
+            )[:20],
+        }
+
+    def report(self, title: str, user: AbstractBaseUser) -> None:
+        with connection.cursor() as cursor:
+            for model in (Borrowing, Payment):
+                cursor.execute(
+                    "ANALYZE "
+                    + connection.ops.quote_name(model._meta.db_table)
+                )
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n{title}"))
+        for label, queryset in self.queries(user).items():
+            self.stdout.write(self.style.MIGRATE_LABEL(label))
+            self.stdout.write(queryset.explain(analyze=True) + "\n")
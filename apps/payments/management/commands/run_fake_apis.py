@@ -0,0 +1,85 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from library_service.fake_apis import FakeApiServer, Faults
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local stand-in for the Stripe and Telegram APIs with "
+        "configurable latency, errors and rate limits. Point the app at "
+        "it with FAKE_APIS_URL."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=12111)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0,
+            help="Milliseconds added to every response.",
+        )
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=0,
+            help="Up to this many random milliseconds more.",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0,
+            help="Share of requests failed with --error-status, 0 to 1.",
+        )
+        parser.add_argument("--error-status", type=int, default=503)
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            default=None,
+            help="Requests per second accepted per API; the rest get 429.",
+        )
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument(
+            "--webhook-url",
+            default=None,
+            help=(
+                "Where paid sessions post their checkout.session.completed "
+                "event, e.g. http://127.0.0.1:8000/api/payments/webhook/."
+            ),
+        )
+        parser.add_argument(
+            "--webhook-secret",
+            default=settings.STRIPE_WEBHOOK_SECRET,
+            help="Secret the events are signed with; the app's by default.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        faults = Faults(
+            latency=options["latency"] / 1000,
+            jitter=options["jitter"] / 1000,
+            error_rate=options["error_rate"],
+            error_status=options["error_status"],
+            rate_limit=options["rate_limit"],
+        )
+        server = FakeApiServer(
+            (options["host"], options["port"]),
+            faults=faults,
+            record=False,
+            seed=options["seed"],
+            webhook_url=options["webhook_url"],
+            webhook_secret=options["webhook_secret"],
+        )
+        self.stdout.write(
+            f"Serving fake Stripe and Telegram APIs at {server.url} "
+            f"(FAKE_APIS_URL={server.url}); stats at /_fake/stats."
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(json.dumps(server.stats(), indent=2))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_payment_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='session_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='session_url',
+            field=models.URLField(blank=True, max_length=500),
+        ),
+    ]
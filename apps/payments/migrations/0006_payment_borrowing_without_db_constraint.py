@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowings', '0006_schedule_circulation_stats'),
+        ('payments', '0005_payment_shared_session'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='borrowing',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='borrowings.borrowing'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowings', '0007_partition_borrowing'),
+        ('payments', '0006_payment_borrowing_without_db_constraint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccruedFine',
+            fields=[
+                ('borrowing', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='accrued_fine', serialize=False, to='borrowings.borrowing')),
+                ('days_overdue', models.PositiveIntegerField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('accrued_on', models.DateField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accrued_fines', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
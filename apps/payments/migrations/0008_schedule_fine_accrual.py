@@ -0,0 +1,41 @@
+from datetime import datetime, time, timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+TASK = "apps.payments.tasks.accrue_overdue_fines"
+NIGHTLY = "Accrue overdue fines"
+
+
+def schedule_accrual(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    tomorrow = timezone.localdate() + timedelta(days=1)
+
+    Schedule.objects.update_or_create(
+        name=NIGHTLY,
+        defaults={
+            "func": TASK,
+            "schedule_type": "D",
+            "repeats": -1,
+            "next_run": timezone.make_aware(
+                datetime.combine(tomorrow, time(2, 0))
+            ),
+        },
+    )
+
+
+def unschedule_accrual(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name=NIGHTLY).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0007_accrued_fine"),
+        ("django_q", "0018_task_success_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_accrual, unschedule_accrual),
+    ]
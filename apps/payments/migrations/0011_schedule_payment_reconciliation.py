@@ -0,0 +1,36 @@
+from django.db import migrations
+from django.utils import timezone
+
+SCHEDULE = "Reconcile pending payments"
+
+
+def schedule_reconciliation(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.update_or_create(
+        name=SCHEDULE,
+        defaults={
+            "func": "apps.payments.tasks.reconcile_payments",
+            "schedule_type": "H",
+            "repeats": -1,
+            "next_run": timezone.now(),
+        },
+    )
+
+
+def unschedule_reconciliation(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name=SCHEDULE).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0010_job_checkpoint"),
+        ("django_q", "0018_task_success_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            schedule_reconciliation, unschedule_reconciliation
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+from django.utils import timezone
+
+SCHEDULE = "Expire abandoned checkouts"
+
+
+def schedule_expiry(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.update_or_create(
+        name=SCHEDULE,
+        defaults={
+            "func": "apps.payments.tasks.expire_checkouts",
+            "schedule_type": "I",
+            "minutes": 15,
+            "repeats": -1,
+            "next_run": timezone.now(),
+        },
+    )
+
+
+def unschedule_expiry(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name=SCHEDULE).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0012_payment_expiry"),
+        ("django_q", "0018_task_success_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_expiry, unschedule_expiry),
+    ]
@@ -0,0 +1,52 @@
+from datetime import datetime, time, timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+TASK = "apps.payments.tasks.rebuild_payment_totals"
+NIGHTLY = "Rebuild payment totals"
+INITIAL = "Initial payment totals build"
+
+
+def schedule_rebuild(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    tomorrow = timezone.localdate() + timedelta(days=1)
+
+    Schedule.objects.update_or_create(
+        name=NIGHTLY,
+        defaults={
+            "func": TASK,
+            "schedule_type": "D",
+            "repeats": -1,
+            "next_run": timezone.make_aware(
+                datetime.combine(tomorrow, time(3, 30))
+            ),
+        },
+    )
+    # Fill the new rollup from the existing payments right away.
+    Schedule.objects.update_or_create(
+        name=INITIAL,
+        defaults={
+            "func": TASK,
+            "schedule_type": "O",
+            "repeats": 1,
+            "next_run": timezone.now(),
+        },
+    )
+
+
+def unschedule_rebuild(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name__in=[NIGHTLY, INITIAL]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0014_payment_daily_total"),
+        ("django_q", "0018_task_success_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_rebuild, unschedule_rebuild),
+    ]
@@ -0,0 +1,79 @@
+from django.db import migrations
+from django.db.models import Max, Min, OuterRef, Subquery
+
+BATCH_SIZE = 10_000
+BORROWINGS = "borrowings_borrowing"
+
+
+def borrowing_user(apps):
+    Borrowing = apps.get_model("borrowings", "Borrowing")
+    return Subquery(
+        Borrowing.objects.filter(pk=OuterRef("borrowing_id")).values(
+            "user_id"
+        )[:1]
+    )
+
+
+def backfill_payment_user(apps, schema_editor):
+    """
+    Copy the borrowing's user onto every payment, one id range at a time.
+
+    The migration is not atomic, so each batch commits on its own and
+    holds its row locks only briefly on a live table.
+    """
+    Payment = apps.get_model("payments", "Payment")
+    bounds = Payment.objects.aggregate(first=Min("id"), last=Max("id"))
+    if bounds["first"] is None:
+        return
+
+    start = bounds["first"]
+    while start <= bounds["last"]:
+        Payment.objects.filter(
+            id__gte=start, id__lt=start + BATCH_SIZE, user__isnull=True
+        ).update(user_id=borrowing_user(apps))
+        start += BATCH_SIZE
+
+    backfill_from_detached_partitions(schema_editor)
+
+
+def backfill_from_detached_partitions(schema_editor):
+    """
+    Fill the payments whose borrowing is in a detached partition.
+
+    Detached partitions are kept as tables named like the attached ones,
+    still holding the borrowings that their paid payments point at.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_class c "
+            "WHERE c.relkind = 'r' AND c.relname ~ %s "
+            "AND c.relnamespace = current_schema()::regnamespace "
+            "AND NOT EXISTS (SELECT 1 FROM pg_inherits i "
+            "WHERE i.inhrelid = c.oid)",
+            [rf"^{BORROWINGS}_p\d{{4}}_\d{{2}}$"],
+        )
+        for (table,) in cursor.fetchall():
+            cursor.execute(
+                f"UPDATE payments_payment p SET user_id = b.user_id "
+                f"FROM {connection.ops.quote_name(table)} b "
+                f"WHERE p.user_id IS NULL AND p.borrowing_id = b.id"
+            )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("payments", "0016_payment_user"),
+        ("borrowings", "0007_partition_borrowing"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_payment_user, migrations.RunPython.noop, elidable=True
+        ),
+    ]
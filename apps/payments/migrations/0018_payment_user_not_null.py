@@ -0,0 +1,154 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+TABLE = "payments_payment"
+TRIGGER = "payments_payment_fill_user"
+
+
+def add_fill_trigger(apps, schema_editor):
+    """
+    Fill the user of payments inserted without one from their borrowing.
+
+    The previous release keeps inserting payments without a user until it
+    is stopped, after this migration ran; with the trigger in place those
+    inserts pass the NOT NULL constraint. The trigger must stay until
+    then, so it is dropped by a migration of the next release.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"""
+        CREATE FUNCTION {TRIGGER}() RETURNS trigger AS $$
+        BEGIN
+            SELECT user_id INTO NEW.user_id
+            FROM borrowings_borrowing WHERE id = NEW.borrowing_id;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """)
+    schema_editor.execute(
+        f"CREATE TRIGGER {TRIGGER} BEFORE INSERT ON {TABLE} "
+        f"FOR EACH ROW WHEN (NEW.user_id IS NULL) "
+        f"EXECUTE FUNCTION {TRIGGER}()"
+    )
+
+
+def drop_fill_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP TRIGGER IF EXISTS {TRIGGER} ON {TABLE}")
+    schema_editor.execute(f"DROP FUNCTION IF EXISTS {TRIGGER}()")
+
+
+def add_not_null_check(apps, schema_editor):
+    """
+    Prove the column has no NULL before SET NOT NULL.
+
+    A NOT VALID check is validated without blocking writes; Postgres then
+    trusts it instead of scanning the table under an exclusive lock.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_user_not_null "
+        f"CHECK (user_id IS NOT NULL) NOT VALID"
+    )
+    schema_editor.execute(
+        f"ALTER TABLE {TABLE} VALIDATE CONSTRAINT {TABLE}_user_not_null"
+    )
+
+
+def drop_not_null_check(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"ALTER TABLE {TABLE} DROP CONSTRAINT IF EXISTS {TABLE}_user_not_null"
+    )
+
+
+def set_not_null(apps, schema_editor):
+    """
+    Make the column NOT NULL without touching its foreign key.
+
+    AlterField would drop and re-add the constraint, validating it over
+    the whole table while writes are blocked.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"ALTER TABLE {TABLE} ALTER COLUMN user_id SET NOT NULL"
+    )
+
+
+def drop_not_null(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"ALTER TABLE {TABLE} ALTER COLUMN user_id DROP NOT NULL"
+    )
+
+
+def backfill_remaining(apps, schema_editor):
+    """
+    Fill payments created by the previous release during the backfill.
+
+    Runs after the trigger is installed, so no payment without a user can
+    be inserted once it is done.
+    """
+    Borrowing = apps.get_model("borrowings", "Borrowing")
+    Payment = apps.get_model("payments", "Payment")
+    Payment.objects.filter(user__isnull=True).update(
+        user_id=Subquery(
+            Borrowing.objects.filter(pk=OuterRef("borrowing_id")).values(
+                "user_id"
+            )[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    # Postgres cannot alter a table with foreign key checks of the
+    # backfill still pending in the same transaction, nor build an index
+    # concurrently inside one.
+    atomic = False
+
+    dependencies = [
+        ("payments", "0017_backfill_payment_user"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(add_fill_trigger, drop_fill_trigger),
+        migrations.RunPython(
+            backfill_remaining, migrations.RunPython.noop, elidable=True
+        ),
+        migrations.RunPython(add_not_null_check, drop_not_null_check),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(set_not_null, drop_not_null),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name="payment",
+                    name="user",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="payments",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(drop_not_null_check, migrations.RunPython.noop),
+        # Built without blocking writes to the table.
+        AddIndexConcurrently(
+            model_name="payment",
+            index=models.Index(
+                fields=["user", "-id"], name="payment_user_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0018_payment_user_not_null'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='paymentdailytotal',
+            name='payment_daily_total_unique',
+        ),
+        migrations.AddField(
+            model_name='paymentdailytotal',
+            name='bucket',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='paymentdailytotal',
+            constraint=models.UniqueConstraint(fields=('day', 'type', 'status', 'bucket'), name='payment_daily_total_unique'),
+        ),
+    ]
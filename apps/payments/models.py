@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 
 from apps.borrowings.models import Borrowing
@@ -7,6 +8,8 @@ class Payment(models.Model):
     class StatusChoices(models.TextChoices):
         PENDING = "PENDING", "Pending"
         PAID = "PAID", "Paid"
+        # Checkout abandoned; the borrowing was cancelled and restocked.
+        EXPIRED = "EXPIRED", "Expired"
 
     class TypeChoices(models.TextChoices):
         PAYMENT = "PAYMENT", "Payment"
@@ -18,22 +21,140 @@ class Payment(models.Model):
         default=StatusChoices.PENDING,
     )
     type = models.CharField(max_length=10, choices=TypeChoices.choices)
+    # Borrowings are partitioned by borrow_date on PostgreSQL, so their id
+    # alone is not a key the database can reference. Deletes still
+    # cascade through the ORM.
     borrowing = models.ForeignKey(
-        Borrowing, on_delete=models.CASCADE, related_name="payments"
+        Borrowing,
+        on_delete=models.CASCADE,
+        related_name="payments",
+        db_constraint=False,
+    )
+    # The borrowing's user, copied so that per-user listings need no join.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="payments",
+        db_index=False,
+    )
+    # Both stay empty until the Stripe session of an asynchronous
+    # checkout has been created by a background task. A cart checkout
+    # shares one session between the payments of all its borrowings.
+    session_url = models.URLField(max_length=500, blank=True)
+    session_id = models.CharField(
+        max_length=255, db_index=True, null=True, blank=True
     )
-    session_url = models.URLField(max_length=500)
-    session_id = models.CharField(max_length=255, unique=True)
     money_to_pay = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         indexes = [
             models.Index(fields=["status"]),
             models.Index(fields=["type"]),
+            # A user's payments, newest first.
+            models.Index(fields=["user", "-id"], name="payment_user_id_idx"),
+            # Unpaid checkouts by age, for the abandoned checkout sweeper.
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(status="PENDING", type="PAYMENT"),
+                name="payment_pending_created_idx",
+            ),
         ]
         ordering = ["-id"]
 
+    def save(self, *args, **kwargs) -> None:
+        if self.user_id is None and self.borrowing_id is not None:
+            self.user_id = self.borrowing.user_id
+        super().save(*args, **kwargs)
+
     def __str__(self) -> str:
         return (
             f"Payment {self.id} ({self.status}) "
-            f"for borrowing {self.borrowing.id} "
+            f"for borrowing {self.borrowing_id} "
         )
+
+
+class StripeEvent(models.Model):
+    """Stripe webhook event already applied, so redeliveries are skipped."""
+
+    id = models.CharField(max_length=255, primary_key=True)
+    type = models.CharField(max_length=255)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"Stripe event {self.id} ({self.type})"
+
+
+class JobCheckpoint(models.Model):
+    """
+    Progress of a batch job, saved after every batch so that a job
+    interrupted by a crash resumes where it stopped.
+    """
+
+    name = models.CharField(max_length=100, primary_key=True)
+    # Last processed id; 0 when no run is in progress.
+    position = models.BigIntegerField(default=0)
+    state = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} at {self.position}"
+
+
+class AccruedFine(models.Model):
+    """
+    Fine accrued so far by an unreturned overdue borrowing, recomputed
+    nightly. The actual fine is charged when the book is returned.
+    """
+
+    borrowing = models.OneToOneField(
+        Borrowing,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="accrued_fine",
+        db_constraint=False,
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="accrued_fines",
+    )
+    days_overdue = models.PositiveIntegerField()
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    accrued_on = models.DateField()
+
+    def __str__(self) -> str:
+        return f"Accrued fine {self.amount} for borrowing {self.borrowing_id}"
+
+
+class PaymentDailyTotal(models.Model):
+    """
+    Number and sum of payments per creation day, type and status, kept up
+    to date as payments are created and change status and rebuilt nightly.
+
+    Each total is split over `PAYMENT_TOTALS_BUCKETS` rows, summed on
+    read, so that concurrent writers rarely wait for the same row. A
+    bucket alone may go negative, e.g. when a payment counted in one is
+    moved to another status in another.
+    """
+
+    day = models.DateField()
+    type = models.CharField(max_length=10, choices=Payment.TypeChoices.choices)
+    status = models.CharField(
+        max_length=10, choices=Payment.StatusChoices.choices
+    )
+    bucket = models.PositiveSmallIntegerField(default=0)
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "type", "status", "bucket"],
+                name="payment_daily_total_unique",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.day} {self.type} {self.status}: {self.amount}"
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import JobCheckpoint, Payment
+from .services import is_session_paid
+from .stripe_client import get_stripe_gateway
+from .totals import record_status_change
+
+JOB_NAME = "reconcile_pending_payments"
+# Checkout sessions expire 24 hours after creation, so a session paid
+# since the last run was created at most this long before it.
+SESSION_LIFETIME = timedelta(hours=24)
+
+
+def paid_session_ids(created_since: datetime) -> set[str]:
+    """Return the ids of paid checkout sessions created since a time."""
+    sessions = get_stripe_gateway().iter_checkout_sessions(
+        status="complete", created={"gte": int(created_since.timestamp())}
+    )
+    return {session.id for session in sessions if is_session_paid(session)}
+
+
+def reconcile_pending_payments(batch_size: int | None = None) -> int:
+    """
+    Mark PENDING payments paid when Stripe says their session was paid.
+
+    Paid sessions are fetched with one paginated listing covering every
+    session that can have been paid since the previous run, rather than
+    one lookup per payment. Pending payments are then walked in id order
+    and updated with one `bulk_update` per batch. The last processed id
+    is checkpointed after each batch, so an interrupted run resumes from
+    there. Returns the number of payments marked paid.
+    """
+    batch_size = batch_size or settings.PAYMENT_RECONCILE_BATCH_SIZE
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=JOB_NAME)
+    now = timezone.now()
+
+    if "run_started" not in checkpoint.state:
+        checkpoint.position = 0
+        checkpoint.state["run_started"] = now.isoformat()
+        checkpoint.save()
+    run_started = datetime.fromisoformat(checkpoint.state["run_started"])
+    if "last_run_started" in checkpoint.state:
+        since = datetime.fromisoformat(checkpoint.state["last_run_started"])
+    else:
+        since = run_started - timedelta(
+            days=settings.PAYMENT_RECONCILE_LOOKBACK_DAYS
+        )
+
+    paid = paid_session_ids(since - SESSION_LIFETIME)
+    reconciled = 0
+    while True:
+        with transaction.atomic():
+            # Payments locked by a webhook or the expiry sweep are being
+            # settled already.
+            payments = list(
+                Payment.objects.select_for_update(skip_locked=True)
+                .filter(
+                    status=Payment.StatusChoices.PENDING,
+                    session_id__isnull=False,
+                    id__gt=checkpoint.position,
+                )
+                .order_by("id")[:batch_size]
+            )
+            if not payments:
+                break
+
+            changed = [
+                payment for payment in payments if payment.session_id in paid
+            ]
+            record_status_change(changed, Payment.StatusChoices.PAID)
+            for payment in changed:
+                payment.status = Payment.StatusChoices.PAID
+                payment.updated_at = now
+            Payment.objects.bulk_update(changed, ["status", "updated_at"])
+            reconciled += len(changed)
+
+            checkpoint.position = payments[-1].id
+            checkpoint.save(update_fields=["position", "updated_at"])
+
+    checkpoint.position = 0
+    checkpoint.state = {"last_run_started": run_started.isoformat()}
+    checkpoint.save()
+    return reconciled
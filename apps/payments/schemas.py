@@ -1,9 +1,16 @@
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
+    OpenApiParameter,
     OpenApiResponse,
 )
-from .serializers import PaymentListSerializer, PaymentDetailSerializer
+from .serializers import (
+    AccruedFineTotalSerializer,
+    PaymentSummaryQuerySerializer,
+    PaymentSummarySerializer,
+    PaymentListSerializer,
+    PaymentDetailSerializer,
+)
 
 payment_schema = extend_schema_view(
     list=extend_schema(
@@ -12,16 +19,113 @@ payment_schema = extend_schema_view(
     retrieve=extend_schema(
         summary="Retrieve a payment", responses=PaymentDetailSerializer
     ),
+    export=extend_schema(
+        summary="Export payments (staff only)",
+        description=(
+            "Streams every matching payment as CSV or NDJSON in one "
+            "response, with constant memory use on the server."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="output",
+                required=False,
+                enum=["csv", "ndjson"],
+                description="Export format, CSV by default.",
+            ),
+            OpenApiParameter(
+                name="user_id",
+                required=False,
+                type=int,
+                description="Only payments of this user.",
+            ),
+            OpenApiParameter(
+                name="is_active",
+                required=False,
+                type=bool,
+                description="Only active or only completed borrowings.",
+            ),
+        ],
+        responses={
+            200: OpenApiResponse(description="A CSV or NDJSON attachment.")
+        },
+    ),
+    stripe_worker_stats=extend_schema(
+        summary="Stripe client metrics of one worker (staff only)",
+        description=(
+            "Circuit breaker state and per-operation call, error, retry "
+            "and latency counters of the Stripe client in the worker "
+            "process that serves the request. Every worker keeps its own "
+            "counters, so under a multi-worker server consecutive calls "
+            "may answer from different processes; `worker` names the one "
+            "that did."
+        ),
+        responses={
+            200: OpenApiResponse(description="Stripe client stats.")
+        },
+    ),
+    summary=extend_schema(
+        summary="Payment totals (staff only)",
+        description=(
+            "Paid and pending totals per payment type (`PAYMENT`/`FINE`), "
+            "overall and per day or month of payment creation. Expired "
+            "checkouts are left out. Results are cached until the next "
+            "payment is created or changes status."
+        ),
+        parameters=[PaymentSummaryQuerySerializer],
+        responses=PaymentSummarySerializer,
+    ),
+    accrued_fines=extend_schema(
+        summary="Accrued fines per user",
+        description=(
+            "Fines accrued so far by borrowings that are overdue and not "
+            "yet returned, totalled per user and refreshed nightly. "
+            "Non-staff users only see their own total."
+        ),
+        responses=AccruedFineTotalSerializer(many=True),
+    ),
     success=extend_schema(
         summary="Handle successful payment",
+        description=(
+            "Stripe redirects here after checkout. Payments are marked "
+            "paid by the Stripe webhook, which may arrive after the "
+            "redirect; until then the payment is reported as being "
+            "confirmed."
+        ),
         responses={
-            200: OpenApiResponse(description="Payment marked as PAID."),
+            200: OpenApiResponse(description="Payment is PAID."),
+            202: OpenApiResponse(
+                description="Payment not confirmed by Stripe yet."
+            ),
             400: OpenApiResponse(
-                description="Missing session_id or payment not successful."
+                description="Missing session_id or expired session."
             ),
             404: OpenApiResponse(description="Payment record not found."),
         },
     ),
+    webhook=extend_schema(
+        summary="Stripe webhook",
+        description=(
+            "Receives Stripe events signed with `STRIPE_WEBHOOK_SECRET`. "
+            "`checkout.session.completed` and "
+            "`checkout.session.async_payment_succeeded` mark the payments "
+            "of a paid session as PAID. Each event is applied once."
+        ),
+        request=None,
+        parameters=[
+            OpenApiParameter(
+                name="Stripe-Signature",
+                location=OpenApiParameter.HEADER,
+                required=True,
+            )
+        ],
+        responses={
+            200: OpenApiResponse(description="Event received."),
+            400: OpenApiResponse(description="Invalid payload or signature."),
+            503: OpenApiResponse(
+                description="STRIPE_WEBHOOK_SECRET is not configured."
+            ),
+        },
+    ),
     cancel=extend_schema(
         summary="Handle cancelled payment",
         responses={
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from .models import Payment
+from .summary import PERIODS
 
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -25,3 +26,45 @@ class PaymentDetailSerializer(PaymentSerializer):
             "session_url",
             "session_id",
         )
+
+
+class AccruedFineTotalSerializer(serializers.Serializer):
+    user_id = serializers.IntegerField()
+    user_email = serializers.EmailField()
+    borrowings = serializers.IntegerField()
+    total = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class PaymentSummaryQuerySerializer(serializers.Serializer):
+    period = serializers.ChoiceField(choices=PERIODS, default="month")
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs: dict) -> dict:
+        date_from = attrs.get("date_from")
+        date_to = attrs.get("date_to")
+        if date_from and date_to and date_from > date_to:
+            raise serializers.ValidationError(
+                {"date_to": "Must not be before date_from."}
+            )
+        return attrs
+
+
+class PaymentTotalsSerializer(serializers.Serializer):
+    paid = serializers.DecimalField(max_digits=14, decimal_places=2)
+    pending = serializers.DecimalField(max_digits=14, decimal_places=2)
+    paid_count = serializers.IntegerField()
+    pending_count = serializers.IntegerField()
+
+
+class PaymentSummaryRowSerializer(PaymentTotalsSerializer):
+    period = serializers.DateField()
+    type = serializers.ChoiceField(choices=Payment.TypeChoices.choices)
+
+
+class PaymentSummarySerializer(serializers.Serializer):
+    period = serializers.ChoiceField(choices=PERIODS)
+    date_from = serializers.DateField(allow_null=True)
+    date_to = serializers.DateField(allow_null=True)
+    totals = serializers.DictField(child=PaymentTotalsSerializer())
+    series = PaymentSummaryRowSerializer(many=True)
@@ -1,28 +1,64 @@
 import datetime
+import logging
 from decimal import Decimal
 import stripe
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
 from django.urls import reverse
-from rest_framework.exceptions import ValidationError
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
 from rest_framework.request import Request
 from stripe.billing_portal import Session
 
 from apps.books.models import Book
 from apps.borrowings.models import Borrowing
+from .models import Payment, StripeEvent
+from .stripe_client import get_stripe_gateway
+from .totals import record_status_change
 
+# Events after which a checkout session may be paid. A completed session
+# paid with a delayed method is only paid once the second one arrives.
+PAID_SESSION_EVENTS = (
+    "checkout.session.completed",
+    "checkout.session.async_payment_succeeded",
+)
 
-def _create_stripe_session(
-    request: Request,
-    product_name: str,
-    money_to_pay: Decimal,
-) -> stripe.checkout.Session:
+logger = logging.getLogger(__name__)
+
+
+class PaymentProviderUnavailable(APIException):
+    """Stripe could not be reached or its circuit breaker is open."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The payment provider is unavailable. Retry later."
+    default_code = "payment_provider_unavailable"
+
+
+def build_checkout_urls(request: Request) -> tuple[str, str]:
+    """Return the absolute Stripe success and cancel redirect URLs."""
     success_url = (
         request.build_absolute_uri(reverse("payments:payment-success"))
         + "?session_id={CHECKOUT_SESSION_ID}"
     )
     cancel_url = request.build_absolute_uri(reverse("payments:payment-cancel"))
+    return success_url, cancel_url
+
+
+def create_checkout_session(
+    success_url: str,
+    cancel_url: str,
+    line_items: list[tuple[str, Decimal]],
+    idempotency_key: str | None = None,
+) -> stripe.checkout.Session:
+    """
+    Create a Stripe Checkout session for `(product_name, amount)` items.
 
-    return stripe.checkout.Session.create(
+    Pass an `idempotency_key` when the call may be retried, so that Stripe
+    returns the original session instead of creating a second one.
+    """
+    return get_stripe_gateway().create_checkout_session(
         line_items=[
             {
                 "price_data": {
@@ -32,13 +68,34 @@ def _create_stripe_session(
                 },
                 "quantity": 1,
             }
+            for product_name, money_to_pay in line_items
         ],
         mode="payment",
         success_url=success_url,
         cancel_url=cancel_url,
+        idempotency_key=idempotency_key,
     )
 
 
+def _create_stripe_session(
+    request: Request,
+    product_name: str,
+    money_to_pay: Decimal,
+) -> stripe.checkout.Session:
+    return create_checkout_session(
+        *build_checkout_urls(request), [(product_name, money_to_pay)]
+    )
+
+
+def calculate_rental_fee(
+    book: Book,
+    expected_return_date: datetime.date,
+    borrow_date: datetime.date,
+) -> Decimal:
+    days_rented = (expected_return_date - borrow_date).days
+    return round(book.daily_fee * days_rented, 2)
+
+
 def create_payment_session(
     book: Book,
     request: Request,
@@ -48,8 +105,9 @@ def create_payment_session(
     """
     Create a Stripe session for a regular borrowing payment.
     """
-    days_rented = (expected_return_date - borrow_date).days
-    money_to_pay = round(book.daily_fee * days_rented, 2)
+    money_to_pay = calculate_rental_fee(
+        book, expected_return_date, borrow_date
+    )
     product_name = book.title
 
     session = _create_stripe_session(request, product_name, money_to_pay)
@@ -57,37 +115,138 @@ def create_payment_session(
     return session, money_to_pay
 
 
-def create_fine_session(
-    borrowing: Borrowing,
+def create_cart_session(
     request: Request,
-) -> tuple[stripe.checkout.Session, Decimal]:
+    items: list[tuple[Book, datetime.date]],
+    borrow_date: datetime.date,
+) -> tuple[stripe.checkout.Session, list[Decimal]]:
     """
-    Create a Stripe session for an overdue fine payment.
+    Create one Stripe session covering several borrowings.
+
+    `items` holds `(book, expected_return_date)` pairs; the rental fee of
+    each becomes its own line item and is returned in the same order.
     """
+    amounts = [
+        calculate_rental_fee(book, expected_return_date, borrow_date)
+        for book, expected_return_date in items
+    ]
+    session = create_checkout_session(
+        *build_checkout_urls(request),
+        [(book.title, amount) for (book, _), amount in zip(items, amounts)],
+    )
+
+    return session, amounts
+
+
+def calculate_fine(borrowing: Borrowing) -> Decimal:
+    """Return the overdue fine of a returned borrowing."""
     days_overdue = (
         borrowing.actual_return_date - borrowing.expected_return_date
     ).days
-    fine_amount = round(
+    return round(
         borrowing.book.daily_fee * days_overdue * settings.FINE_MULTIPLIER, 2
     )
-    product_name = f"Fine for overdue: {borrowing.book.title}"
 
-    session = _create_stripe_session(request, product_name, fine_amount)
 
-    return session, fine_amount
+def fine_product_name(book: Book) -> str:
+    return f"Fine for overdue: {book.title}"
+
+
+def create_fine_session(
+    borrowing: Borrowing,
+    request: Request,
+) -> tuple[stripe.checkout.Session, Decimal]:
+    """
+    Create a Stripe session for an overdue fine payment.
+    """
+    fine_amount = calculate_fine(borrowing)
+    product_name = fine_product_name(borrowing.book)
 
+    session = _create_stripe_session(request, product_name, fine_amount)
 
-def get_session(session_id: str) -> Session:
-    """Retrieve a Stripe Checkout session."""
-    try:
-        session = stripe.checkout.Session.retrieve(session_id)
-        return session
-    except stripe.error.InvalidRequestError as e:
-        raise ValidationError(f"Invalid Stripe session ID: {e}")
-    except Exception as e:
-        raise ValidationError(f"Stripe error: {e}")
+    return session, fine_amount
 
 
 def is_session_paid(session: Session) -> bool:
     """Return True if the session is fully paid."""
     return session.payment_status == "paid"
+
+
+def construct_webhook_event(payload: bytes, signature: str) -> stripe.Event:
+    """
+    Verify the signature of a Stripe webhook payload and parse its event.
+
+    Raises ValueError for a malformed payload and
+    stripe.SignatureVerificationError for a bad or stale signature.
+    """
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        raise ImproperlyConfigured("STRIPE_WEBHOOK_SECRET is not set.")
+    return stripe.Webhook.construct_event(
+        payload, signature, settings.STRIPE_WEBHOOK_SECRET
+    )
+
+
+def mark_sessions_paid(session_ids: list[str]) -> int:
+    """
+    Mark the pending payments of the given checkout sessions as paid.
+
+    Payments already expired keep their status, since their borrowings
+    were cancelled and the books restocked; a payment that still went
+    through is logged for a refund.
+    """
+    with transaction.atomic():
+        payments = list(
+            Payment.objects.select_for_update()
+            .filter(
+                session_id__in=session_ids,
+                status__in=[
+                    Payment.StatusChoices.PENDING,
+                    Payment.StatusChoices.EXPIRED,
+                ],
+            )
+            .only("created_at", "type", "status", "money_to_pay")
+        )
+        expired = [
+            payment.pk
+            for payment in payments
+            if payment.status == Payment.StatusChoices.EXPIRED
+        ]
+        if expired:
+            logger.error(
+                "Expired payments %s were paid and need a refund.", expired
+            )
+        payments = [
+            payment
+            for payment in payments
+            if payment.status == Payment.StatusChoices.PENDING
+        ]
+        if payments:
+            record_status_change(payments, Payment.StatusChoices.PAID)
+            Payment.objects.filter(
+                pk__in=[payment.pk for payment in payments]
+            ).update(
+                status=Payment.StatusChoices.PAID, updated_at=timezone.now()
+            )
+    return len(payments)
+
+
+@transaction.atomic
+def handle_webhook_event(event: stripe.Event) -> bool:
+    """
+    Apply a verified webhook event once.
+
+    The event id is logged in the same transaction as its effects, so a
+    redelivered event is skipped and a failed one can be retried by
+    Stripe. Returns False when the event was already applied.
+    """
+    _, created = StripeEvent.objects.get_or_create(
+        id=event.id, defaults={"type": event.type}
+    )
+    if not created:
+        return False
+
+    if event.type in PAID_SESSION_EVENTS:
+        session = event.data.object
+        if is_session_paid(session):
+            mark_sessions_paid([session.id])
+    return True
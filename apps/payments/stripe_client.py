@@ -0,0 +1,303 @@
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from functools import cached_property, lru_cache
+from typing import Any, Callable, Iterator
+
+import requests
+import stripe
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class StripeUnavailable(stripe.APIConnectionError):
+    """Raised without calling Stripe while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Fail fast after repeated Stripe outages.
+
+    The circuit opens after `failure_threshold` consecutive connection
+    errors or 5xx responses. While open, calls are rejected without
+    touching the network; after `reset_timeout` seconds a single probe
+    call is let through and its outcome closes or reopens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+                self.probing = False
+
+
+class StripeMetrics:
+    """In-process call, error, retry and latency counters per operation."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._operations = defaultdict(
+            lambda: {
+                "calls": 0,
+                "errors": 0,
+                "retries": 0,
+                "rejected": 0,
+                "latency_ms_total": 0.0,
+                "latency_ms_max": 0.0,
+            }
+        )
+
+    def observe(self, operation: str, seconds: float, error: bool) -> None:
+        milliseconds = seconds * 1000
+        with self._lock:
+            counters = self._operations[operation]
+            counters["calls"] += 1
+            counters["errors"] += error
+            counters["latency_ms_total"] += milliseconds
+            counters["latency_ms_max"] = max(
+                counters["latency_ms_max"], milliseconds
+            )
+
+    def count(self, operation: str, name: str) -> None:
+        with self._lock:
+            self._operations[operation][name] += 1
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {
+                operation: {
+                    **counters,
+                    "latency_ms_avg": (
+                        counters["latency_ms_total"] / counters["calls"]
+                        if counters["calls"]
+                        else None
+                    ),
+                }
+                for operation, counters in self._operations.items()
+            }
+
+
+def _is_outage(error: stripe.StripeError) -> bool:
+    """Return True for errors that say Stripe itself is unhealthy."""
+    return isinstance(error, stripe.APIConnectionError) or (
+        error.http_status is not None and error.http_status >= 500
+    )
+
+
+def _is_retryable(error: stripe.StripeError) -> bool:
+    return _is_outage(error) or isinstance(error, stripe.RateLimitError)
+
+
+class StripeGateway:
+    """
+    Stripe client with pooled connections, timeouts, retries and a
+    circuit breaker.
+
+    Requests go through one `requests.Session`, so keep-alive connections
+    are reused. Connection errors, 5xx and 429 responses are retried with
+    full-jitter exponential backoff. Every POST carries an idempotency
+    key, so retrying a create is safe. Calls are timed into `metrics`.
+    The underlying client is built on first use.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None,
+        *,
+        api_base: str | None = None,
+        timeout: tuple[float, float] = (3.05, 10),
+        max_retries: int = 2,
+        backoff: float = 0.25,
+        max_backoff: float = 2.0,
+        pool_size: int = 10,
+        breaker: CircuitBreaker | None = None,
+        metrics: StripeMetrics | None = None,
+    ) -> None:
+        self.api_key = api_key
+        self.api_base = api_base
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker(5, 30)
+        self.metrics = metrics or StripeMetrics()
+
+    @cached_property
+    def client(self) -> stripe.StripeClient:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        return stripe.StripeClient(
+            self.api_key,
+            base_addresses={"api": self.api_base} if self.api_base else None,
+            http_client=stripe.RequestsClient(
+                timeout=self.timeout, session=session
+            ),
+            # Retries are ours, so that they are counted and breaker-aware.
+            max_network_retries=0,
+        )
+
+    def _sleep_before_retry(self, attempt: int) -> None:
+        time.sleep(
+            random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+        )
+
+    def call(self, operation: str, func: Callable, *args, **kwargs) -> Any:
+        """Run an idempotent Stripe call with retries and the breaker."""
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self.metrics.count(operation, "rejected")
+                raise StripeUnavailable(
+                    f"Stripe is unavailable, {operation} was not attempted."
+                )
+
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except stripe.StripeError as e:
+                elapsed = time.perf_counter() - start
+                self.metrics.observe(operation, elapsed, error=True)
+                if _is_outage(e):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                logger.warning(
+                    "Stripe %s failed after %.0f ms (attempt %d): %s",
+                    operation,
+                    elapsed * 1000,
+                    attempt + 1,
+                    e,
+                )
+                if attempt < self.max_retries and _is_retryable(e):
+                    self.metrics.count(operation, "retries")
+                    self._sleep_before_retry(attempt)
+                    continue
+                raise
+
+            elapsed = time.perf_counter() - start
+            self.metrics.observe(operation, elapsed, error=False)
+            self.breaker.record_success()
+            logger.debug("Stripe %s took %.0f ms", operation, elapsed * 1000)
+            return result
+
+    def create_checkout_session(
+        self, idempotency_key: str | None = None, **params
+    ) -> stripe.checkout.Session:
+        return self.call(
+            "checkout.sessions.create",
+            self.client.checkout.sessions.create,
+            params,
+            {"idempotency_key": idempotency_key or str(uuid.uuid4())},
+        )
+
+    def retrieve_checkout_session(
+        self, session_id: str
+    ) -> stripe.checkout.Session:
+        return self.call(
+            "checkout.sessions.retrieve",
+            self.client.checkout.sessions.retrieve,
+            session_id,
+        )
+
+    def expire_checkout_session(
+        self, session_id: str
+    ) -> stripe.checkout.Session:
+        return self.call(
+            "checkout.sessions.expire",
+            self.client.checkout.sessions.expire,
+            session_id,
+            None,
+            {"idempotency_key": f"expire-{session_id}"},
+        )
+
+    def iter_checkout_sessions(
+        self, page_size: int = 100, **params
+    ) -> Iterator[stripe.checkout.Session]:
+        """Yield the sessions matching `params`, one page per request."""
+        params = {**params, "limit": page_size}
+        while True:
+            page = self.call(
+                "checkout.sessions.list",
+                self.client.checkout.sessions.list,
+                params,
+            )
+            yield from page.data
+            if not page.has_more or not page.data:
+                return
+            params["starting_after"] = page.data[-1].id
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "circuit": self.breaker.state,
+            "operations": self.metrics.snapshot(),
+        }
+
+
+@lru_cache(maxsize=None)
+def get_stripe_gateway() -> StripeGateway:
+    """Return the process-wide Stripe gateway built from settings."""
+    return StripeGateway(
+        settings.STRIPE_SECRET_KEY,
+        api_base=settings.STRIPE_API_BASE,
+        timeout=(
+            settings.STRIPE_CONNECT_TIMEOUT,
+            settings.STRIPE_READ_TIMEOUT,
+        ),
+        max_retries=settings.STRIPE_MAX_RETRIES,
+        pool_size=settings.STRIPE_POOL_SIZE,
+        breaker=CircuitBreaker(
+            settings.STRIPE_CIRCUIT_FAILURE_THRESHOLD,
+            settings.STRIPE_CIRCUIT_RESET_TIMEOUT,
+        ),
+    )
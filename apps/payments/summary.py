@@ -0,0 +1,68 @@
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import DateField, Q, Sum
+from django.db.models.functions import Trunc
+
+from .models import Payment, PaymentDailyTotal
+
+PERIODS = ("day", "month")
+PAID = Q(status=Payment.StatusChoices.PAID)
+PENDING = Q(status=Payment.StatusChoices.PENDING)
+
+
+def _empty_totals() -> dict:
+    return {
+        "paid": Decimal(0),
+        "pending": Decimal(0),
+        "paid_count": 0,
+        "pending_count": 0,
+    }
+
+
+def payment_summary(
+    period: str = "month",
+    date_from: date | None = None,
+    date_to: date | None = None,
+) -> dict:
+    """
+    Total paid and pending payments per type and per day or month.
+
+    Payments count towards the period they were created in; the date
+    range is inclusive. Expired checkouts are left out. Reads the daily
+    totals rollup, at most a few rows per day, rather than the payments.
+    """
+    queryset = PaymentDailyTotal.objects.filter(PAID | PENDING)
+    if date_from is not None:
+        queryset = queryset.filter(day__gte=date_from)
+    if date_to is not None:
+        queryset = queryset.filter(day__lte=date_to)
+
+    series = list(
+        queryset.annotate(
+            period=Trunc("day", period, output_field=DateField())
+        )
+        .values("period", "type")
+        .annotate(
+            paid=Sum("amount", filter=PAID, default=0),
+            pending=Sum("amount", filter=PENDING, default=0),
+            paid_count=Sum("count", filter=PAID, default=0),
+            pending_count=Sum("count", filter=PENDING, default=0),
+        )
+        # Buckets are summed first; a single one may be empty or negative.
+        .filter(Q(paid_count__gt=0) | Q(pending_count__gt=0))
+        .order_by("period", "type")
+    )
+
+    totals = {type_: _empty_totals() for type_ in Payment.TypeChoices.values}
+    for row in series:
+        for name, value in totals[row["type"]].items():
+            totals[row["type"]][name] = value + row[name]
+
+    return {
+        "period": period,
+        "date_from": date_from,
+        "date_to": date_to,
+        "totals": totals,
+        "series": series,
+    }
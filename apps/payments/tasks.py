@@ -0,0 +1,62 @@
+from django.utils import timezone
+
+from .expiry import expire_abandoned_checkouts
+from .fines import accrue_fines
+from .models import Payment
+from .reconciliation import reconcile_pending_payments
+from .services import create_checkout_session
+from .totals import rebuild_totals
+
+
+def prepare_checkout_session(
+    payment_id: int,
+    product_name: str,
+    success_url: str,
+    cancel_url: str,
+) -> None:
+    """
+    Create the Stripe session of a pending payment in the background.
+
+    Safe to retry: the Stripe call is idempotent per payment and a payment
+    that already has a session, or that is no longer pending (e.g. expired
+    with its borrowing cancelled), is left untouched.
+    """
+    payment = Payment.objects.get(pk=payment_id)
+    if payment.session_id or payment.status != Payment.StatusChoices.PENDING:
+        return
+
+    session = create_checkout_session(
+        success_url,
+        cancel_url,
+        [(product_name, payment.money_to_pay)],
+        idempotency_key=f"payment-{payment_id}",
+    )
+    Payment.objects.filter(
+        pk=payment_id,
+        session_id__isnull=True,
+        status=Payment.StatusChoices.PENDING,
+    ).update(
+        session_id=session.id,
+        session_url=session.url,
+        updated_at=timezone.now(),
+    )
+
+
+def accrue_overdue_fines() -> None:
+    """Nightly refresh of the fines accrued by overdue borrowings."""
+    accrue_fines()
+
+
+def reconcile_payments() -> None:
+    """Catch up on paid sessions whose webhook never arrived."""
+    reconcile_pending_payments()
+
+
+def expire_checkouts() -> None:
+    """Release the copies held by abandoned checkouts."""
+    expire_abandoned_checkouts()
+
+
+def rebuild_payment_totals() -> None:
+    """Nightly rebuild of the daily payment totals."""
+    rebuild_totals()
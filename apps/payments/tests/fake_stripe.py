@@ -0,0 +1,30 @@
+from apps.payments.stripe_client import CircuitBreaker, StripeGateway
+from library_service.fake_apis import FakeApiServer, stripe_error
+
+SESSION = {
+    "id": "cs_test_1",
+    "object": "checkout.session",
+    "url": "https://checkout.stripe.com/cs_test_1",
+}
+
+
+def server_error(status: int = 503, delay: float = 0) -> tuple:
+    return (status, stripe_error("api_error", "Unavailable"), delay)
+
+
+class FakeStripeMixin:
+    """Run a `FakeApiServer` for the duration of each test."""
+
+    def setUp(self):
+        super().setUp()
+        self.server = FakeApiServer()
+        self.server.start(poll_interval=0.01)
+        self.addCleanup(self.server.stop)
+
+    def gateway(self, **kwargs) -> StripeGateway:
+        options = {
+            "api_base": self.server.url,
+            "backoff": 0,
+            "breaker": CircuitBreaker(5, 30),
+        }
+        return StripeGateway("sk_test_fake", **(options | kwargs))
@@ -1,7 +1,11 @@
 import datetime
+import json
+from unittest import skipUnless
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
@@ -13,6 +17,9 @@ from apps.payments.models import Payment
 from apps.payments.serializers import PaymentDetailSerializer
 
 PAYMENT_URL = reverse("payments:payment-list")
+SUCCESS_URL = reverse("payments:payment-success")
+EXPORT_URL = reverse("payments:payment-export")
+STRIPE_WORKER_STATS_URL = reverse("payments:payment-stripe-worker-stats")
 
 
 def detail_url(payment_id: int):
@@ -86,6 +93,63 @@ class AuthenticatedPaymentApiTests(TestCase):
         self.assertEqual(len(res.data["results"]), 1)
         self.assertEqual(res.data["results"][0]["id"], self.payment.id)
 
+    def test_payment_user_copied_from_borrowing(self):
+        """Test a new payment stores the user of its borrowing"""
+        self.assertEqual(self.payment.user_id, self.user.id)
+
+    @skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL")
+    def test_insert_without_user_fills_it(self):
+        """Test an insert of the previous release gets the user filled"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO payments_payment (status, type, money_to_pay, "
+                "borrowing_id, session_url, created_at, updated_at) "
+                "VALUES ('PENDING', 'PAYMENT', 1, %s, '', now(), now()) "
+                "RETURNING user_id",
+                [self.payment.borrowing_id],
+            )
+            self.assertEqual(cursor.fetchone()[0], self.user.id)
+
+    @patch("stripe.checkout.Session.retrieve")
+    def test_success_reports_paid_cart_session(self, mock_retrieve):
+        """Test success lists every borrowing of a paid cart session"""
+        borrowing = Borrowing.objects.create(
+            user=self.user,
+            book=self.payment.borrowing.book,
+            expected_return_date=(
+                timezone.now().date() + datetime.timedelta(days=1)
+            ),
+        )
+        Payment.objects.create(
+            type="PAYMENT",
+            borrowing=borrowing,
+            session_url="http://example.com",
+            session_id=self.payment.session_id,
+            money_to_pay=5.00,
+        )
+        params = {"session_id": self.payment.session_id}
+
+        res_pending = self.client.get(SUCCESS_URL, params)
+        Payment.objects.update(status=Payment.StatusChoices.PAID)
+        res = self.client.get(SUCCESS_URL, params)
+
+        self.assertEqual(res_pending.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(str(self.payment.borrowing_id), res.data["message"])
+        self.assertIn(str(borrowing.id), res.data["message"])
+        mock_retrieve.assert_not_called()
+
+    def test_success_reports_expired_session(self):
+        """Test success rejects a session the sweeper expired"""
+        self.payment.status = Payment.StatusChoices.EXPIRED
+        self.payment.save()
+
+        res = self.client.get(
+            SUCCESS_URL, {"session_id": self.payment.session_id}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_retrieve_own_payment_detail(self):
         """Test retrieving detail for own payment is successful"""
         url = detail_url(self.payment.id)
@@ -168,3 +232,45 @@ class AdminPaymentApiTests(TestCase):
         res = self.client.get(PAYMENT_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(len(res.data["results"]), 2)
+
+    def test_list_fast_path_matches_serializer(self):
+        """Test the values() list path renders the serializer's bytes"""
+        for params in ({}, {"pagination": "cursor"}):
+            with override_settings(FAST_LIST_SERIALIZATION=False):
+                expected = self.client.get(PAYMENT_URL, params)
+            res = self.client.get(PAYMENT_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.content, expected.content)
+
+    def test_export_payments_ndjson(self):
+        """Test an admin can stream payments filtered by user as NDJSON"""
+        res = self.client.get(
+            EXPORT_URL, {"output": "ndjson", "user_id": self.user.id}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        rows = [
+            json.loads(line)
+            for line in b"".join(res.streaming_content).splitlines()
+        ]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["id"], self.payment1.id)
+        self.assertEqual(rows[0]["user_id"], self.user.id)
+        self.assertEqual(rows[0]["money_to_pay"], "1.00")
+
+    def test_export_payments_requires_staff(self):
+        """Test regular users cannot export payments"""
+        self.client.force_authenticate(self.user)
+        res = self.client.get(EXPORT_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stripe_worker_stats(self):
+        """Test admins can read the Stripe client metrics"""
+        res = self.client.get(STRIPE_WORKER_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["circuit"], "closed")
+        self.assertIn("operations", res.data)
+        self.assertIn("worker", res.data)
@@ -0,0 +1,232 @@
+import datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+import stripe
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.books.models import Book
+from apps.borrowings.models import Borrowing, UserCirculationStats
+from apps.borrowings.stats import rebuild_stats, record_borrowings
+from apps.borrowings.tests.test_stats import snapshot
+from apps.payments.expiry import expire_abandoned_checkouts
+from apps.payments.models import Payment
+from apps.payments.services import mark_sessions_paid
+from .fake_stripe import FakeStripeMixin, server_error
+
+
+def stripe_session(
+    session_id: str, status: str = "open", payment_status: str = "unpaid"
+) -> dict:
+    return {
+        "id": session_id,
+        "object": "checkout.session",
+        "status": status,
+        "payment_status": payment_status,
+    }
+
+
+@override_settings(PAYMENT_EXPIRY_HOURS=25)
+class ExpireAbandonedCheckoutsTests(FakeStripeMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = patch(
+            "apps.payments.expiry.get_stripe_gateway",
+            return_value=self.gateway(),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password123"
+        )
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee=1.00,
+        )
+
+    def borrow(self, session_id: str | None, hours_ago: int = 30) -> Payment:
+        borrowing = Borrowing.objects.create(
+            user=self.user,
+            book=self.book,
+            expected_return_date=(
+                timezone.now().date() + datetime.timedelta(days=3)
+            ),
+        )
+        Book.objects.filter(pk=self.book.pk).update(inventory=4)
+        payment = Payment.objects.create(
+            type=Payment.TypeChoices.PAYMENT,
+            borrowing=borrowing,
+            session_id=session_id,
+            money_to_pay=Decimal("3.00"),
+        )
+        Payment.objects.filter(pk=payment.pk).update(
+            created_at=timezone.now() - datetime.timedelta(hours=hours_ago)
+        )
+        record_borrowings([borrowing], [payment.money_to_pay])
+        return payment
+
+    def assert_expired(self, payment: Payment) -> None:
+        payment.refresh_from_db()
+        payment.borrowing.refresh_from_db()
+        self.book.refresh_from_db()
+        self.assertEqual(payment.status, Payment.StatusChoices.EXPIRED)
+        self.assertIsNotNone(payment.borrowing.actual_return_date)
+        self.assertTrue(payment.borrowing.cancelled)
+        self.assertEqual(self.book.inventory, 5)
+
+    def test_expires_open_session_and_restocks(self):
+        """Test an abandoned checkout is expired and its copy restocked"""
+        payment = self.borrow("cs_1")
+        self.server.sessions = [stripe_session("cs_1")]
+
+        self.assertEqual(expire_abandoned_checkouts(), 1)
+
+        self.assert_expired(payment)
+        self.assertEqual(self.server.sessions[0]["status"], "expired")
+        self.assertEqual(
+            self.server.requests[0]["path"],
+            "/v1/checkout/sessions/cs_1/expire",
+        )
+
+    def test_session_already_expired_by_stripe(self):
+        """Test a session Stripe already expired cancels the borrowing"""
+        payment = self.borrow("cs_1")
+        self.server.sessions = [stripe_session("cs_1", status="expired")]
+
+        self.assertEqual(expire_abandoned_checkouts(), 1)
+
+        self.assert_expired(payment)
+
+    def test_payment_without_session_is_expired(self):
+        """Test a payment whose session was never created is expired"""
+        payment = self.borrow(None)
+
+        self.assertEqual(expire_abandoned_checkouts(), 1)
+
+        self.assert_expired(payment)
+        self.assertEqual(self.server.requests, [])
+
+    def test_session_paid_at_last_minute_is_marked_paid(self):
+        """Test a session completed before expiry marks the payment paid"""
+        payment = self.borrow("cs_1")
+        self.server.sessions = [
+            stripe_session("cs_1", status="complete", payment_status="paid")
+        ]
+
+        self.assertEqual(expire_abandoned_checkouts(), 0)
+
+        payment.refresh_from_db()
+        payment.borrowing.refresh_from_db()
+        self.assertEqual(payment.status, Payment.StatusChoices.PAID)
+        self.assertIsNone(payment.borrowing.actual_return_date)
+
+    def test_recent_payments_are_left_alone(self):
+        """Test payments younger than the session lifetime are untouched"""
+        payment = self.borrow("cs_1", hours_ago=1)
+
+        self.assertEqual(expire_abandoned_checkouts(), 0)
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.StatusChoices.PENDING)
+        self.assertEqual(self.server.requests, [])
+
+    def test_cart_session_expired_once_in_batches(self):
+        """Test payments sharing a session expire it with one request"""
+        payments = [self.borrow("cs_cart") for _ in range(3)]
+        Book.objects.filter(pk=self.book.pk).update(inventory=2)
+        self.server.sessions = [stripe_session("cs_cart")]
+
+        self.assertEqual(expire_abandoned_checkouts(batch_size=3), 3)
+
+        for payment in payments:
+            self.assert_expired(payment)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_stats_match_rebuild(self):
+        """Test the cancellation rollup changes equal a full rebuild"""
+        self.borrow("cs_1")
+        self.borrow("cs_2")
+        self.server.sessions = [
+            stripe_session("cs_1"),
+            stripe_session("cs_2", status="complete", payment_status="paid"),
+        ]
+
+        expire_abandoned_checkouts()
+
+        incremental = snapshot()
+        rebuild_stats()
+        self.assertEqual(incremental, snapshot())
+
+    def test_cancellation_is_not_counted_as_return(self):
+        """Test a cancelled checkout takes back its borrow and fee only"""
+        self.borrow("cs_1")
+        self.server.sessions = [stripe_session("cs_1")]
+
+        expire_abandoned_checkouts()
+
+        stats = UserCirculationStats.objects.get(pk=self.user.pk)
+        self.assertEqual(stats.borrow_count, 0)
+        self.assertEqual(stats.return_count, 0)
+        self.assertEqual(stats.loan_days, 0)
+        self.assertEqual(stats.revenue, 0)
+
+    def test_late_payment_of_expired_session_is_not_marked_paid(self):
+        """Test paying an expired session leaves it expired for a refund"""
+        payment = self.borrow("cs_1")
+        self.server.sessions = [stripe_session("cs_1")]
+        expire_abandoned_checkouts()
+
+        with self.assertLogs("apps.payments.services", "ERROR"):
+            self.assertEqual(mark_sessions_paid(["cs_1"]), 0)
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.StatusChoices.EXPIRED)
+
+    def test_unknown_session_does_not_block_batch(self):
+        """Test a session Stripe does not know is skipped, not fatal"""
+        missing = self.borrow("cs_gone")
+        payment = self.borrow("cs_2")
+        self.server.sessions = [stripe_session("cs_2")]
+
+        with self.assertLogs("apps.payments.expiry", "WARNING"):
+            self.assertEqual(expire_abandoned_checkouts(), 1)
+
+        self.assert_expired(payment)
+        missing.refresh_from_db()
+        self.assertEqual(missing.status, Payment.StatusChoices.PENDING)
+
+    def test_payment_settled_meanwhile_is_left_alone(self):
+        """Test a payment paid while Stripe was called is not expired"""
+        payment = self.borrow("cs_1")
+        self.server.sessions = [stripe_session("cs_1")]
+
+        def pay(*args) -> str:
+            # The webhook lands while the session is being expired.
+            Payment.objects.filter(pk=payment.pk).update(
+                status=Payment.StatusChoices.PAID
+            )
+            return "expired"
+
+        with patch("apps.payments.expiry._close_session", side_effect=pay):
+            self.assertEqual(expire_abandoned_checkouts(), 0)
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.StatusChoices.PAID)
+
+    def test_stripe_outage_rolls_back_batch(self):
+        """Test a Stripe outage leaves the batch pending for the next run"""
+        payment = self.borrow("cs_1")
+        self.server.sessions = [stripe_session("cs_1")]
+        self.server.responses = [server_error()] * 3
+
+        with self.assertRaises(stripe.StripeError):
+            expire_abandoned_checkouts()
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.StatusChoices.PENDING)
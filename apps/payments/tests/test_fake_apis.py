@@ -0,0 +1,163 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import requests
+import stripe
+from django.test import SimpleTestCase, override_settings
+
+from apps.payments.stripe_client import CircuitBreaker, StripeGateway
+from library_service.fake_apis import FakeApiServer, Faults
+from library_service.telegram.services import send_telegram_message
+
+
+class FakeApiServerTests(SimpleTestCase):
+    def start(self, **faults) -> FakeApiServer:
+        server = FakeApiServer(faults=Faults(**faults), seed=0)
+        server.start(poll_interval=0.01)
+        self.addCleanup(server.stop)
+        return server
+
+    def gateway(self, server: FakeApiServer, **kwargs) -> StripeGateway:
+        options = {
+            "api_base": server.url,
+            "backoff": 0,
+            "breaker": CircuitBreaker(5, 30),
+        }
+        return StripeGateway("sk_test_fake", **(options | kwargs))
+
+    def create(self, gateway: StripeGateway, **kwargs):
+        return gateway.create_checkout_session(
+            mode="payment",
+            success_url="http://s",
+            cancel_url="http://c",
+            **kwargs,
+        )
+
+    def test_checkout_session_lifecycle(self):
+        """Test sessions are created idempotently, retrieved and expired"""
+        server = self.start()
+        gateway = self.gateway(server)
+
+        first = self.create(gateway, idempotency_key="payment-1")
+        replay = self.create(gateway, idempotency_key="payment-1")
+        other = self.create(gateway, idempotency_key="payment-2")
+        gateway.expire_checkout_session(first.id)
+
+        self.assertEqual(replay.id, first.id)
+        self.assertNotEqual(other.id, first.id)
+        self.assertEqual(
+            gateway.retrieve_checkout_session(first.id).status, "expired"
+        )
+        with self.assertRaises(stripe.InvalidRequestError):
+            gateway.expire_checkout_session(first.id)
+
+    def test_paying_session_completes_it(self):
+        """Test opening a session's url pays it once"""
+        server = self.start()
+        gateway = self.gateway(server)
+        session = self.create(gateway)
+
+        first = requests.get(session.url)
+        second = requests.get(session.url)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 400)
+        session = gateway.retrieve_checkout_session(session.id)
+        self.assertEqual(session.status, "complete")
+        self.assertEqual(session.payment_status, "paid")
+
+    def test_paying_session_posts_signed_webhook(self):
+        """Test a paid session is announced by a signed webhook event"""
+        received = []
+
+        class Receiver(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                length = int(self.headers["Content-Length"])
+                received.append(
+                    (self.rfile.read(length), self.headers["Stripe-Signature"])
+                )
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args) -> None:
+                pass
+
+        receiver = ThreadingHTTPServer(("127.0.0.1", 0), Receiver)
+        threading.Thread(target=receiver.serve_forever, daemon=True).start()
+        self.addCleanup(receiver.server_close)
+        self.addCleanup(receiver.shutdown)
+        host, port = receiver.server_address[:2]
+        server = FakeApiServer(
+            webhook_url=f"http://{host}:{port}/webhook/",
+            webhook_secret="whsec_test",
+        )
+        server.start(poll_interval=0.01)
+        self.addCleanup(server.stop)
+        session = self.create(self.gateway(server))
+
+        requests.get(session.url)
+        deadline = time.monotonic() + 5
+        while not server.deliveries and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(server.deliveries[0]["status"], 200)
+        payload, signature = received[0]
+        event = stripe.Webhook.construct_event(
+            payload, signature, "whsec_test"
+        )
+        self.assertEqual(event.type, "checkout.session.completed")
+        self.assertEqual(event.data.object.id, session.id)
+        self.assertEqual(event.data.object.payment_status, "paid")
+
+    def test_list_sessions_after_unknown_session(self):
+        """Test an unknown list cursor is rejected like on Stripe"""
+        server = self.start()
+        gateway = self.gateway(server)
+        self.create(gateway)
+
+        with self.assertRaises(stripe.InvalidRequestError):
+            list(gateway.iter_checkout_sessions(starting_after="cs_gone"))
+
+    def test_injected_errors_are_retried(self):
+        """Test injected 5xx errors reach the client as Stripe outages"""
+        server = self.start(error_rate=1)
+        gateway = self.gateway(server, max_retries=2)
+
+        with self.assertRaises(stripe.APIError):
+            self.create(gateway)
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(server.stats()["responses"], {"503": 3})
+
+    def test_rate_limit(self):
+        """Test requests beyond the rate limit get 429"""
+        server = self.start(rate_limit=2)
+        url = f"{server.url}/v1/checkout/sessions"
+
+        statuses = [requests.get(url).status_code for _ in range(3)]
+
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_rate_limit_below_one_per_second(self):
+        """Test a fractional rate limit still lets a request through"""
+        server = self.start(rate_limit=0.5)
+        url = f"{server.url}/v1/checkout/sessions"
+
+        statuses = [requests.get(url).status_code for _ in range(2)]
+
+        self.assertEqual(statuses, [200, 429])
+
+    @patch("library_service.telegram.services.TELEGRAM_CHAT_ID", "42")
+    @patch("library_service.telegram.services.TELEGRAM_BOT_TOKEN", "t0ken")
+    def test_telegram_send_message(self):
+        """Test Telegram notifications are delivered to the fake server"""
+        server = self.start()
+
+        with override_settings(TELEGRAM_API_BASE=server.url):
+            send_telegram_message("Hello")
+
+        [message] = server.messages
+        self.assertEqual(message["text"], "Hello")
+        self.assertEqual(server.requests[0]["path"], "/bott0ken/sendMessage")
@@ -0,0 +1,241 @@
+import datetime
+import threading
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.books.models import Book
+from apps.borrowings.models import Borrowing
+from apps.payments.fines import accrue_fines
+from apps.payments.models import AccruedFine
+
+ACCRUED_FINES_URL = reverse("payments:payment-accrued-fines")
+
+
+def return_url(borrowing_id: int):
+    return reverse(
+        "borrowings:borrowing-return-borrowing", args=[borrowing_id]
+    )
+
+
+@override_settings(FINE_MULTIPLIER=2)
+class AccrueFinesTests(TestCase):
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password123"
+        )
+        self.other_user = get_user_model().objects.create_user(
+            email="other@test.com", password="password123"
+        )
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee=Decimal("1.25"),
+        )
+
+    def borrow(self, user, days_overdue: int) -> Borrowing:
+        borrowing = Borrowing.objects.create(
+            user=user,
+            book=self.book,
+            expected_return_date=self.today + datetime.timedelta(days=1),
+        )
+        Borrowing.objects.filter(pk=borrowing.pk).update(
+            borrow_date=self.today - datetime.timedelta(days=30),
+            expected_return_date=(
+                self.today - datetime.timedelta(days=days_overdue)
+            ),
+        )
+        return borrowing
+
+    def test_accrues_overdue_unreturned_borrowings(self):
+        """Test fines are computed per overdue day with the multiplier"""
+        late = self.borrow(self.user, days_overdue=3)
+        later = self.borrow(self.other_user, days_overdue=10)
+        Borrowing.objects.create(
+            user=self.user,
+            book=self.book,
+            expected_return_date=self.today + datetime.timedelta(days=2),
+        )
+        returned = self.borrow(self.user, days_overdue=4)
+        Borrowing.objects.filter(pk=returned.pk).update(
+            actual_return_date=self.today
+        )
+
+        self.assertEqual(accrue_fines(batch_size=1), 2)
+
+        fines = {fine.borrowing_id: fine for fine in AccruedFine.objects.all()}
+        self.assertEqual(set(fines), {late.id, later.id})
+        self.assertEqual(fines[late.id].days_overdue, 3)
+        self.assertEqual(fines[late.id].amount, Decimal("7.50"))
+        self.assertEqual(fines[late.id].user, self.user)
+        self.assertEqual(fines[later.id].amount, Decimal("25.00"))
+        self.assertEqual(fines[later.id].accrued_on, self.today)
+
+    def test_accrual_updates_and_drops_stale_fines(self):
+        """Test a rerun updates fines and drops returned borrowings"""
+        late = self.borrow(self.user, days_overdue=3)
+        returned = self.borrow(self.user, days_overdue=5)
+        accrue_fines()
+        AccruedFine.objects.update(
+            accrued_on=self.today - datetime.timedelta(days=1)
+        )
+        Borrowing.objects.filter(pk=late.pk).update(
+            expected_return_date=self.today - datetime.timedelta(days=4)
+        )
+        Borrowing.objects.filter(pk=returned.pk).update(
+            actual_return_date=self.today
+        )
+
+        self.assertEqual(accrue_fines(), 1)
+
+        fine = AccruedFine.objects.get()
+        self.assertEqual(fine.borrowing_id, late.id)
+        self.assertEqual(fine.days_overdue, 4)
+        self.assertEqual(fine.amount, Decimal("10.00"))
+        self.assertEqual(fine.accrued_on, self.today)
+
+
+class AccruedFinesApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.today = timezone.now().date()
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password123"
+        )
+        self.other_user = get_user_model().objects.create_user(
+            email="other@test.com", password="password123"
+        )
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee=Decimal("1.00"),
+        )
+        self.borrowings = []
+        for user, amount in (
+            (self.user, "2.00"),
+            (self.user, "4.00"),
+            (self.other_user, "10.00"),
+        ):
+            borrowing = Borrowing.objects.create(
+                user=user,
+                book=self.book,
+                expected_return_date=self.today + datetime.timedelta(days=1),
+            )
+            AccruedFine.objects.create(
+                borrowing=borrowing,
+                user=user,
+                days_overdue=1,
+                amount=Decimal(amount),
+                accrued_on=self.today,
+            )
+            self.borrowings.append(borrowing)
+
+    def test_staff_sees_totals_per_user(self):
+        """Test staff get every user's total, largest first"""
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser(
+                email="admin@test.com", password="password123"
+            )
+        )
+
+        res = self.client.get(ACCRUED_FINES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (row["user_email"], row["borrowings"], row["total"])
+                for row in res.data["results"]
+            ],
+            [("other@test.com", 1, "10.00"), ("user@test.com", 2, "6.00")],
+        )
+
+    def test_user_sees_own_total(self):
+        """Test a regular user only gets their own total"""
+        self.client.force_authenticate(self.user)
+
+        res = self.client.get(ACCRUED_FINES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["user_id"], self.user.id)
+        self.assertEqual(res.data["results"][0]["total"], "6.00")
+
+    def test_return_clears_accrued_fine(self):
+        """Test returning a borrowing removes its accrued fine"""
+        self.client.force_authenticate(self.user)
+
+        res = self.client.post(return_url(self.borrowings[0].id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            AccruedFine.objects.filter(borrowing=self.borrowings[0]).exists()
+        )
+        self.assertEqual(AccruedFine.objects.count(), 2)
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "Concurrent writers require Postgres",
+)
+class AccrueFinesConcurrencyTests(TransactionTestCase):
+    def test_borrowing_returned_during_accrual_gets_no_fine(self):
+        """Test a borrowing locked by a return is skipped, not fined"""
+        today = timezone.now().date()
+        user = get_user_model().objects.create_user(
+            email="user@test.com", password="password123"
+        )
+        book = Book.objects.create(
+            title="Test Book",
+            author="Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee=Decimal("1.25"),
+        )
+        borrowing = Borrowing.objects.create(
+            user=user,
+            book=book,
+            expected_return_date=today + datetime.timedelta(days=1),
+        )
+        Borrowing.objects.filter(pk=borrowing.pk).update(
+            borrow_date=today - datetime.timedelta(days=30),
+            expected_return_date=today - datetime.timedelta(days=3),
+        )
+        returning = threading.Event()
+        release = threading.Event()
+
+        def return_borrowing() -> None:
+            try:
+                with transaction.atomic():
+                    Borrowing.objects.filter(pk=borrowing.pk).update(
+                        actual_return_date=today
+                    )
+                    returning.set()
+                    release.wait(5)
+                    AccruedFine.objects.filter(
+                        borrowing_id=borrowing.pk
+                    ).delete()
+            finally:
+                connections.close_all()
+
+        returner = threading.Thread(target=return_borrowing)
+        returner.start()
+        returning.wait(5)
+        try:
+            self.assertEqual(accrue_fines(), 0)
+        finally:
+            release.set()
+            returner.join()
+
+        self.assertFalse(AccruedFine.objects.exists())
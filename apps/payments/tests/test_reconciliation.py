@@ -0,0 +1,128 @@
+import datetime
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.books.models import Book
+from apps.borrowings.models import Borrowing
+from apps.payments.models import JobCheckpoint, Payment
+from apps.payments.reconciliation import JOB_NAME, reconcile_pending_payments
+from .fake_stripe import FakeStripeMixin
+
+
+def stripe_session(session_id: str, payment_status: str = "paid") -> dict:
+    return {
+        "id": session_id,
+        "object": "checkout.session",
+        "status": "complete",
+        "payment_status": payment_status,
+        "created": int(timezone.now().timestamp()),
+    }
+
+
+@override_settings(PAYMENT_RECONCILE_LOOKBACK_DAYS=30)
+class ReconcilePendingPaymentsTests(FakeStripeMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = patch(
+            "apps.payments.reconciliation.get_stripe_gateway",
+            return_value=self.gateway(),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        user = get_user_model().objects.create_user(
+            email="user@test.com", password="password123"
+        )
+        book = Book.objects.create(
+            title="Test Book",
+            author="Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee=1.00,
+        )
+        borrowing = Borrowing.objects.create(
+            user=user,
+            book=book,
+            expected_return_date=(
+                timezone.now().date() + datetime.timedelta(days=3)
+            ),
+        )
+        self.payments = Payment.objects.bulk_create(
+            Payment(
+                type=Payment.TypeChoices.PAYMENT,
+                borrowing=borrowing,
+                user=user,
+                session_id=f"cs_{i}",
+                money_to_pay=3,
+            )
+            for i in range(6)
+        )
+        # Paid: cs_0, cs_2, cs_5; cs_1 awaits a delayed payment and the
+        # rest were never completed. Filler sessions force a second page.
+        self.server.sessions = [
+            stripe_session("cs_0"),
+            stripe_session("cs_1", payment_status="unpaid"),
+            stripe_session("cs_2"),
+            *(stripe_session(f"cs_other_{i}") for i in range(100)),
+            stripe_session("cs_5"),
+        ]
+
+    def paid_ids(self) -> set[str]:
+        return set(
+            Payment.objects.filter(
+                status=Payment.StatusChoices.PAID
+            ).values_list("session_id", flat=True)
+        )
+
+    def test_marks_paid_sessions_in_batches(self):
+        """Test payments of paid sessions are marked paid batch by batch"""
+        reconciled = reconcile_pending_payments(batch_size=2)
+
+        self.assertEqual(reconciled, 3)
+        self.assertEqual(self.paid_ids(), {"cs_0", "cs_2", "cs_5"})
+        # One paginated listing, no per-payment lookups.
+        self.assertEqual(
+            [request["method"] for request in self.server.requests],
+            ["GET", "GET"],
+        )
+        checkpoint = JobCheckpoint.objects.get(name=JOB_NAME)
+        self.assertEqual(checkpoint.position, 0)
+        self.assertIn("last_run_started", checkpoint.state)
+
+    def test_resumes_from_checkpoint(self):
+        """Test an interrupted run skips the payments it already covered"""
+        started = timezone.now() - datetime.timedelta(minutes=5)
+        JobCheckpoint.objects.create(
+            name=JOB_NAME,
+            position=self.payments[2].id,
+            state={"run_started": started.isoformat()},
+        )
+
+        reconciled = reconcile_pending_payments(batch_size=2)
+
+        self.assertEqual(reconciled, 1)
+        self.assertEqual(self.paid_ids(), {"cs_5"})
+        checkpoint = JobCheckpoint.objects.get(name=JOB_NAME)
+        self.assertEqual(
+            checkpoint.state, {"last_run_started": started.isoformat()}
+        )
+
+    def test_next_run_lists_sessions_since_previous_run(self):
+        """Test a later run only lists sessions it may not have seen"""
+        last_run = timezone.now() - datetime.timedelta(hours=1)
+        JobCheckpoint.objects.create(
+            name=JOB_NAME, state={"last_run_started": last_run.isoformat()}
+        )
+
+        reconcile_pending_payments()
+
+        created_since = int(
+            self.server.requests[0]["query"]["created[gte]"][0]
+        )
+        self.assertEqual(
+            created_since,
+            int((last_run - datetime.timedelta(hours=24)).timestamp()),
+        )
@@ -0,0 +1,114 @@
+import time
+
+import stripe
+from django.test import SimpleTestCase
+
+from apps.payments.stripe_client import (
+    CircuitBreaker,
+    StripeGateway,
+    StripeUnavailable,
+)
+from .fake_stripe import SESSION, FakeStripeMixin, server_error
+
+
+class StripeGatewayTests(FakeStripeMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = 0.0
+        self.breaker = CircuitBreaker(2, 30, clock=lambda: self.now)
+
+    def gateway(self, **kwargs) -> StripeGateway:
+        return super().gateway(**({"breaker": self.breaker} | kwargs))
+
+    def create(self, gateway: StripeGateway, **kwargs):
+        return gateway.create_checkout_session(
+            mode="payment",
+            success_url="http://s",
+            cancel_url="http://c",
+            **kwargs,
+        )
+
+    def test_create_checkout_session(self):
+        """Test a session is created with the key and idempotency key"""
+        session = self.create(self.gateway(), idempotency_key="payment-1")
+
+        self.assertEqual(session.id, "cs_test_1")
+        [request] = self.server.requests
+        self.assertEqual(request["path"], "/v1/checkout/sessions")
+        self.assertEqual(request["idempotency_key"], "payment-1")
+        self.assertEqual(request["authorization"], "Bearer sk_test_fake")
+
+    def test_connections_are_reused(self):
+        """Test consecutive calls go over one keep-alive connection"""
+        gateway = self.gateway()
+        self.create(gateway)
+        self.create(gateway)
+
+        ports = {request["port"] for request in self.server.requests}
+        self.assertEqual(len(ports), 1)
+
+    def test_server_errors_retried_with_same_idempotency_key(self):
+        """Test 5xx responses are retried as the same request"""
+        self.server.responses = [server_error(), server_error(500)]
+        gateway = self.gateway(max_retries=2, breaker=CircuitBreaker(5, 30))
+
+        session = self.create(gateway)
+
+        self.assertEqual(session.id, "cs_test_1")
+        keys = {request["idempotency_key"] for request in self.server.requests}
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(keys), 1)
+        stats = gateway.stats()["operations"]["checkout.sessions.create"]
+        self.assertEqual(stats["calls"], 3)
+        self.assertEqual(stats["errors"], 2)
+        self.assertEqual(stats["retries"], 2)
+
+    def test_client_errors_not_retried(self):
+        """Test a rejected request is not retried"""
+        self.server.responses = [
+            (
+                400,
+                {
+                    "error": {
+                        "type": "invalid_request_error",
+                        "message": "Bad amount",
+                    }
+                },
+                0,
+            )
+        ]
+
+        with self.assertRaises(stripe.InvalidRequestError):
+            self.create(self.gateway(max_retries=2))
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_slow_response_times_out(self):
+        """Test a hanging Stripe call is cut off by the read timeout"""
+        self.server.responses = [(200, SESSION, 0.5)]
+        gateway = self.gateway(timeout=(1, 0.1), max_retries=0)
+
+        start = time.monotonic()
+        with self.assertRaises(stripe.APIConnectionError):
+            self.create(gateway)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_circuit_opens_and_recovers(self):
+        """Test the breaker fails fast while open and closes on a probe"""
+        self.server.responses = [server_error(), server_error()]
+        gateway = self.gateway(max_retries=0)
+
+        for _ in range(2):
+            with self.assertRaises(stripe.APIError):
+                self.create(gateway)
+        with self.assertRaises(StripeUnavailable):
+            self.create(gateway)
+
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(gateway.stats()["circuit"], CircuitBreaker.OPEN)
+        stats = gateway.stats()["operations"]["checkout.sessions.create"]
+        self.assertEqual(stats["rejected"], 1)
+
+        self.now += 30
+        self.assertEqual(self.create(gateway).id, "cs_test_1")
+        self.assertEqual(gateway.stats()["circuit"], CircuitBreaker.CLOSED)
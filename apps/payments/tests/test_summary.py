@@ -0,0 +1,334 @@
+import datetime
+import threading
+import time
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.books.models import Book
+from apps.borrowings.models import Borrowing
+from apps.payments.models import Payment, PaymentDailyTotal
+from apps.payments.services import mark_sessions_paid
+from apps.payments.summary import payment_summary
+from apps.payments.totals import (
+    rebuild_totals,
+    record_created,
+    record_deleted,
+)
+
+SUMMARY_URL = reverse("payments:payment-summary")
+
+
+class PaymentSummaryApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            email="admin@test.com", password="password123"
+        )
+        self.client.force_authenticate(self.admin)
+
+        book = Book.objects.create(
+            title="Test Book",
+            author="Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee=1.00,
+        )
+        self.borrowing = Borrowing.objects.create(
+            user=self.admin,
+            book=book,
+            expected_return_date=(
+                timezone.now().date() + datetime.timedelta(days=3)
+            ),
+        )
+        # (created, type, status, amount, session)
+        rows = [
+            ("2026-01-05", "PAYMENT", "PAID", "3.00", "cs_1"),
+            ("2026-01-05", "PAYMENT", "PENDING", "4.00", "cs_2"),
+            ("2026-01-20", "FINE", "PAID", "6.00", "cs_3"),
+            ("2026-02-01", "PAYMENT", "PAID", "5.00", "cs_4"),
+            ("2026-02-01", "PAYMENT", "EXPIRED", "7.00", "cs_5"),
+        ]
+        for created, type_, status_, amount, session_id in rows:
+            payment = Payment.objects.create(
+                borrowing=self.borrowing,
+                type=type_,
+                status=status_,
+                money_to_pay=Decimal(amount),
+                session_id=session_id,
+            )
+            Payment.objects.filter(pk=payment.pk).update(
+                created_at=timezone.make_aware(
+                    datetime.datetime.fromisoformat(f"{created}T12:00")
+                )
+            )
+        rebuild_totals()
+
+    def test_monthly_totals_by_type(self):
+        """Test paid and pending totals per type and per month"""
+        res = self.client.get(SUMMARY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data["totals"]["PAYMENT"],
+            {
+                "paid": "8.00",
+                "pending": "4.00",
+                "paid_count": 2,
+                "pending_count": 1,
+            },
+        )
+        self.assertEqual(res.data["totals"]["FINE"]["paid"], "6.00")
+        self.assertEqual(
+            [
+                (row["period"], row["type"], row["paid"], row["pending"])
+                for row in res.data["series"]
+            ],
+            [
+                ("2026-01-01", "FINE", "6.00", "0.00"),
+                ("2026-01-01", "PAYMENT", "3.00", "4.00"),
+                ("2026-02-01", "PAYMENT", "5.00", "0.00"),
+            ],
+        )
+
+    def test_daily_series_within_date_range(self):
+        """Test the inclusive date range and daily buckets"""
+        res = self.client.get(
+            SUMMARY_URL,
+            {
+                "period": "day",
+                "date_from": "2026-01-05",
+                "date_to": "2026-01-20",
+            },
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row["period"], row["type"]) for row in res.data["series"]],
+            [("2026-01-05", "PAYMENT"), ("2026-01-20", "FINE")],
+        )
+        self.assertEqual(res.data["totals"]["PAYMENT"]["paid"], "3.00")
+
+    def test_cached_until_status_changes(self):
+        """Test summaries are cached and dropped when a payment is paid"""
+        first = self.client.get(SUMMARY_URL)
+        second = self.client.get(SUMMARY_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_sessions_paid(["cs_2"])
+        third = self.client.get(SUMMARY_URL)
+
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(third["X-Cache"], "MISS")
+        self.assertEqual(third.data["totals"]["PAYMENT"]["paid"], "12.00")
+        self.assertEqual(third.data["totals"]["PAYMENT"]["pending"], "0.00")
+
+    def test_invalid_date_range_rejected(self):
+        """Test date_to before date_from is rejected"""
+        res = self.client.get(
+            SUMMARY_URL, {"date_from": "2026-02-01", "date_to": "2026-01-01"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_staff_only(self):
+        """Test regular users cannot read the payment summary"""
+        user = get_user_model().objects.create_user(
+            email="user@test.com", password="password123"
+        )
+        self.client.force_authenticate(user)
+
+        res = self.client.get(SUMMARY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+
+def totals_snapshot() -> set[tuple]:
+    return set(
+        PaymentDailyTotal.objects.values_list("day", "type", "status")
+        .annotate(total_count=Sum("count"), total_amount=Sum("amount"))
+        .filter(total_count__gt=0)
+        .order_by()
+    )
+
+
+class PaymentDailyTotalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password123"
+        )
+        book = Book.objects.create(
+            title="Test Book",
+            author="Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee=1.00,
+        )
+        self.borrowing = Borrowing.objects.create(
+            user=self.user,
+            book=book,
+            expected_return_date=(
+                timezone.now().date() + datetime.timedelta(days=3)
+            ),
+        )
+
+    def test_incremental_updates_match_rebuild(self):
+        """Test totals kept up on each change equal a full rebuild"""
+        with self.captureOnCommitCallbacks(execute=True):
+            payments = Payment.objects.bulk_create(
+                Payment(
+                    borrowing=self.borrowing,
+                    user=self.user,
+                    type=type_,
+                    money_to_pay=Decimal(amount),
+                    session_id=session_id,
+                )
+                for type_, amount, session_id in [
+                    ("PAYMENT", "3.00", "cs_1"),
+                    ("PAYMENT", "4.50", "cs_1"),
+                    ("FINE", "6.00", "cs_2"),
+                    ("FINE", "2.00", "cs_3"),
+                ]
+            )
+            record_created(payments)
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_sessions_paid(["cs_1", "cs_2"])
+            # A redelivered event must not count the payments twice.
+            mark_sessions_paid(["cs_1"])
+        with self.captureOnCommitCallbacks(execute=True):
+            record_deleted([payments[3]])
+            payments[3].delete()
+
+        incremental = totals_snapshot()
+        rebuild_totals()
+
+        self.assertEqual(incremental, totals_snapshot())
+        today = timezone.localdate()
+        self.assertEqual(
+            incremental,
+            {
+                (today, "PAYMENT", "PAID", 2, Decimal("7.50")),
+                (today, "FINE", "PAID", 1, Decimal("6.00")),
+            },
+        )
+
+    @override_settings(PAYMENT_TOTALS_BUCKETS=4)
+    def test_buckets_are_summed(self):
+        """Test totals split over buckets add up on read and on rebuild"""
+        payment = Payment.objects.create(
+            borrowing=self.borrowing,
+            user=self.user,
+            type=Payment.TypeChoices.PAYMENT,
+            money_to_pay=Decimal("3.00"),
+            session_id="cs_1",
+        )
+        with patch(
+            "apps.payments.totals.random.randrange", side_effect=[0, 1]
+        ):
+            record_created([payment])
+            mark_sessions_paid(["cs_1"])
+
+        self.assertEqual(
+            set(PaymentDailyTotal.objects.values_list("bucket", flat=True)),
+            {0, 1},
+        )
+        expected = {
+            (timezone.localdate(), "PAYMENT", "PAID", 1, Decimal("3.00"))
+        }
+        self.assertEqual(totals_snapshot(), expected)
+        summary = payment_summary()
+        self.assertEqual(summary["totals"]["PAYMENT"]["paid_count"], 1)
+        self.assertEqual(summary["totals"]["PAYMENT"]["pending_count"], 0)
+
+        rebuild_totals()
+        self.assertEqual(totals_snapshot(), expected)
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "Concurrent writers require Postgres",
+)
+class RebuildTotalsConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password123"
+        )
+        book = Book.objects.create(
+            title="Test Book",
+            author="Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee=1.00,
+        )
+        self.borrowing = Borrowing.objects.create(
+            user=self.user,
+            book=book,
+            expected_return_date=(
+                timezone.now().date() + datetime.timedelta(days=3)
+            ),
+        )
+
+    def pay(self) -> None:
+        payment = Payment.objects.create(
+            borrowing=self.borrowing,
+            type=Payment.TypeChoices.PAYMENT,
+            money_to_pay=Decimal("2.00"),
+        )
+        record_created([payment])
+
+    def test_rebuild_counts_open_transactions_once(self):
+        """Test a payment committed during a rebuild is counted once"""
+        self.pay()
+        PaymentDailyTotal.objects.update(count=5)
+        counted = threading.Event()
+        release = threading.Event()
+
+        def pay() -> None:
+            try:
+                with transaction.atomic():
+                    self.pay()
+                    counted.set()
+                    release.wait(5)
+            finally:
+                connections.close_all()
+
+        def rebuild() -> None:
+            try:
+                rebuild_totals()
+            finally:
+                connections.close_all()
+
+        writer = threading.Thread(target=pay)
+        writer.start()
+        counted.wait(5)
+        rebuilder = threading.Thread(target=rebuild)
+        rebuilder.start()
+        time.sleep(0.2)
+        release.set()
+        writer.join()
+        rebuilder.join()
+
+        self.assertEqual(
+            totals_snapshot(),
+            {
+                (
+                    timezone.localdate(),
+                    "PAYMENT",
+                    "PENDING",
+                    2,
+                    Decimal("4.00"),
+                )
+            },
+        )
@@ -0,0 +1,86 @@
+import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.books.models import Book
+from apps.borrowings.models import Borrowing
+from apps.payments.models import Payment
+from apps.payments.tasks import prepare_checkout_session
+
+
+class PrepareCheckoutSessionTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email="user@test.com", password="password123"
+        )
+        book = Book.objects.create(
+            title="Test Book",
+            author="Author",
+            cover="HARD",
+            inventory=1,
+            daily_fee=1.00,
+        )
+        borrowing = Borrowing.objects.create(
+            user=user,
+            book=book,
+            expected_return_date=(
+                timezone.now().date() + datetime.timedelta(days=3)
+            ),
+        )
+        self.payment = Payment.objects.create(
+            type=Payment.TypeChoices.PAYMENT,
+            borrowing=borrowing,
+            money_to_pay=3,
+        )
+
+    @patch("apps.payments.stripe_client.StripeGateway.create_checkout_session")
+    def test_prepare_checkout_session_stores_session(self, mock_create):
+        """Test the task stores the created Stripe session on the payment"""
+        mock_create.return_value = SimpleNamespace(
+            id="cs_test_1", url="https://checkout.stripe.com/cs_test_1"
+        )
+
+        prepare_checkout_session(
+            self.payment.id, "Test Book", "http://s", "http://c"
+        )
+        self.payment.refresh_from_db()
+
+        self.assertEqual(self.payment.session_id, "cs_test_1")
+        self.assertEqual(
+            mock_create.call_args.kwargs["idempotency_key"],
+            f"payment-{self.payment.id}",
+        )
+
+    @patch("apps.payments.stripe_client.StripeGateway.create_checkout_session")
+    def test_prepare_checkout_session_runs_once(self, mock_create):
+        """Test a retried task does not create a second session"""
+        Payment.objects.filter(pk=self.payment.id).update(
+            session_id="cs_existing"
+        )
+
+        prepare_checkout_session(
+            self.payment.id, "Test Book", "http://s", "http://c"
+        )
+
+        mock_create.assert_not_called()
+
+    @patch("apps.payments.stripe_client.StripeGateway.create_checkout_session")
+    def test_prepare_checkout_session_skips_expired_payment(
+        self, mock_create
+    ):
+        """Test no session is created once the payment has expired"""
+        Payment.objects.filter(pk=self.payment.id).update(
+            status=Payment.StatusChoices.EXPIRED
+        )
+
+        prepare_checkout_session(
+            self.payment.id, "Test Book", "http://s", "http://c"
+        )
+        self.payment.refresh_from_db()
+
+        mock_create.assert_not_called()
+        self.assertIsNone(self.payment.session_id)
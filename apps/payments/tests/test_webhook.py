@@ -0,0 +1,155 @@
+import datetime
+import hashlib
+import hmac
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.books.models import Book
+from apps.borrowings.models import Borrowing
+from apps.payments.models import Payment, StripeEvent
+
+WEBHOOK_URL = reverse("payments:payment-webhook")
+WEBHOOK_SECRET = "whsec_test"
+
+
+def checkout_event(
+    session_id: str,
+    event_id: str = "evt_1",
+    event_type: str = "checkout.session.completed",
+    payment_status: str = "paid",
+) -> bytes:
+    return json.dumps(
+        {
+            "id": event_id,
+            "object": "event",
+            "type": event_type,
+            "data": {
+                "object": {
+                    "id": session_id,
+                    "object": "checkout.session",
+                    "payment_status": payment_status,
+                }
+            },
+        }
+    ).encode()
+
+
+def sign(payload: bytes, secret: str = WEBHOOK_SECRET) -> str:
+    """Build a Stripe-Signature header the way Stripe does."""
+    timestamp = int(time.time())
+    signature = hmac.new(
+        secret.encode(),
+        f"{timestamp}.".encode() + payload,
+        hashlib.sha256,
+    ).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class StripeWebhookTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        user = get_user_model().objects.create_user(
+            email="user@test.com", password="password123"
+        )
+        book = Book.objects.create(
+            title="Test Book",
+            author="Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee=1.00,
+        )
+        self.payments = []
+        for _ in range(2):
+            borrowing = Borrowing.objects.create(
+                user=user,
+                book=book,
+                expected_return_date=(
+                    timezone.now().date() + datetime.timedelta(days=3)
+                ),
+            )
+            self.payments.append(
+                Payment.objects.create(
+                    type=Payment.TypeChoices.PAYMENT,
+                    borrowing=borrowing,
+                    session_id="cs_test_1",
+                    money_to_pay=3,
+                )
+            )
+
+    def post(self, payload: bytes, signature: str | None = None):
+        return self.client.post(
+            WEBHOOK_URL,
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=signature or sign(payload),
+        )
+
+    def statuses(self) -> set[str]:
+        return set(
+            Payment.objects.filter(session_id="cs_test_1").values_list(
+                "status", flat=True
+            )
+        )
+
+    def test_completed_session_marks_payments_paid(self):
+        """Test a paid session marks all of its payments as paid"""
+        res = self.post(checkout_event("cs_test_1"))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.statuses(), {Payment.StatusChoices.PAID})
+        self.assertTrue(StripeEvent.objects.filter(id="evt_1").exists())
+
+    def test_redelivered_event_is_applied_once(self):
+        """Test an event delivered twice is only applied the first time"""
+        payload = checkout_event("cs_test_1")
+        self.post(payload)
+        Payment.objects.update(status=Payment.StatusChoices.PENDING)
+
+        res = self.post(payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.statuses(), {Payment.StatusChoices.PENDING})
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+    def test_unpaid_session_stays_pending(self):
+        """Test a completed session awaiting a delayed payment is unpaid"""
+        self.post(checkout_event("cs_test_1", payment_status="unpaid"))
+        self.assertEqual(self.statuses(), {Payment.StatusChoices.PENDING})
+
+        self.post(
+            checkout_event(
+                "cs_test_1",
+                event_id="evt_2",
+                event_type="checkout.session.async_payment_succeeded",
+            )
+        )
+        self.assertEqual(self.statuses(), {Payment.StatusChoices.PAID})
+
+    def test_invalid_signature_rejected(self):
+        """Test a payload signed with another secret is rejected"""
+        payload = checkout_event("cs_test_1")
+
+        res = self.post(payload, signature=sign(payload, secret="whsec_x"))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.statuses(), {Payment.StatusChoices.PENDING})
+        self.assertFalse(StripeEvent.objects.exists())
+
+    @override_settings(STRIPE_WEBHOOK_SECRET="")
+    def test_missing_secret_is_unavailable(self):
+        """Test events are refused with 503 until the secret is set"""
+        payload = checkout_event("cs_test_1")
+
+        with self.assertLogs("apps.payments.views", "ERROR"):
+            res = self.post(payload)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(self.statuses(), {Payment.StatusChoices.PENDING})
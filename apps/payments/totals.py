@@ -0,0 +1,137 @@
+import random
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from library_service.db import consistent_snapshot
+from .cache import invalidate_summary
+from .models import Payment, PaymentDailyTotal
+
+# (day, type, status) of a PaymentDailyTotal row.
+Key = tuple[date, str, str]
+Deltas = dict[Key, tuple[int, Decimal]]
+
+
+def _apply(deltas: Deltas, bucket: int | None = None) -> None:
+    """
+    Add (count, amount) `deltas` to the daily totals in one UPDATE, on
+    the rows of `bucket` or of a random one.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+
+    if bucket is None:
+        bucket = random.randrange(settings.PAYMENT_TOTALS_BUCKETS)
+    PaymentDailyTotal.objects.bulk_create(
+        [
+            PaymentDailyTotal(
+                day=day, type=type_, status=status, bucket=bucket
+            )
+            for day, type_, status in deltas
+        ],
+        ignore_conflicts=True,
+    )
+    rows = Q()
+    count_whens = []
+    amount_whens = []
+    for (day, type_, status), (count, amount) in deltas.items():
+        row = Q(day=day, type=type_, status=status)
+        rows |= row
+        count_whens.append(When(row, then=Value(count)))
+        amount_whens.append(When(row, then=Value(amount)))
+
+    PaymentDailyTotal.objects.filter(rows, bucket=bucket).update(
+        count=F("count") + Case(*count_whens, default=Value(0)),
+        amount=F("amount")
+        + Case(
+            *amount_whens,
+            default=Value(Decimal(0)),
+            output_field=PaymentDailyTotal._meta.get_field("amount"),
+        ),
+    )
+    transaction.on_commit(invalidate_summary)
+
+
+def _record(changes: Iterable[tuple[Payment, str, int]]) -> None:
+    """
+    Count each (payment, status, sign) change in the transaction making it.
+
+    The totals then always match the committed payments, which is what
+    lets the nightly rebuild correct them without a lock. Callers record
+    as the last write of their transaction, so that concurrent checkouts
+    hold the lock of today's rows only briefly.
+    """
+    deltas = defaultdict(lambda: (0, Decimal(0)))
+    for payment, status, sign in changes:
+        key = (timezone.localdate(payment.created_at), payment.type, status)
+        count, amount = deltas[key]
+        deltas[key] = (count + sign, amount + sign * payment.money_to_pay)
+
+    _apply(dict(deltas))
+
+
+def record_created(payments: Iterable[Payment]) -> None:
+    """Count new payments."""
+    _record((payment, payment.status, 1) for payment in payments)
+
+
+def record_deleted(payments: Iterable[Payment]) -> None:
+    """Take deleted payments out of the totals."""
+    _record((payment, payment.status, -1) for payment in payments)
+
+
+def record_status_change(payments: Iterable[Payment], status: str) -> None:
+    """Move payments, still holding their old status, to `status`."""
+    changes = []
+    for payment in payments:
+        changes += [(payment, payment.status, -1), (payment, status, 1)]
+    _record(changes)
+
+
+def rebuild_totals(batch_size: int = 1000) -> None:
+    """
+    Correct the daily totals to the sums of `Payment`.
+
+    The sums and the totals are read from one snapshot, where they only
+    differ by drift, e.g. from payments edited outside the recorded
+    paths. That difference is then applied like any other delta, so
+    changes committed meanwhile are kept and writers never wait for the
+    aggregate. Corrections all go to bucket 0.
+    """
+    with consistent_snapshot():
+        expected = {
+            (row["day"], row["type"], row["status"]): (
+                row["count"],
+                row["amount"],
+            )
+            for row in Payment.objects.annotate(day=TruncDate("created_at"))
+            .values("day", "type", "status")
+            .annotate(count=Count("id"), amount=Sum("money_to_pay"))
+            .order_by()
+        }
+        current = {
+            (day, type_, status): (count, amount)
+            for day, type_, status, count, amount in (
+                PaymentDailyTotal.objects.values_list("day", "type", "status")
+                .annotate(total_count=Sum("count"), total_amount=Sum("amount"))
+                .order_by()
+            )
+        }
+
+    corrections = {}
+    for key in expected.keys() | current.keys():
+        count, amount = expected.get(key, (0, Decimal(0)))
+        current_count, current_amount = current.get(key, (0, Decimal(0)))
+        corrections[key] = (count - current_count, amount - current_amount)
+    corrections = sorted(corrections.items())
+    for start in range(0, len(corrections), batch_size):
+        with transaction.atomic():
+            _apply(dict(corrections[start : start + batch_size]), bucket=0)
@@ -1,33 +1,66 @@
-from django.db import transaction
-from django.db.models import QuerySet
+import logging
+import os
+import socket
+
+import stripe
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count, F, QuerySet, Sum
+from django.http import HttpResponseBase
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import (
+    AllowAny,
+    IsAdminUser,
+    IsAuthenticated,
+)
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 
-from .models import Payment
+from library_service.exports import OUTPUT_QUERY_PARAM, export_response
+from library_service.fastlist import FastListMixin
+from .cache import summary_cache
+from .models import AccruedFine, Payment
 from .schemas import payment_schema
 from .serializers import (
+    AccruedFineTotalSerializer,
+    PaymentSummaryQuerySerializer,
+    PaymentSummarySerializer,
     PaymentListSerializer,
     PaymentDetailSerializer,
 )
-from .services import get_session, is_session_paid
+from .services import construct_webhook_event, handle_webhook_event
+from .stripe_client import get_stripe_gateway
+from .summary import payment_summary
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FIELDS = (
+    "id",
+    "borrowing_id",
+    "user_id",
+    "status",
+    "type",
+    "money_to_pay",
+    "session_id",
+    "updated_at",
+)
 
 
 @payment_schema
-class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
+class PaymentViewSet(FastListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentListSerializer
     permission_classes = (IsAuthenticated,)
+    cursor_ordering = ("-id",)
 
     def get_queryset(self) -> QuerySet:
-        queryset = self.queryset.select_related("borrowing")
+        queryset = self.queryset
         user = self.request.user
 
         if not user.is_staff:
-            queryset = queryset.filter(borrowing__user=user)
+            queryset = queryset.filter(user=user)
 
         return queryset
 
@@ -36,11 +69,128 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
             return PaymentDetailSerializer
         return self.serializer_class
 
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="export",
+        permission_classes=[IsAdminUser],
+    )
+    def export(self, request: Request) -> HttpResponseBase:
+        """
+        Stream every payment as CSV or NDJSON, optionally limited to the
+        borrowings of one user (`user_id`) or to active or completed
+        borrowings (`is_active`), as in the borrowing list.
+        """
+        queryset = self.get_queryset()
+        params = request.query_params
+
+        if user_id := params.get("user_id"):
+            queryset = queryset.filter(user_id=user_id)
+
+        if (is_active_param := params.get("is_active")) is not None:
+            if is_active_param.lower() in ("true", "1", "yes"):
+                queryset = queryset.filter(
+                    borrowing__actual_return_date__isnull=True
+                )
+            else:
+                queryset = queryset.filter(
+                    borrowing__actual_return_date__isnull=False,
+                    borrowing__cancelled=False,
+                )
+
+        queryset = queryset.order_by("id").values(
+            "id",
+            "borrowing_id",
+            "status",
+            "type",
+            "money_to_pay",
+            "session_id",
+            "updated_at",
+            "user_id",
+        )
+        return export_response(
+            queryset,
+            EXPORT_FIELDS,
+            params.get(OUTPUT_QUERY_PARAM),
+            "payments",
+            chunk_size=settings.EXPORT_CHUNK_SIZE,
+        )
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="stripe-worker-stats",
+        permission_classes=[IsAdminUser],
+    )
+    def stripe_worker_stats(self, request: Request) -> Response:
+        """Report this worker's Stripe circuit state and call metrics."""
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        return Response({"worker": worker, **get_stripe_gateway().stats()})
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="summary",
+        permission_classes=[IsAdminUser],
+    )
+    def summary(self, request: Request) -> Response:
+        """
+        Paid and pending totals per payment type and per day or month,
+        cached until the next payment is created or changes status.
+        """
+        query = PaymentSummaryQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        key = (
+            params["period"],
+            params.get("date_from"),
+            params.get("date_to"),
+        )
+
+        data = summary_cache.get(*key)
+        hit = data is not None
+        if not hit:
+            data = PaymentSummarySerializer(payment_summary(*key)).data
+            summary_cache.set(data, *key)
+
+        response = Response(data)
+        response["X-Cache"] = "HIT" if hit else "MISS"
+        return response
+
+    @action(detail=False, methods=["GET"], url_path="accrued-fines")
+    def accrued_fines(self, request: Request) -> Response:
+        """
+        Per-user totals of the fines accrued by unreturned overdue books.
+
+        Staff see every user with an accrued fine, largest total first;
+        other users see only their own total.
+        """
+        queryset = AccruedFine.objects.all()
+        if not request.user.is_staff:
+            queryset = queryset.filter(user=request.user)
+
+        totals = (
+            queryset.values("user_id")
+            .annotate(
+                user_email=F("user__email"),
+                borrowings=Count("borrowing"),
+                total=Sum("amount"),
+            )
+            .order_by("-total", "user_id")
+        )
+        # Aggregated rows are dicts, which cursor pagination cannot key on.
+        self.cursor_ordering = None
+        page = self.paginate_queryset(totals)
+        serializer = AccruedFineTotalSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=False, methods=["GET"])
-    @transaction.atomic
     def success(self, request: Request) -> Response:
         """
-        Handle successful Stripe payments.
+        Report the payment status of the Stripe session the user paid.
+
+        Payments are marked paid by the Stripe webhook, so this is only a
+        database read; the redirect may arrive before the webhook does.
         """
         session_id = request.query_params.get("session_id")
         if not session_id:
@@ -49,36 +199,73 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        session = get_session(session_id)
-
-        try:
-            payment = Payment.objects.select_for_update().get(
-                session_id=session_id
-            )
-        except Payment.DoesNotExist:
+        # A cart checkout pays for several borrowings with one session.
+        payments = list(
+            Payment.objects.filter(session_id=session_id)
+            .order_by("borrowing_id")
+            .values_list("borrowing_id", "status")
+        )
+        if not payments:
             return Response(
                 {"error": "Payment record not found."},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        if is_session_paid(session):
-            if payment.status != Payment.StatusChoices.PAID:
-                payment.status = Payment.StatusChoices.PAID
-                payment.save()
+        statuses = {payment_status for _, payment_status in payments}
+        if Payment.StatusChoices.EXPIRED in statuses:
+            return Response(
+                {"error": "Payment session has expired."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if statuses != {Payment.StatusChoices.PAID}:
             return Response(
                 {
                     "message": (
-                        f"Payment successful! Borrowing ID: {payment.borrowing_id}."
+                        "Payment is being confirmed. "
+                        "Check the payment status again shortly."
                     )
                 },
-                status=status.HTTP_200_OK,
+                status=status.HTTP_202_ACCEPTED,
             )
 
+        borrowing_ids = ", ".join(
+            str(borrowing_id) for borrowing_id, _ in payments
+        )
+        label = "Borrowing ID" if len(payments) == 1 else "Borrowing IDs"
         return Response(
-            {"message": "Payment was not successful."},
-            status=status.HTTP_400_BAD_REQUEST,
+            {"message": f"Payment successful! {label}: {borrowing_ids}."},
+            status=status.HTTP_200_OK,
         )
 
+    @action(
+        detail=False,
+        methods=["POST"],
+        permission_classes=[AllowAny],
+        authentication_classes=[],
+    )
+    def webhook(self, request: Request) -> Response:
+        """Apply a signed Stripe webhook event."""
+        try:
+            event = construct_webhook_event(
+                request.body, request.headers.get("Stripe-Signature", "")
+            )
+        except (ValueError, stripe.SignatureVerificationError):
+            return Response(
+                {"error": "Invalid payload or signature."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except ImproperlyConfigured as e:
+            # A 5xx makes Stripe retry the event, e.g. once the secret is set.
+            logger.error("Cannot verify Stripe webhook: %s", e)
+            return Response(
+                {"error": "Webhook is not configured."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        handle_webhook_event(event)
+        return Response({"received": True}, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=["GET"])
     def cancel(self, request: Request) -> Response:
         """Handle cancelled Stripe payments."""
@@ -1,6 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import QuerySet
+from django.forms import ModelForm
+from django.http import HttpRequest
 
+from .cache import invalidate_user
 from .models import User
 
 
@@ -45,3 +49,25 @@ class CustomUserAdmin(UserAdmin):
             },
         ),
     )
+
+    def save_model(
+        self,
+        request: HttpRequest,
+        obj: User,
+        form: ModelForm,
+        change: bool,
+    ) -> None:
+        super().save_model(request, obj, form, change)
+        if change:
+            invalidate_user(obj.pk)
+
+    def delete_model(self, request: HttpRequest, obj: User) -> None:
+        invalidate_user(obj.pk)
+        super().delete_model(request, obj)
+
+    def delete_queryset(
+        self, request: HttpRequest, queryset: QuerySet
+    ) -> None:
+        for user_id in queryset.values_list("pk", flat=True):
+            invalidate_user(user_id)
+        super().delete_queryset(request, queryset)
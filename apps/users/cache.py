@@ -0,0 +1,137 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from rest_framework_simplejwt.tokens import Token
+
+from library_service.cache import VersionedCache
+
+User = get_user_model()
+
+# What a cached request.user is rebuilt from: all the views and
+# permission checks read. Other fields are loaded on first access.
+USER_FIELDS = (
+    "id",
+    "email",
+    "first_name",
+    "last_name",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+)
+
+
+class LocalLRU:
+    """Thread-safe in-process mapping keeping the `maxsize` latest keys."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self.lock:
+            value = self.data.get(key)
+            if value is not None:
+                self.data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.data.clear()
+
+
+def _user_versions(user_id: Any) -> VersionedCache:
+    return VersionedCache(f"users:auth:{user_id}", timeout=None)
+
+
+def user_version(user_id: Any) -> int:
+    return _user_versions(user_id).get_version()
+
+
+def invalidate_user(user_id: Any) -> None:
+    """Stop serving the cached user of every token of `user_id`."""
+    transaction.on_commit(lambda: _user_versions(user_id).bump())
+
+
+class TokenUserCache:
+    """
+    Users resolved from access tokens, keyed by a digest of the token.
+
+    An entry is only ever stored for a token whose signature was verified,
+    so finding one proves the token valid without verifying it again.
+    Entries live in a process-local LRU and, for the other processes, in
+    the shared cache until the token expires. They are trusted while the
+    version of their user is unchanged; `invalidate_user()` bumps it.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.local = LocalLRU(maxsize)
+
+    @staticmethod
+    def make_key(raw_token: bytes) -> str:
+        return f"users:auth:token:{hashlib.sha256(raw_token).hexdigest()}"
+
+    def get(self, raw_token: bytes) -> User | None:
+        key = self.make_key(raw_token)
+        entry = self.local.get(key)
+        if entry is None:
+            entry = cache.get(key)
+            if entry is None:
+                return None
+            self.local.set(key, entry)
+
+        if entry["exp"] <= time.time():
+            return None
+        if entry["version"] != user_version(entry["user_id"]):
+            return None
+        values = entry["values"]
+        # from_db() expects the fields in model order.
+        fields = [
+            field.attname
+            for field in User._meta.concrete_fields
+            if field.attname in values
+        ]
+        return User.from_db(
+            router.db_for_read(User),
+            fields,
+            [values[field] for field in fields],
+        )
+
+    def set(
+        self, raw_token: bytes, token: Token, user: User, version: int
+    ) -> None:
+        """
+        Cache `user`, loaded for the verified `token`.
+
+        `version` must be read before the user is loaded, so that an
+        update committed in between leaves the entry stale.
+        """
+        timeout = int(token["exp"] - time.time())
+        if timeout <= 0:
+            return
+        key = self.make_key(raw_token)
+        entry = {
+            "user_id": user.pk,
+            "exp": token["exp"],
+            "version": version,
+            "values": {field: getattr(user, field) for field in USER_FIELDS},
+        }
+        cache.set(key, entry, timeout=timeout)
+        self.local.set(key, entry)
+
+
+token_users = TokenUserCache(settings.JWT_USER_CACHE_SIZE)
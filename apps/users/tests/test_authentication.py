@@ -0,0 +1,121 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from redis.exceptions import RedisError
+from rest_framework.test import APIClient
+
+from apps.users.cache import LocalLRU, invalidate_user, token_users
+
+TOKEN_URL = reverse("users:token_obtain_pair")
+ME_URL = reverse("users:user-me")
+
+User = get_user_model()
+
+
+@override_settings(JWT_USER_CACHE=True)
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        token_users.local.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="cached@example.com",
+            password="password123",
+            first_name="Old",
+        )
+        res = self.client.post(
+            TOKEN_URL, {"email": self.user.email, "password": "password123"}
+        )
+        self.token = res.data["access"]
+        self.client.credentials(HTTP_AUTHORIZE=self.token)
+
+    def test_seen_token_is_resolved_without_queries(self):
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["email"], self.user.email)
+        self.assertEqual(res.data["first_name"], "Old")
+
+    def test_other_processes_share_the_cache(self):
+        self.client.get(ME_URL)
+        token_users.local.clear()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @patch("apps.users.cache.cache.get", side_effect=RedisError)
+    def test_cache_outage_falls_back_to_verification(self, _):
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["email"], self.user.email)
+
+    def test_tampered_token_is_verified(self):
+        self.client.get(ME_URL)
+        header, payload, signature = self.token.split(".")
+        tampered = f"{header}.{payload}.{signature[::-1]}"
+
+        self.client.credentials(HTTP_AUTHORIZE=tampered)
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_update_through_me_invalidates(self):
+        self.client.get(ME_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.patch(ME_URL, {"first_name": "New"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.data["first_name"], "New")
+
+    def test_password_update_keeps_other_fields(self):
+        self.client.get(ME_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(ME_URL, {"password": "newpassword123"})
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("newpassword123"))
+        self.assertEqual(self.user.email, "cached@example.com")
+        self.assertEqual(self.user.first_name, "Old")
+
+    def test_deactivated_user_is_rejected_once_invalidated(self):
+        self.client.get(ME_URL)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_user(self.user.pk)
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(JWT_USER_CACHE=False)
+    def test_disabled_cache_queries_the_user(self):
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
+
+
+class LocalLRUTests(TestCase):
+    def test_least_recently_used_key_is_evicted(self):
+        lru = LocalLRU(2)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")
+        lru.set("c", 3)
+
+        self.assertEqual(lru.get("a"), 1)
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("c"), 3)
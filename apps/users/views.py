@@ -10,6 +10,7 @@ from rest_framework.permissions import (
 from rest_framework.request import Request
 from rest_framework.response import Response
 
+from .cache import invalidate_user
 from .serializers import UserSerializer
 
 
@@ -41,6 +42,10 @@ class UserViewSet(
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
 
+    def perform_update(self, serializer: UserSerializer) -> None:
+        super().perform_update(serializer)
+        invalidate_user(serializer.instance.pk)
+
     @extend_schema(methods=["GET"], summary="Retrieve current user")
     @extend_schema(methods=["PUT"], summary="Update current user")
     @extend_schema(methods=["PATCH"], summary="Partially update current user")
@@ -58,5 +63,5 @@ class UserViewSet(
 
         serializer = self.get_serializer(user, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        self.perform_update(serializer)
         return Response(serializer.data)
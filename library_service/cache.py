@@ -0,0 +1,117 @@
+import hashlib
+import logging
+import time
+from typing import Any
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.http import QueryDict
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class VersionedCache:
+    """
+    Cache namespace invalidated by bumping a version counter.
+
+    Every key is prefixed with the current namespace version, so a single
+    ``bump()`` makes all previously stored entries unreachable without
+    having to enumerate them. Stale entries simply expire by timeout.
+
+    Cache outages are logged and read as misses, so callers fall back to
+    building the value themselves.
+    """
+
+    def __init__(self, namespace: str, timeout: int | None = 300) -> None:
+        self.namespace = namespace
+        self.timeout = timeout
+
+    @property
+    def _version_key(self) -> str:
+        return f"{self.namespace}:version"
+
+    def _counter_key(self, name: str) -> str:
+        return f"{self.namespace}:{name}"
+
+    def get_version(self) -> int:
+        version = cache.get(self._version_key)
+        if version is None:
+            # Seed with a timestamp so a lost counter never reuses
+            # a version that may still have live entries.
+            cache.add(self._version_key, time.time_ns(), timeout=None)
+            version = cache.get(self._version_key)
+        return version
+
+    def bump(self) -> None:
+        """Invalidate every entry stored under the current version."""
+        try:
+            try:
+                cache.incr(self._version_key)
+            except ValueError:
+                cache.set(self._version_key, time.time_ns(), timeout=None)
+        except RedisError:
+            logger.exception("Could not invalidate cache %s", self.namespace)
+
+    def make_key(self, *parts: Any) -> str:
+        suffix = ":".join(str(part) for part in parts)
+        return f"{self.namespace}:v{self.get_version()}:{suffix}"
+
+    def get(self, *parts: Any) -> Any:
+        try:
+            value = cache.get(self.make_key(*parts))
+            self._count("misses" if value is None else "hits")
+        except RedisError:
+            logger.warning(
+                "Cache %s unavailable", self.namespace, exc_info=True
+            )
+            return None
+        return value
+
+    def set(self, value: Any, *parts: Any, timeout: int | None = None) -> None:
+        try:
+            cache.set(
+                self.make_key(*parts),
+                value,
+                timeout=self.timeout if timeout is None else timeout,
+            )
+        except RedisError:
+            logger.warning(
+                "Cache %s unavailable", self.namespace, exc_info=True
+            )
+
+    def delete(self, *parts: Any) -> None:
+        try:
+            cache.delete(self.make_key(*parts))
+        except RedisError:
+            logger.exception("Could not delete from cache %s", self.namespace)
+
+    def _count(self, name: str) -> None:
+        key = self._counter_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 0, timeout=None)
+            cache.incr(key)
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters collected since the cache was created."""
+        try:
+            counters = cache.get_many(
+                [self._counter_key("hits"), self._counter_key("misses")]
+            )
+        except RedisError:
+            logger.warning(
+                "Cache %s unavailable", self.namespace, exc_info=True
+            )
+            counters = {}
+        return {
+            "hits": counters.get(self._counter_key("hits"), 0),
+            "misses": counters.get(self._counter_key("misses"), 0),
+        }
+
+
+def query_params_digest(query_params: QueryDict) -> str:
+    """Return a short digest of query params that ignores their order."""
+    normalized = urlencode(sorted(query_params.lists()), doseq=True)
+    return hashlib.md5(normalized.encode()).hexdigest()
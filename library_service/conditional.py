@@ -0,0 +1,60 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Callable
+
+from django.http import HttpResponse, HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+
+def make_etag(request: Request, last_modified: datetime, *parts: Any) -> str:
+    """
+    Build a strong ETag from a change timestamp and request variants.
+
+    The renderer format is part of the tag, since the same data rendered
+    as JSON and as the browsable API are different representations.
+    """
+    raw = ":".join(
+        [last_modified.isoformat(), request.accepted_renderer.format]
+        + [str(part) for part in parts]
+    )
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def conditional_response(
+    request: Request,
+    last_modified: datetime | None,
+    get_response: Callable[[], Response],
+    *etag_parts: Any,
+) -> HttpResponseBase:
+    """
+    Answer `If-None-Match`/`If-Modified-Since` without building the body.
+
+    Validators are derived from `last_modified` alone, so callers only
+    need a cheap `updated_at` lookup to decide on 304 Not Modified.
+    `get_response` is called only when the full response is needed.
+    """
+    if last_modified is None:
+        return get_response()
+
+    validators = HttpResponse()
+    validators["ETag"] = make_etag(request, last_modified, *etag_parts)
+    validators["Last-Modified"] = http_date(last_modified.timestamp())
+
+    conditional = get_conditional_response(
+        request,
+        etag=validators["ETag"],
+        last_modified=int(last_modified.timestamp()),
+        response=validators,
+    )
+    if conditional is not validators:
+        return conditional
+
+    response = get_response()
+    if response.status_code == status.HTTP_200_OK:
+        response["ETag"] = validators["ETag"]
+        response["Last-Modified"] = validators["Last-Modified"]
+    return response
@@ -0,0 +1,24 @@
+from contextlib import contextmanager
+from typing import Iterator
+
+from django.db import connection, transaction
+
+
+@contextmanager
+def consistent_snapshot() -> Iterator[None]:
+    """
+    Run the block in a read-only transaction whose queries all see the
+    same snapshot of the database, without blocking anyone.
+
+    Inside an outer transaction the block joins it and keeps its
+    isolation level. Only PostgreSQL gets a repeatable read snapshot.
+    """
+    outer = connection.in_atomic_block
+    with transaction.atomic():
+        if connection.vendor == "postgresql" and not outer:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ "
+                    "READ ONLY"
+                )
+        yield
@@ -0,0 +1,454 @@
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+STRIPE = "stripe"
+TELEGRAM = "telegram"
+SESSION_PATH = re.compile(r"^/v1/checkout/sessions/(?P<id>[^/]+)$")
+EXPIRE_PATH = re.compile(r"^/v1/checkout/sessions/(?P<id>[^/]+)/expire$")
+PAY_PATH = re.compile(r"^/pay/(?P<id>[^/]+)$")
+TELEGRAM_PATH = re.compile(r"^/bot(?P<token>[^/]+)/(?P<method>\w+)$")
+
+Response = tuple[int, dict, float]
+
+
+@dataclass
+class Faults:
+    """How badly the fake APIs behave."""
+
+    # Added to every response: `latency` plus up to `jitter` seconds.
+    latency: float = 0
+    jitter: float = 0
+    # Share of requests answered with `error_status`.
+    error_rate: float = 0
+    error_status: int = 503
+    # Requests per second accepted per API, with bursts of as many (at
+    # least one); the rest get 429 Too Many Requests. None means
+    # unlimited.
+    rate_limit: float | None = None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, clock=time.monotonic) -> None:
+        self.rate = rate
+        # A rate below one a second still lets single requests through.
+        self.capacity = max(1, rate)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+def stripe_error(error_type: str, message: str) -> dict:
+    return {"error": {"type": error_type, "message": message}}
+
+
+def telegram_error(status: int, description: str, **parameters) -> dict:
+    body = {"ok": False, "error_code": status, "description": description}
+    if parameters:
+        body["parameters"] = parameters
+    return body
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeApiServer"
+
+    def do_GET(self) -> None:
+        self.handle_api()
+
+    def do_POST(self) -> None:
+        self.handle_api()
+
+    def handle_api(self) -> None:
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode() if length else ""
+        api = TELEGRAM if url.path.startswith("/bot") else STRIPE
+        self.server.record(
+            {
+                "api": api,
+                "method": self.command,
+                "path": url.path,
+                "query": query,
+                "body": body,
+                "port": self.client_address[1],
+                "idempotency_key": self.headers.get("Idempotency-Key"),
+                "authorization": self.headers.get("Authorization"),
+            }
+        )
+
+        if url.path == "/_fake/stats":
+            self.respond((200, self.server.stats(), 0))
+            return
+        match = PAY_PATH.match(url.path)
+        if match:
+            # The checkout page the customer is sent to, not an API call.
+            self.respond(self.server.pay_session(match["id"]))
+            return
+        queued = self.server.next_response()
+        if queued is not None:
+            self.respond(queued)
+            return
+
+        fault = self.server.fault(api)
+        if fault is not None:
+            self.respond(fault)
+        elif api == TELEGRAM:
+            self.respond(self.telegram(url.path, body))
+        else:
+            self.respond(self.stripe(url.path, query))
+
+    def stripe(self, path: str, query: dict) -> Response:
+        server = self.server
+        if self.command == "POST" and path == "/v1/checkout/sessions":
+            key = self.headers.get("Idempotency-Key")
+            return (200, server.create_session(key), 0)
+        if self.command == "GET" and path == "/v1/checkout/sessions":
+            return server.list_sessions(query)
+
+        match = SESSION_PATH.match(path) or EXPIRE_PATH.match(path)
+        session = match and server.find_session(match["id"])
+        if not session:
+            return (
+                404,
+                stripe_error("invalid_request_error", "No such session."),
+                0,
+            )
+        if self.command == "GET":
+            return (200, session, 0)
+        if self.command == "POST" and path.endswith("/expire"):
+            return server.expire_session(session)
+        return (
+            404,
+            stripe_error("invalid_request_error", "Unrecognized request."),
+            0,
+        )
+
+    def telegram(self, path: str, body: str) -> Response:
+        match = TELEGRAM_PATH.match(path)
+        if not match or match["method"] != "sendMessage":
+            return (404, telegram_error(404, "Not Found"), 0)
+        try:
+            payload = json.loads(body or "{}")
+        except json.JSONDecodeError:
+            payload = {}
+        if not payload.get("chat_id") or not payload.get("text"):
+            return (
+                400,
+                telegram_error(400, "Bad Request: message text is empty"),
+                0,
+            )
+        return (200, {"ok": True, "result": self.server.send(payload)}, 0)
+
+    def respond(self, response: Response) -> None:
+        status, body, delay = response
+        time.sleep(delay)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        self.server.count(status)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class FakeApiServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the Stripe and Telegram HTTP APIs.
+
+    Serves the calls the service makes, checkout sessions and
+    `sendMessage`, so the borrowing and payment flows can be load tested
+    offline with `FAKE_APIS_URL` pointing here.
+
+    Responses queued in `responses` as (status, body, delay) are served
+    first, as they are; otherwise `faults` apply. Checkout sessions are
+    kept in `sessions`, sent messages in `messages` and, with `record`,
+    every request in `requests`. Creating a session is idempotent per
+    `Idempotency-Key`, like on Stripe. Opening a session's `url` pays it,
+    as a customer completing the checkout would. With a `webhook_url`,
+    that also posts a `checkout.session.completed` event signed with
+    `webhook_secret` there in the background, and the outcome is kept
+    in `deliveries`.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int] = ("127.0.0.1", 0),
+        faults: Faults | None = None,
+        record: bool = True,
+        seed: int | None = None,
+        webhook_url: str | None = None,
+        webhook_secret: str = "",
+    ) -> None:
+        super().__init__(address, FakeApiHandler)
+        self.faults = faults or Faults()
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.record_requests = record
+        self.random = random.Random(seed)
+        self.buckets = {
+            api: TokenBucket(self.faults.rate_limit)
+            for api in (STRIPE, TELEGRAM)
+            if self.faults.rate_limit
+        }
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.responses: list[Response] = []
+        self.requests: list[dict] = []
+        self.sessions: list[dict] = []
+        self.messages: list[dict] = []
+        self.deliveries: list[dict] = []
+        self.idempotent: dict[str, dict] = {}
+        self.statuses = Counter()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, poll_interval: float = 0.5) -> threading.Thread:
+        """Serve in a daemon thread; stop with `stop()`."""
+        thread = threading.Thread(
+            target=self.serve_forever,
+            kwargs={"poll_interval": poll_interval},
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def record(self, request: dict) -> None:
+        if self.record_requests:
+            with self.lock:
+                self.requests.append(request)
+
+    def count(self, status: int) -> None:
+        with self.lock:
+            self.statuses[status] += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "responses": {
+                    str(status): count
+                    for status, count in sorted(self.statuses.items())
+                },
+                "sessions": len(self.sessions),
+                "messages": len(self.messages),
+                "webhooks": len(self.deliveries),
+            }
+
+    def next_response(self) -> Response | None:
+        with self.lock:
+            return self.responses.pop(0) if self.responses else None
+
+    def fault(self, api: str) -> Response | None:
+        """Return an injected error response, after the injected latency."""
+        faults = self.faults
+        with self.lock:
+            delay = faults.latency + self.random.uniform(0, faults.jitter)
+            failed = self.random.random() < faults.error_rate
+        time.sleep(delay)
+
+        bucket = self.buckets.get(api)
+        if bucket is not None and not bucket.take():
+            if api == TELEGRAM:
+                body = telegram_error(
+                    429, "Too Many Requests: retry after 1", retry_after=1
+                )
+            else:
+                body = stripe_error(
+                    "invalid_request_error",
+                    "Too many requests hit the API too quickly.",
+                )
+            return (429, body, 0)
+        if failed:
+            status = faults.error_status
+            if api == TELEGRAM:
+                return (status, telegram_error(status, "Injected error"), 0)
+            return (status, stripe_error("api_error", "Injected error"), 0)
+        return None
+
+    def create_session(self, idempotency_key: str | None) -> dict:
+        with self.lock:
+            if idempotency_key in self.idempotent:
+                return self.idempotent[idempotency_key]
+            session_id = f"cs_test_{next(self.ids)}"
+            session = {
+                "id": session_id,
+                "object": "checkout.session",
+                "url": f"{self.url}/pay/{session_id}",
+                "status": "open",
+                "payment_status": "unpaid",
+                "created": int(time.time()),
+            }
+            self.sessions.append(session)
+            if idempotency_key:
+                self.idempotent[idempotency_key] = session
+            return session
+
+    def find_session(self, session_id: str) -> dict | None:
+        with self.lock:
+            for session in self.sessions:
+                if session["id"] == session_id:
+                    return session
+        return None
+
+    def expire_session(self, session: dict) -> Response:
+        with self.lock:
+            if session["status"] != "open":
+                return (
+                    400,
+                    stripe_error(
+                        "invalid_request_error",
+                        "Only open sessions can be expired.",
+                    ),
+                    0,
+                )
+            session["status"] = "expired"
+            return (200, session, 0)
+
+    def pay_session(self, session_id: str) -> Response:
+        session = self.find_session(session_id)
+        if session is None:
+            return (
+                404,
+                stripe_error("invalid_request_error", "No such session."),
+                0,
+            )
+        with self.lock:
+            if session["status"] != "open":
+                return (
+                    400,
+                    stripe_error(
+                        "invalid_request_error",
+                        "Only open sessions can be paid.",
+                    ),
+                    0,
+                )
+            session["status"] = "complete"
+            session["payment_status"] = "paid"
+            paid = dict(session)
+        self.deliver_event("checkout.session.completed", paid)
+        return (200, paid, 0)
+
+    def deliver_event(self, event_type: str, data: dict) -> None:
+        """Post a webhook event to `webhook_url` from a daemon thread."""
+        if not self.webhook_url:
+            return
+        event = {
+            "id": f"evt_test_{next(self.ids)}",
+            "object": "event",
+            "type": event_type,
+            "created": int(time.time()),
+            "livemode": False,
+            "data": {"object": data},
+        }
+        threading.Thread(
+            target=self.post_event, args=(event,), daemon=True
+        ).start()
+
+    def post_event(self, event: dict) -> None:
+        payload = json.dumps(event)
+        timestamp = int(time.time())
+        # Stripe's scheme: an HMAC-SHA256 of "timestamp.payload".
+        signature = hmac.new(
+            self.webhook_secret.encode(),
+            f"{timestamp}.{payload}".encode(),
+            hashlib.sha256,
+        ).hexdigest()
+        request = urllib.request.Request(
+            self.webhook_url,
+            data=payload.encode(),
+            headers={
+                "Content-Type": "application/json",
+                "Stripe-Signature": f"t={timestamp},v1={signature}",
+            },
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError:
+            status = None
+        with self.lock:
+            self.deliveries.append({"event": event["id"], "status": status})
+
+    def list_sessions(self, query: dict) -> Response:
+        created_since = int(query.get("created[gte]", ["0"])[0])
+        status = query.get("status", [None])[0]
+        with self.lock:
+            sessions = [
+                session
+                for session in self.sessions
+                if session["created"] >= created_since
+                and status in (None, session["status"])
+            ]
+        if "starting_after" in query:
+            ids = [session["id"] for session in sessions]
+            starting_after = query["starting_after"][0]
+            if starting_after not in ids:
+                return (
+                    400,
+                    stripe_error(
+                        "invalid_request_error",
+                        f"No such checkout.session: '{starting_after}'",
+                    ),
+                    0,
+                )
+            sessions = sessions[ids.index(starting_after) + 1 :]
+        limit = int(query.get("limit", ["10"])[0])
+        body = {
+            "object": "list",
+            "url": "/v1/checkout/sessions",
+            "data": sessions[:limit],
+            "has_more": len(sessions) > limit,
+        }
+        return (200, body, 0)
+
+    def send(self, payload: dict) -> dict:
+        with self.lock:
+            message = {
+                "message_id": len(self.messages) + 1,
+                "chat": {"id": payload["chat_id"]},
+                "date": int(time.time()),
+                "text": payload["text"],
+            }
+            self.messages.append(message)
+            return message
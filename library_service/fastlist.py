@@ -0,0 +1,115 @@
+from functools import lru_cache
+from typing import Any, Callable, Iterable
+
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+
+class ValuesRenderer:
+    """
+    Render `values()` rows exactly as a read-only serializer would.
+
+    Each serializer field is compiled once into a `values()` lookup and
+    the field's own `to_representation`, so the output matches the
+    serializer without building model instances or bound fields per row.
+    """
+
+    def __init__(
+        self, columns: list[tuple[str, str, Callable[[Any], Any]]]
+    ) -> None:
+        self.columns = columns
+        self.lookups = tuple(dict.fromkeys(lookup for _, lookup, _ in columns))
+
+    def render(self, rows: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+        columns = self.columns
+        return [
+            {
+                name: (
+                    None if (value := row[lookup]) is None else convert(value)
+                )
+                for name, lookup, convert in columns
+            }
+            for row in rows
+        ]
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+@lru_cache
+def compile_renderer(
+    serializer_class: type[serializers.Serializer],
+) -> ValuesRenderer | None:
+    """
+    Compile a values renderer for `serializer_class`.
+
+    Returns None when a field cannot be read from a single column, e.g.
+    nested serializers, method fields or `source="*"`.
+    """
+    columns = []
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        if (
+            isinstance(
+                field,
+                (
+                    serializers.BaseSerializer,
+                    serializers.SerializerMethodField,
+                ),
+            )
+            or field.source == "*"
+        ):
+            return None
+
+        if isinstance(field, PrimaryKeyRelatedField):
+            # A related pk is already the representation.
+            convert = (
+                field.pk_field.to_representation
+                if field.pk_field is not None
+                else _identity
+            )
+        elif isinstance(field, serializers.RelatedField):
+            return None
+        else:
+            convert = field.to_representation
+        columns.append((name, "__".join(field.source_attrs), convert))
+    return ValuesRenderer(columns)
+
+
+class FastListMixin:
+    """
+    Build list responses from `values()` rows instead of serializers.
+
+    Applies when the list serializer compiles to a `ValuesRenderer` and
+    `FAST_LIST_SERIALIZATION` is enabled; otherwise the regular `list`
+    runs. Pagination, filtering and the response body are unchanged.
+    """
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        renderer = (
+            compile_renderer(self.get_serializer_class())
+            if settings.FAST_LIST_SERIALIZATION
+            else None
+        )
+        if renderer is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.values(
+            *dict.fromkeys(renderer.lookups + self._ordering_lookups())
+        )
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(renderer.render(page))
+        return Response(renderer.render(rows))
+
+    def _ordering_lookups(self) -> tuple[str, ...]:
+        # Cursor pagination reads its position from the row itself.
+        ordering = getattr(self, "cursor_ordering", None) or ()
+        return tuple(field.lstrip("-") for field in ordering)
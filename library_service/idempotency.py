@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import time
+import uuid
+from functools import wraps
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from drf_spectacular.utils import OpenApiParameter
+from redis.exceptions import RedisError
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.1
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    name=IDEMPOTENCY_HEADER,
+    location=OpenApiParameter.HEADER,
+    required=False,
+    description=(
+        "Unique key for safely retrying the request. A retry with the same "
+        "key and body gets the stored response back, marked with "
+        f"`{REPLAYED_HEADER}: true`, instead of being executed again."
+    ),
+)
+
+
+class IdempotencyConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = (
+        f"A request with this {IDEMPOTENCY_HEADER} is still in progress."
+    )
+    default_code = "idempotency_conflict"
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = (
+        f"This {IDEMPOTENCY_HEADER} was already used with another request."
+    )
+    default_code = "idempotency_key_reused"
+
+
+class IdempotencyUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = (
+        f"Requests with an {IDEMPOTENCY_HEADER} cannot be processed right "
+        f"now. Retry later."
+    )
+    default_code = "idempotency_unavailable"
+
+
+def _cache_keys(request: Request, key: str) -> tuple[str, str]:
+    scope = ":".join([str(request.user.pk), request.method, request.path, key])
+    digest = hashlib.sha256(scope.encode()).hexdigest()
+    return f"idempotency:{digest}", f"idempotency:{digest}:lock"
+
+
+def _fingerprint(request: Request) -> str:
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _store(response_key: str, response: Response, fingerprint: str) -> None:
+    """
+    Store `response` for retries. The view has already committed, so a
+    cache outage is only logged and the response still returned.
+    """
+    try:
+        cache.set(
+            response_key,
+            {
+                "fingerprint": fingerprint,
+                "status": response.status_code,
+                "data": response.data,
+                "headers": dict(response.items()),
+            },
+            timeout=settings.IDEMPOTENCY_KEY_TTL,
+        )
+    except RedisError:
+        logger.exception("Could not store idempotent response")
+
+
+def _release(lock_key: str, token: str) -> None:
+    """
+    Release the lock if it is still ours: once it expired, another
+    request may hold it.
+    """
+    try:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+    except RedisError:
+        logger.warning("Could not release idempotency lock", exc_info=True)
+
+
+def _replay(stored: dict[str, Any], fingerprint: str) -> Response:
+    if stored["fingerprint"] != fingerprint:
+        raise IdempotencyKeyReused()
+    response = Response(
+        stored["data"], status=stored["status"], headers=stored["headers"]
+    )
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def idempotent(view_method: Callable[..., Response]) -> Callable:
+    """
+    Make a mutating view method safe to retry with an `Idempotency-Key`.
+
+    The first request with a key runs while holding a cache lock and its
+    response is stored for `IDEMPOTENCY_KEY_TTL` seconds. Retries get the
+    stored response without running the view, and so without touching
+    Stripe or the database. A duplicate arriving while the first request
+    is still running waits for its response, up to
+    `IDEMPOTENCY_WAIT_TIMEOUT` seconds, then gets 409 Conflict. Keys are
+    scoped to the user and endpoint. Errors raised by the view are not
+    stored, so a failed request can be retried with the same key. While
+    the cache is down, keyed requests get 503 rather than running
+    without the guarantee.
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request: Request, *args, **kwargs) -> Response:
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view_method(self, request, *args, **kwargs)
+        if not key.strip() or len(key) > MAX_KEY_LENGTH:
+            raise ValidationError(
+                {
+                    IDEMPOTENCY_HEADER: [
+                        f"Expected 1 to {MAX_KEY_LENGTH} characters."
+                    ]
+                }
+            )
+
+        response_key, lock_key = _cache_keys(request, key)
+        fingerprint = _fingerprint(request)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+        try:
+            while True:
+                stored = cache.get(response_key)
+                if stored is not None:
+                    return _replay(stored, fingerprint)
+                if cache.add(
+                    lock_key, token, timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT
+                ):
+                    break
+                if time.monotonic() >= deadline:
+                    raise IdempotencyConflict()
+                time.sleep(POLL_INTERVAL)
+
+            # The previous holder may have stored its response and
+            # released the lock since the last check.
+            stored = cache.get(response_key)
+        except RedisError:
+            logger.warning("Idempotency cache unavailable", exc_info=True)
+            raise IdempotencyUnavailable()
+
+        try:
+            if stored is not None:
+                return _replay(stored, fingerprint)
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code < 500:
+                _store(response_key, response, fingerprint)
+            return response
+        finally:
+            _release(lock_key, token)
+
+    return wrapper
@@ -0,0 +1,188 @@
+import json
+from typing import Any
+
+from django.core.exceptions import ValidationError
+from django.db.models import Model, Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    CursorPagination,
+    PageNumberPagination,
+    _reverse_ordering,
+)
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination positioned on every field of the ordering.
+
+    DRF's cursor keeps only the first field and skips its ties with an
+    OFFSET. Here the cursor keeps all of them and a page starts after the
+    position with a row comparison bounded on the first field, so with a
+    unique last field no OFFSET is needed and a matching composite index
+    serves every page.
+    """
+
+    def _get_position_from_instance(
+        self, instance: Model | dict, ordering: tuple[str, ...]
+    ) -> str:
+        names = [field.lstrip("-") for field in ordering]
+        if isinstance(instance, dict):
+            values = [instance[name] for name in names]
+        else:
+            values = [getattr(instance, name) for name in names]
+        return json.dumps([str(value) for value in values])
+
+    def _decode_position(self, position: str) -> list[str]:
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def _after(self, values: list[Any], reverse: bool) -> Q:
+        """Rows past `values` in the (possibly reversed) ordering."""
+        after = None
+        for field, value in reversed(list(zip(self.ordering, values))):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") != reverse else "gt"
+            past = Q(**{f"{name}__{lookup}": value})
+            after = past if after is None else past | Q(**{name: value}) & after
+        # Bounds the index range scan on the first field.
+        first = self.ordering[0]
+        lookup = "lte" if first.startswith("-") != reverse else "gte"
+        return Q(**{f"{first.lstrip('-')}__{lookup}": values[0]}) & after
+
+    def paginate_queryset(
+        self, queryset: QuerySet, request: Request, view: APIView = None
+    ) -> list | None:
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            values = self._decode_position(current_position)
+            try:
+                queryset = queryset.filter(self._after(values, reverse))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[offset : offset + self.page_size + 1])
+        self.page = results[: self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+
+        # Link bookkeeping as in CursorPagination.paginate_queryset.
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    Page number pagination with opt-in keyset (cursor) pagination.
+
+    Clients request the first cursor page with `?pagination=cursor` and
+    then follow the `next`/`previous` links. Views enable the mode by
+    declaring a `cursor_ordering` backed by a matching index, so deep
+    pages cost an index range scan instead of OFFSET plus COUNT(*). The
+    ordering must end in a unique field, see `KeysetCursorPagination`;
+    views set `cursor_ordering` to None for requests ordered some other
+    way.
+    """
+
+    mode_query_param = "pagination"
+    cursor_query_param = "cursor"
+
+    def get_cursor_paginator(
+        self, request: Request, view: APIView | None
+    ) -> CursorPagination | None:
+        ordering = getattr(view, "cursor_ordering", None)
+        if not ordering:
+            return None
+
+        params = request.query_params
+        if (
+            params.get(self.mode_query_param) != "cursor"
+            and self.cursor_query_param not in params
+        ):
+            return None
+
+        paginator = KeysetCursorPagination()
+        paginator.ordering = ordering
+        paginator.page_size = self.page_size
+        paginator.cursor_query_param = self.cursor_query_param
+        return paginator
+
+    def paginate_queryset(
+        self, queryset: QuerySet, request: Request, view: APIView = None
+    ) -> list | None:
+        self.cursor_paginator = self.get_cursor_paginator(request, view)
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data: list) -> Response:
+        if getattr(self, "cursor_paginator", None) is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view: APIView) -> list[dict]:
+        parameters = super().get_schema_operation_parameters(view)
+        if not getattr(view, "cursor_ordering", None):
+            return parameters
+
+        return parameters + [
+            {
+                "name": self.mode_query_param,
+                "required": False,
+                "in": "query",
+                "description": (
+                    "Set to `cursor` to switch to cursor pagination. "
+                    "Responses then omit `count` and `next`/`previous` "
+                    "carry a `cursor` parameter."
+                ),
+                "schema": {"type": "string", "enum": ["cursor"]},
+            },
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+        ]
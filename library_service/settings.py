@@ -44,12 +44,14 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "apps.users",
     "apps.books",
     "apps.borrowings",
     "apps.payments",
+    "apps.holds",
     "django_q",
     "drf_spectacular",
 ]
@@ -150,7 +152,9 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": (
+        "library_service.pagination.OptionalCursorPagination"
+    ),
     "PAGE_SIZE": 20,
 }
 
@@ -159,6 +163,12 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
 }
+# Resolve the user of an access token seen before from a cache instead
+# of verifying it and querying the user again. Opt-in; updates through
+# the API and the admin invalidate it, other writes do not.
+JWT_USER_CACHE = os.getenv("JWT_USER_CACHE") == "True"
+# Tokens remembered per process, in front of the shared cache.
+JWT_USER_CACHE_SIZE = 10_000
 
 Q_CLUSTER = {
     "name": "library_service_cluster",
@@ -173,6 +183,26 @@ Q_CLUSTER = {
     },
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://redis:6379/1",
+    }
+}
+
+BOOK_CACHE_TIMEOUT = 60 * 60
+BOOK_LIST_CACHE_TIMEOUT = 60
+BOOK_IMPORT_CHUNK_SIZE = 1000
+# Render list endpoints from values() rows instead of serializers.
+FAST_LIST_SERIALIZATION = True
+# Rows fetched per round trip by the streaming staff exports.
+EXPORT_CHUNK_SIZE = 2000
+# Responses to requests with an Idempotency-Key are replayed for a day.
+# The lock must outlive the slowest request, Stripe calls included.
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "DRF Library Service",
     "VERSION": "1.0.0",
@@ -180,5 +210,48 @@ SPECTACULAR_SETTINGS = {
     "SERVE_PERMISSIONS": ["rest_framework.permissions.AllowAny"],
 }
 
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+# Sends Stripe and Telegram calls to a local stand-in server instead,
+# e.g. http://localhost:12111 from `manage.py run_fake_apis`.
+FAKE_APIS_URL = os.getenv("FAKE_APIS_URL") or None
+
+STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY") or (
+    "sk_test_fake" if FAKE_APIS_URL else None
+)
+stripe.api_key = STRIPE_SECRET_KEY
+# Overrides the Stripe API address, e.g. to point at a local fake server.
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE") or FAKE_APIS_URL
+STRIPE_CONNECT_TIMEOUT = 3.05
+STRIPE_READ_TIMEOUT = 10
+STRIPE_MAX_RETRIES = 2
+STRIPE_POOL_SIZE = 10
+# Consecutive outage errors that open the circuit, and seconds it stays
+# open before a probe call is let through.
+STRIPE_CIRCUIT_FAILURE_THRESHOLD = 5
+STRIPE_CIRCUIT_RESET_TIMEOUT = 30
+# How far back the first reconciliation run looks for paid sessions.
+PAYMENT_RECONCILE_LOOKBACK_DAYS = 30
+PAYMENT_RECONCILE_BATCH_SIZE = 500
+# Unpaid checkouts older than this are abandoned: an hour past the 24h
+# Stripe session lifetime, their borrowing is cancelled and restocked.
+PAYMENT_EXPIRY_HOURS = 25
+PAYMENT_EXPIRY_BATCH_SIZE = 100
+# Rows each daily payment total is split over, so that concurrent
+# checkouts rarely update the same row.
+PAYMENT_TOTALS_BUCKETS = 8
+# Cached payment summaries are also dropped on every status change.
+PAYMENT_SUMMARY_CACHE_TIMEOUT = 60 * 60
+# Signing secret of the webhook endpoint registered in Stripe.
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
+TELEGRAM_API_BASE = FAKE_APIS_URL or "https://api.telegram.org"
 FINE_MULTIPLIER = 2
+BORROWING_CART_MAX_ITEMS = 10
+BORROWING_BULK_RETURN_MAX_ITEMS = 500
+# Monthly borrowing partitions to keep created ahead of today.
+BORROWING_PARTITIONS_AHEAD = 3
+# Days a returned copy stays put aside for the first hold in line.
+HOLD_PICKUP_DAYS = 3
+
+EMAIL_BACKEND = os.getenv(
+    "EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend"
+)
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "library@example.com")
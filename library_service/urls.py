@@ -15,6 +15,7 @@ urlpatterns = [
         include("apps.borrowings.urls", namespace="borrowings"),
     ),
     path("api/payments/", include("apps.payments.urls", namespace="payments")),
+    path("api/holds/", include("apps.holds.urls", namespace="holds")),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path(
         "api/schema/swagger-ui/",